@@ -0,0 +1,25 @@
+from functools import cache
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+
+from . import unread
+
+
+def unread_notifications(request):
+    """
+    ``unread_notifications_count`` for the header badge. It is read lazily
+    (templates call it when used) and at most once per request, so pages
+    without the badge cost no query. ``notification_stream`` says whether the
+    page should keep the live stream open (see ``NOTIFICATION_STREAM``).
+    """
+    user = getattr(request, "user", None)
+
+    @cache
+    def count():
+        return unread.unread_count(user) if user is not None and user.is_authenticated else 0
+
+    stream = settings.NOTIFICATION_STREAM
+    if stream is None:
+        stream = isinstance(request, ASGIRequest)
+    return {"unread_notifications_count": count, "notification_stream": stream}
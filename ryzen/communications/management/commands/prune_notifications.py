@@ -0,0 +1,58 @@
+import json
+
+from django.core.management.base import BaseCommand
+from communications import retention
+
+
+def _size(size):
+    if size is None:
+        return "n/a"
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+class Command(BaseCommand):
+    help = "Archive and delete notifications and coordinator messages past retention (run daily from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows archived and deleted per transaction")
+        parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between batches")
+        parser.add_argument("--no-archive", action="store_true", help="Delete without writing the JSONL archive")
+        parser.add_argument("--archive-dir", default=None, help="Directory for the archives (default NOTIFICATION_ARCHIVE_DIR)")
+        parser.add_argument("--dry-run", action="store_true", help="Only count what would be removed")
+        parser.add_argument("--report", action="store_true", help="Print table sizes and monthly volumes instead of pruning")
+        parser.add_argument("--months", type=int, default=12, help="Months covered by --report")
+        parser.add_argument("--json", action="store_true", help="Print --report as JSON")
+
+    def handle(self, *args, **options):
+        if options["report"]:
+            return self.print_report(options["months"], options["json"])
+
+        results = retention.prune(
+            batch_size=options["batch_size"],
+            pause=options["pause"],
+            archive=not options["no_archive"],
+            dry_run=options["dry_run"],
+            directory=options["archive_dir"],
+        )
+        verb = "Would remove" if options["dry_run"] else "Removed"
+        for label, rows in results.items():
+            self.stdout.write(f"{verb} {rows} {label.replace('_', ' ')}")
+        self.stdout.write(self.style.SUCCESS(f"{verb} {sum(results.values())} rows in total."))
+
+    def print_report(self, months, as_json):
+        report = retention.report(months=months)
+        if as_json:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self.stdout.write("Table sizes:")
+        for table in report["tables"]:
+            self.stdout.write(f"  {table['table']:<36}{table['rows']:>10} rows {_size(table['bytes']):>10}")
+        self.stdout.write("Notifications created per month:")
+        for month, rows in report["notifications_per_month"]:
+            self.stdout.write(f"  {month}{rows:>10}")
+        self.stdout.write("Past retention now:")
+        for label, rows in report["prunable"].items():
+            self.stdout.write(f"  {label:<24}{rows:>10}")
@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-18 16:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communications', '0003_alter_notification_category'),
+        ('member', '0005_financialrecord_member_date_index'),
+        ('stokvel', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='coordinatormessage',
+            index=models.Index(fields=['stokvel', '-created_at'], name='coordmsg_stokvel_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at'], name='notif_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-18 16:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communications', '0004_feed_indexes'),
+        ('stokvel', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='coordinatormessage',
+            name='coordmsg_stokvel_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='notif_user_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='coordinatormessage',
+            index=models.Index(fields=['stokvel', '-created_at', '-id'], name='coordmsg_stokvel_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='notif_user_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations
+from django.db.models import Count, Q
+
+
+def populate(apps, schema_editor):
+    Notification = apps.get_model("communications", "Notification")
+    NotificationCounter = apps.get_model("communications", "NotificationCounter")
+
+    unread = (
+        Notification.objects.values("user_id")
+        .annotate(unread=Count("id", filter=Q(read=False)))
+        .order_by()
+    )
+    NotificationCounter.objects.bulk_create([
+        NotificationCounter(user_id=row["user_id"], unread=row["unread"])
+        for row in unread.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communications', '0006_notification_counter'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-18 16:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communications', '0007_populate_notification_counters'),
+        ('member', '0006_conversations'),
+        ('stokvel', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='coordinatormessage',
+            index=models.Index(fields=['created_at', 'id'], name='coordmsg_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('read', True)), fields=['category', 'created_at', 'id'], name='notif_read_prune_idx'),
+        ),
+    ]
@@ -11,6 +11,14 @@ class CoordinatorMessage(models.Model):
     message = models.TextField()
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            # Stokvel message feed, newest first; id breaks ties for keyset pagination
+            models.Index(fields=["stokvel", "-created_at", "-id"], name="coordmsg_stokvel_feed_idx"),
+            # Retention pruning walks the oldest messages first
+            models.Index(fields=["created_at", "id"], name="coordmsg_created_idx"),
+        ]
+
     def __str__(self):
         return f"{self.sender.username} - {self.message[:20]}"
 
@@ -31,5 +39,30 @@ class Notification(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     read = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # User notification feed, newest first; id breaks ties for keyset pagination
+            models.Index(fields=["user", "-created_at", "-id"], name="notif_user_feed_idx"),
+            # Retention pruning walks the oldest read notifications of a category first
+            models.Index(
+                fields=["category", "created_at", "id"], name="notif_read_prune_idx", condition=models.Q(read=True)
+            ),
+        ]
+
     def __str__(self):
         return f"Notification to {self.user.username} - {self.title}"
+
+
+class NotificationCounter(models.Model):
+    """
+    Number of unread notifications per user, kept in step with Notification
+    by communications/unread.py so the header badge never has to count rows.
+    """
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name="notification_counter"
+    )
+    unread = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user.username}: {self.unread} unread"
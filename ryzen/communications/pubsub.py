@@ -0,0 +1,128 @@
+"""
+Wake-up signals for the live notification stream.
+
+A broker only tells connected streams *that* a user has new notifications;
+the stream then reads them from the Notification table (ids greater than the
+last one it sent), which is also how a reconnecting client resumes. The
+broker class is chosen with the ``NOTIFICATION_BROKER`` setting:
+
+``InProcessBroker``
+    Wakes streams served by the same process. Enough when notifications are
+    created in the web process (``JOBS_RUN_INLINE``).
+``PollingBroker``
+    For notifications created by a separate worker process. Every
+    ``NOTIFICATION_POLL_INTERVAL`` seconds one grouped query reads the
+    newest notification id of every user with an open stream in this
+    process, and only the streams whose id went up are woken. The cost is
+    one query per process per interval, however many streams are open.
+"""
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils.module_loading import import_string
+
+from .models import Notification
+
+
+class _Subscription:
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    def notify(self):
+        self.loop.call_soon_threadsafe(self.event.set)
+
+    async def wait(self, timeout):
+        """True if woken up by a publish, False once ``timeout`` seconds pass."""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.event.clear()
+        return True
+
+
+class InProcessBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def publish(self, user_ids):
+        """Wake the streams of ``user_ids``. Safe to call from any thread."""
+        with self._lock:
+            subscriptions = [s for user_id in user_ids for s in self._subscribers.get(user_id, ())]
+        for subscription in subscriptions:
+            subscription.notify()
+
+    @asynccontextmanager
+    async def subscribe(self, user_id):
+        subscription = _Subscription()
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            with self._lock:
+                self._subscribers[user_id].discard(subscription)
+                if not self._subscribers[user_id]:
+                    del self._subscribers[user_id]
+
+
+class PollingBroker(InProcessBroker):
+    def __init__(self):
+        super().__init__()
+        self._poller = None
+        self._newest = {}
+
+    def _newest_ids(self, user_ids):
+        rows = Notification.objects.filter(user_id__in=user_ids).values("user_id").annotate(newest=Max("id"))
+        return dict(rows.values_list("user_id", "newest").order_by())
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(settings.NOTIFICATION_POLL_INTERVAL)
+            with self._lock:
+                user_ids = list(self._subscribers)
+            newest = await sync_to_async(self._newest_ids)(user_ids)
+            # A user seen for the first time is woken once, in case something arrived while subscribing
+            self.publish([u for u, pk in newest.items() if pk > self._newest.get(u, 0)])
+            self._newest = newest
+
+    @asynccontextmanager
+    async def subscribe(self, user_id):
+        try:
+            async with super().subscribe(user_id) as subscription:
+                if self._poller is None or self._poller.done():
+                    self._poller = asyncio.get_running_loop().create_task(self._poll())
+                yield subscription
+        finally:
+            with self._lock:
+                idle = not self._subscribers
+            if idle and self._poller is not None:
+                self._poller.cancel()
+                self._poller = None
+
+
+@lru_cache(maxsize=None)
+def _broker(path):
+    return import_string(path)()
+
+
+def get_broker():
+    path = settings.NOTIFICATION_BROKER
+    if path is None:
+        inline = getattr(settings, "JOBS_RUN_INLINE", False)
+        path = "communications.pubsub.InProcessBroker" if inline else "communications.pubsub.PollingBroker"
+    return _broker(path)
+
+
+def publish_on_commit(user_ids):
+    """Wake the streams of ``user_ids`` once the current transaction has committed."""
+    user_ids = list(user_ids)
+    transaction.on_commit(lambda: get_broker().publish(user_ids))
@@ -0,0 +1,156 @@
+"""
+Retention of notifications and coordinator messages.
+
+Read notifications older than their category's policy
+(``NOTIFICATION_RETENTION_DAYS``, ``None`` meaning keep forever) and
+coordinator messages older than ``COORDINATOR_MESSAGE_RETENTION_DAYS`` are
+written to gzip-compressed JSONL files in ``NOTIFICATION_ARCHIVE_DIR`` and
+then deleted, oldest first, in batches. Each batch is its own short
+transaction, so no lock is held for long and the prune can be interrupted
+and resumed at any point. Unread notifications are never pruned.
+"""
+import gzip
+import json
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import CoordinatorMessage, Notification
+
+NOTIFICATION_FIELDS = ("id", "user_id", "title", "message", "category", "created_at", "read")
+MESSAGE_FIELDS = ("id", "stokvel_id", "sender_id", "message", "created_at")
+
+
+def expired_notifications(now=None):
+    """``{category: queryset}`` of read notifications past their category's retention."""
+    now = now or timezone.now()
+    expired = {}
+    for category, days in settings.NOTIFICATION_RETENTION_DAYS.items():
+        if days is not None:
+            expired[category] = Notification.objects.filter(
+                read=True, category=category, created_at__lt=now - timedelta(days=days)
+            )
+    return expired
+
+
+def expired_messages(now=None):
+    days = settings.COORDINATOR_MESSAGE_RETENTION_DAYS
+    if days is None:
+        return CoordinatorMessage.objects.none()
+    return CoordinatorMessage.objects.filter(created_at__lt=(now or timezone.now()) - timedelta(days=days))
+
+
+class Archive:
+    """Appends rows as JSON lines to ``<dir>/<name>-<timestamp>.jsonl.gz``."""
+
+    def __init__(self, name, directory=None):
+        directory = Path(directory or settings.NOTIFICATION_ARCHIVE_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        self.path = directory / f"{name}-{timezone.now():%Y%m%d-%H%M%S}.jsonl.gz"
+        self._file = None
+
+    def write(self, rows):
+        if self._file is None:
+            self._file = gzip.open(self.path, "at", encoding="utf-8")
+        for row in rows:
+            self._file.write(json.dumps(row, cls=DjangoJSONEncoder) + "\n")
+        # Rows must be on disk before they are deleted
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def _prune(queryset, fields, archive, batch_size, pause, dry_run):
+    """Archive then delete ``queryset`` oldest first, ``batch_size`` rows at a time."""
+    if dry_run:
+        return queryset.count()
+    deleted = 0
+    batch = queryset.order_by("created_at", "id").values(*fields)
+    while rows := list(batch[:batch_size]):
+        if archive is not None:
+            archive.write(rows)
+        with transaction.atomic():
+            queryset.model.objects.filter(id__in=[row["id"] for row in rows]).delete()
+        deleted += len(rows)
+        if pause:
+            time.sleep(pause)
+    return deleted
+
+
+def prune(batch_size=1000, pause=0.0, archive=True, dry_run=False, now=None, directory=None):
+    """
+    Archive and delete everything past retention. Returns ``{label: rows}``
+    per notification category and for ``coordinator_messages``; with
+    ``dry_run`` the rows that would go, without touching anything.
+    """
+    results = {}
+    notifications = Archive("notifications", directory) if archive and not dry_run else None
+    try:
+        for category, queryset in expired_notifications(now).items():
+            results[category] = _prune(queryset, NOTIFICATION_FIELDS, notifications, batch_size, pause, dry_run)
+    finally:
+        if notifications is not None:
+            notifications.close()
+
+    messages = Archive("coordinator-messages", directory) if archive and not dry_run else None
+    try:
+        results["coordinator_messages"] = _prune(
+            expired_messages(now), MESSAGE_FIELDS, messages, batch_size, pause, dry_run
+        )
+    finally:
+        if messages is not None:
+            messages.close()
+    return results
+
+
+def table_size(table):
+    """Bytes used by ``table`` and its indexes, or None where the database cannot tell."""
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute("SELECT pg_total_relation_size(%s)", [table])
+            elif connection.vendor == "sqlite":
+                # dbstat is only there when SQLite was built with it
+                cursor.execute(
+                    "SELECT SUM(pgsize) FROM dbstat WHERE name = %s "
+                    "OR name IN (SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s)",
+                    [table, table],
+                )
+            else:
+                return None
+            return cursor.fetchone()[0]
+    except DatabaseError:
+        return None
+
+
+def report(months=12, now=None):
+    """
+    Sizes of the notification tables, notifications created per month over
+    the last ``months`` months, and what a prune would remove now.
+    """
+    now = now or timezone.now()
+    since = (now - timedelta(days=31 * (months - 1))).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    per_month = (
+        Notification.objects.filter(created_at__gte=since)
+        .annotate(month=TruncMonth("created_at"))
+        .values("month")
+        .annotate(rows=Count("id"))
+        .order_by("month")
+    )
+    return {
+        "tables": [
+            {"table": model._meta.db_table, "rows": model.objects.count(), "bytes": table_size(model._meta.db_table)}
+            for model in (Notification, CoordinatorMessage)
+        ],
+        "notifications_per_month": [(row["month"].strftime("%Y-%m"), row["rows"]) for row in per_month],
+        "prunable": prune(dry_run=True, now=now),
+    }
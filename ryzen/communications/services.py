@@ -0,0 +1,56 @@
+"""
+Notification fan-out for coordinator messages.
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+
+from . import pubsub, unread
+from .models import Notification
+
+
+def notification_batch_size():
+    return getattr(settings, "NOTIFICATION_BATCH_SIZE", 500)
+
+
+def message_recipients(message):
+    """User ids a coordinator message goes to: its target members, or the whole stokvel."""
+    targets = message.target_members.all()
+    if not targets.exists():
+        targets = message.stokvel.members.all()
+    return targets.values_list("user_id", flat=True)
+
+
+def fan_out(message, category="general", batch_size=None):
+    """
+    Create one Notification per recipient of ``message``.
+
+    Notifications are inserted with ``bulk_create`` in batches of
+    ``batch_size`` (``NOTIFICATION_BATCH_SIZE`` by default) inside a single
+    transaction, so the number of queries does not grow with the number of
+    recipients. The recipients' unread counters are raised in the same
+    transaction. Returns the number of notifications created.
+    """
+    batch_size = batch_size or notification_batch_size()
+    sender = message.sender
+    title = f"Communication : {sender.get_full_name() or sender.username}"
+
+    user_ids = message_recipients(message).iterator(chunk_size=batch_size)
+    created = 0
+    with transaction.atomic():
+        while batch := list(islice(user_ids, batch_size)):
+            Notification.objects.bulk_create([
+                Notification(
+                    user_id=user_id,
+                    title=title,
+                    message=message.message,
+                    category=category,
+                    created_at=message.created_at,
+                )
+                for user_id in batch
+            ], batch_size=batch_size)
+            unread.add(batch)
+            pubsub.publish_on_commit(batch)
+            created += len(batch)
+    return created
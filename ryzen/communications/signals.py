@@ -0,0 +1,31 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import pubsub, unread
+from .models import Notification
+
+
+@receiver(pre_save, sender=Notification)
+def remember_read_flag(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        instance._was_read = None
+    else:
+        instance._was_read = Notification.objects.filter(pk=instance.pk).values_list("read", flat=True).first()
+
+
+@receiver(post_save, sender=Notification)
+def count_saved_notification(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        if not instance.read:
+            unread.add([instance.user_id])
+        pubsub.publish_on_commit([instance.user_id])
+    elif instance._was_read is not None and instance._was_read != instance.read:
+        unread.add([instance.user_id], amount=-1 if instance.read else 1)
+
+
+@receiver(post_delete, sender=Notification)
+def count_deleted_notification(sender, instance, **kwargs):
+    if not instance.read:
+        unread.add([instance.user_id], amount=-1)
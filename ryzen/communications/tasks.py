@@ -0,0 +1,9 @@
+from core.jobs import finish, job
+from .models import CoordinatorMessage
+from .services import fan_out
+
+
+@job("communications.fan_out")
+def fan_out_message(message_id, category="general"):
+    message = CoordinatorMessage.objects.select_related("sender", "stokvel").get(pk=message_id)
+    return finish(lambda: {"created": fan_out(message, category=category)})
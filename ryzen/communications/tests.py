@@ -1,3 +1,337 @@
-from django.test import TestCase
+import gzip
+import json
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core import jobs
+from core.testing import QueryPlanAssertions
+from member.models import Member
+from stokvel.models import Stokvel
+from . import pubsub, retention, unread
+from .models import CoordinatorMessage, Notification, NotificationCounter
+from .services import fan_out
+
+
+class FeedQueryPlanTests(QueryPlanAssertions, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.stokvel = Stokvel.objects.create(name="Feed Test", monthly_contribution=Decimal("200.00"))
+        other = Stokvel.objects.create(name="Other", monthly_contribution=Decimal("200.00"))
+        cls.user = User.objects.create(username="coordinator")
+        Member.objects.create(user=cls.user, stokvel=cls.stokvel)
+        for i in range(30):
+            Notification.objects.create(user=cls.user, title=f"N{i}", message="Hello")
+            CoordinatorMessage.objects.create(stokvel=cls.stokvel, sender=cls.user, message=f"M{i}")
+            CoordinatorMessage.objects.create(stokvel=other, sender=cls.user, message=f"M{i}")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _second_page(self, name):
+        first = self.client.get(reverse(f"communications:{name}"))
+        page = first.context["notifications_page" if name == "notifications" else "messages_page"]
+        return {"cursor": page.next_token}
+
+    def test_notifications_feed_uses_index(self):
+        params = self._second_page("notifications")
+        self.assertNoFullScan(
+            lambda: self.client.get(reverse("communications:notifications"), params),
+            ["communications_notification"],
+        )
+
+    async def test_async_notifications_pages(self):
+        await self.async_client.aforce_login(self.user)
+        url = reverse("communications:notifications")
+        first = (await self.async_client.get(url)).context["notifications_page"]
+        self.assertEqual([n.title for n in first], [f"N{i}" for i in range(29, 19, -1)])
+        self.assertFalse(first.has_previous)
+        self.assertIsNone(first.count)
+
+        second = (await self.async_client.get(url, {"cursor": first.next_token})).context["notifications_page"]
+        self.assertEqual([n.title for n in second], [f"N{i}" for i in range(19, 9, -1)])
+
+        back = (await self.async_client.get(url, {"cursor": second.previous_token})).context["notifications_page"]
+        self.assertEqual([n.title for n in back], [n.title for n in first])
+        self.assertFalse(back.has_previous)
+
+    def test_deep_pages_cost_the_same_as_the_first(self):
+        url = reverse("communications:notifications")
+        with CaptureQueriesContext(connection) as first:
+            page = self.client.get(url).context["notifications_page"]
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as deep:
+                page = self.client.get(url, {"cursor": page.next_token}).context["notifications_page"]
+        self.assertEqual(len(deep), len(first))
+        self.assertFalse(page.has_next)
+        sql = " ".join(q["sql"] for q in deep.captured_queries).upper()
+        self.assertNotIn("OFFSET", sql)
+        self.assertNotIn("COUNT(", sql)
+
+    def test_tampered_cursor_shows_first_page(self):
+        response = self.client.get(reverse("communications:notifications"), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.context["notifications_page"][0].title, "N29")
+
+    def test_coordinator_feed_uses_index(self):
+        params = self._second_page("coordinators")
+        self.assertNoFullScan(
+            lambda: self.client.get(reverse("communications:coordinators"), params),
+            ["communications_coordinatormessage"],
+        )
+
+
+class FanOutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.coordinator = User.objects.create(username="coordinator")
+
+    def make_stokvel(self, name, size):
+        stokvel = Stokvel.objects.create(name=name, monthly_contribution=Decimal("100.00"))
+        users = User.objects.bulk_create([User(username=f"{name}-{i}") for i in range(size)])
+        Member.objects.bulk_create([Member(user=u, stokvel=stokvel) for u in users])
+        return stokvel
+
+    def broadcast_queries(self, stokvel):
+        msg = CoordinatorMessage.objects.create(stokvel=stokvel, sender=self.coordinator, message="Hi")
+        with CaptureQueriesContext(connection) as captured:
+            created = fan_out(msg, category="meeting", batch_size=500)
+        self.assertEqual(created, stokvel.members.count())
+        return len(captured)
+
+    def test_query_count_is_constant_in_recipient_count(self):
+        small = self.broadcast_queries(self.make_stokvel("small", 5))
+        large = self.broadcast_queries(self.make_stokvel("large", 120))
+        self.assertEqual(small, large)
+
+    def test_batches_split_recipients(self):
+        stokvel = self.make_stokvel("batched", 25)
+        msg = CoordinatorMessage.objects.create(stokvel=stokvel, sender=self.coordinator, message="Hi")
+        self.assertEqual(fan_out(msg, batch_size=10), 25)
+        self.assertEqual(Notification.objects.filter(category="general").count(), 25)
+
+    def test_targets_only_selected_members(self):
+        stokvel = self.make_stokvel("targeted", 10)
+        msg = CoordinatorMessage.objects.create(stokvel=stokvel, sender=self.coordinator, message="Hi")
+        msg.target_members.set(stokvel.members.all()[:3])
+        self.assertEqual(fan_out(msg), 3)
+
+    def test_coordinators_view_broadcasts_to_stokvel(self):
+        stokvel = self.make_stokvel("view", 8)
+        Member.objects.create(user=self.coordinator, stokvel=stokvel)
+        self.client.force_login(self.coordinator)
+        response = self.client.post(reverse("communications:coordinators"), {"message": "Meeting on Friday", "category": "meeting"})
+        self.assertRedirects(response, reverse("communications:coordinators"))
+        self.assertEqual(Notification.objects.count(), 0)
+
+        jobs.work(burst=True)
+        self.assertEqual(Notification.objects.filter(category="meeting").count(), 9)
+
+
+class UnreadCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.stokvel = Stokvel.objects.create(name="Unread Test", monthly_contribution=Decimal("100.00"))
+        cls.users = [User.objects.create(username=f"reader{i}") for i in range(4)]
+        for user in cls.users:
+            Member.objects.create(user=user, stokvel=cls.stokvel)
+        cls.user = cls.users[0]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def _count(self, user):
+        return NotificationCounter.objects.get(user=user).unread
+
+    def test_fan_out_and_single_creates_are_counted(self):
+        fan_out(CoordinatorMessage.objects.create(stokvel=self.stokvel, sender=self.user, message="Hi"))
+        Notification.objects.create(user=self.user, title="One more", message="Hello")
+        self.assertEqual(self._count(self.user), 2)
+        self.assertEqual([self._count(u) for u in self.users[1:]], [1, 1, 1])
+
+        Notification.objects.filter(user=self.user).first().delete()
+        self.assertEqual(self._count(self.user), 1)
+
+    def test_mark_read_is_one_update(self):
+        fan_out(CoordinatorMessage.objects.create(stokvel=self.stokvel, sender=self.user, message="Hi"))
+        notes = [Notification.objects.create(user=self.user, title=f"T{i}", message="x") for i in range(3)]
+
+        # One UPDATE for the notifications, one for the counter
+        with self.assertNumQueries(4):  # + savepoint and release
+            self.assertEqual(unread.mark_read(self.user, [notes[0].pk, notes[1].pk]), 2)
+        self.assertEqual(self._count(self.user), 2)
+
+        response = self.client.post(
+            reverse("communications:mark_notifications_read"), {"all": "1"}, HTTP_ACCEPT="application/json"
+        )
+        self.assertEqual(response.json(), {"updated": 2, "unread": 0})
+        self.assertFalse(Notification.objects.filter(user=self.user, read=False).exists())
+
+    def test_badge_is_one_lookup_and_never_stale(self):
+        Notification.objects.create(user=self.user, title="New", message="Hello")
+        with self.assertNumQueries(1):
+            self.assertEqual(unread.unread_count(self.user), 1)
+        # As when the worker process fans out a message: nothing in this process is told
+        NotificationCounter.objects.filter(user=self.user).update(unread=2)
+        self.assertEqual(unread.unread_count(self.user), 2)
+
+        response = self.client.get(reverse("communications:notifications"))
+        self.assertContains(response, "Mark all as read")
+
+    def test_rebuild_repairs_drift(self):
+        Notification.objects.create(user=self.user, title="New", message="Hello")
+        NotificationCounter.objects.filter(user=self.user).update(unread=9)
+        unread.rebuild()
+        self.assertEqual(self._count(self.user), 1)
+
+
+class RecordingBroker(pubsub.PollingBroker):
+    published = []
+
+    def publish(self, user_ids):
+        self.published.extend(user_ids)
+
+
+@override_settings(
+    NOTIFICATION_BROKER="communications.pubsub.PollingBroker",
+    NOTIFICATION_POLL_INTERVAL=0.01,
+    NOTIFICATION_STREAM_HEARTBEAT=0.05,
+    NOTIFICATION_STREAM_MAX_AGE=0.2,
+)
+class NotificationStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.stokvel = Stokvel.objects.create(name="Stream Test", monthly_contribution=Decimal("100.00"))
+        cls.user = User.objects.create(username="listener")
+        Member.objects.create(user=cls.user, stokvel=cls.stokvel)
+        cls.notes = [Notification.objects.create(user=cls.user, title=f"S{i}", message="x") for i in range(3)]
+
+    def setUp(self):
+        cache.clear()
+
+    async def _events(self, **headers):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse("communications:notifications_stream"), **headers)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        body = "".join([chunk.decode() async for chunk in response.streaming_content])
+        events = []
+        for block in body.split("\n\n"):
+            fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+            if "event" in fields:
+                events.append((fields["event"], json.loads(fields["data"])))
+        return events
+
+    async def test_resumes_after_last_event_id(self):
+        events = await self._events(headers={"Last-Event-ID": str(self.notes[0].pk)})
+        self.assertEqual([data["title"] for name, data in events if name == "notification"], ["S1", "S2"])
+        self.assertEqual(events[-1], ("unread", {"count": 3}))
+
+    async def test_first_connection_starts_from_newest(self):
+        self.assertEqual(await self._events(), [])
+
+    def test_fan_out_publishes_after_commit(self):
+        RecordingBroker.published.clear()
+        message = CoordinatorMessage.objects.create(stokvel=self.stokvel, sender=self.user, message="Hi")
+        with override_settings(NOTIFICATION_BROKER="communications.tests.RecordingBroker"):
+            with self.captureOnCommitCallbacks(execute=True):
+                fan_out(message)
+                self.assertEqual(RecordingBroker.published, [])
+        self.assertEqual(RecordingBroker.published, [self.user.pk])
+
+    def test_default_broker_follows_where_jobs_run(self):
+        with override_settings(NOTIFICATION_BROKER=None, JOBS_RUN_INLINE=False):
+            self.assertIsInstance(pubsub.get_broker(), pubsub.PollingBroker)
+        with override_settings(NOTIFICATION_BROKER=None, JOBS_RUN_INLINE=True):
+            self.assertIsInstance(pubsub.get_broker(), pubsub.InProcessBroker)
+
+    @override_settings(NOTIFICATION_STREAM=None)
+    def test_stream_only_opened_under_asgi(self):
+        self.client.force_login(self.user)
+        self.assertNotContains(self.client.get(reverse("communications:coordinators")), "data-notification-stream")
+
+    @override_settings(NOTIFICATION_STREAM=None)
+    async def test_stream_opened_under_asgi(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse("communications:notifications"))
+        self.assertContains(response, "data-notification-stream")
+
+    async def test_in_process_broker_wakes_subscribers(self):
+        broker = pubsub.InProcessBroker()
+        async with broker.subscribe(7) as subscription:
+            threading.Thread(target=broker.publish, args=([7],)).start()
+            self.assertTrue(await subscription.wait(timeout=1))
+            self.assertFalse(await subscription.wait(timeout=0.01))
+
+    async def test_polling_broker_checks_every_stream_in_one_query(self):
+        broker = pubsub.PollingBroker()
+        other = await User.objects.acreate(username="other-listener")
+        queries = []
+        newest_ids = broker._newest_ids
+        broker._newest_ids = lambda user_ids: queries.append(sorted(user_ids)) or newest_ids(user_ids)
+        async with broker.subscribe(self.user.pk) as mine, broker.subscribe(other.pk) as theirs:
+            # Woken once on the first check: the user already has notifications
+            self.assertTrue(await mine.wait(timeout=1))
+            self.assertFalse(await mine.wait(timeout=0.05))
+            await Notification.objects.acreate(user=other, title="New", message="x")
+            self.assertTrue(await theirs.wait(timeout=1))
+            self.assertFalse(await mine.wait(timeout=0.05))
+        self.assertGreater(len(queries), 1)
+        self.assertEqual(queries[0], sorted([self.user.pk, other.pk]))
+        self.assertIsNone(broker._poller)
+
+
+class RetentionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.stokvel = Stokvel.objects.create(name="Retention Test", monthly_contribution=Decimal("100.00"))
+        cls.user = User.objects.create(username="keeper")
+        old = timezone.now() - timedelta(days=400)
+        for category in ("payment_reminder", "payout", "general"):
+            for i in range(3):
+                Notification.objects.create(user=cls.user, title=f"{category}{i}", message="x",
+                                            category=category, created_at=old, read=True)
+        Notification.objects.create(user=cls.user, title="unread", message="x",
+                                    category="payment_reminder", created_at=old)
+        Notification.objects.create(user=cls.user, title="recent", message="x",
+                                    category="payment_reminder", read=True)
+        CoordinatorMessage.objects.create(stokvel=cls.stokvel, sender=cls.user, message="old", created_at=old)
+        CoordinatorMessage.objects.create(stokvel=cls.stokvel, sender=cls.user, message="new")
+
+    def setUp(self):
+        self.directory = Path(self.enterContext(tempfile.TemporaryDirectory()))
+
+    def test_prune_archives_then_deletes_in_batches(self):
+        results = retention.prune(batch_size=2, directory=self.directory)
+
+        self.assertEqual(results, {"payment_reminder": 3, "meeting": 0, "general": 3, "coordinator_messages": 1})
+        self.assertEqual(
+            sorted(Notification.objects.values_list("title", flat=True)),
+            ["payout0", "payout1", "payout2", "recent", "unread"],
+        )
+        self.assertEqual(list(CoordinatorMessage.objects.values_list("message", flat=True)), ["new"])
+        self.assertEqual(NotificationCounter.objects.get(user=self.user).unread, 1)
+
+        archive = next(self.directory.glob("notifications-*.jsonl.gz"))
+        with gzip.open(archive, "rt") as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(set(rows[0]), set(retention.NOTIFICATION_FIELDS))
+
+    def test_dry_run_and_report_change_nothing(self):
+        before = Notification.objects.count()
+        self.assertEqual(retention.prune(dry_run=True)["payment_reminder"], 3)
+        report = retention.report()
+        self.assertEqual(report["tables"][0]["rows"], before)
+        self.assertEqual(sum(rows for _, rows in report["notifications_per_month"]), 1)
+        self.assertEqual(Notification.objects.count(), before)
+        self.assertEqual(list(self.directory.iterdir()), [])
@@ -0,0 +1,73 @@
+"""
+Unread notification counters.
+
+Every change to the number of unread notifications goes through here, in
+the same transaction as the change itself: single creates and deletes via
+signals (communications/signals.py), bulk fan-out via ``add()`` and
+marking as read via ``mark_read()``. Reads are one primary-key lookup of the
+user's NotificationCounter row. The count is not cached: fan-out runs in the
+worker process, which could not clear a cache local to the web process.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+
+from .models import Notification, NotificationCounter
+
+
+def add(user_ids, amount=1):
+    """
+    Add ``amount`` (which may be negative) unread notifications for each of
+    ``user_ids`` (distinct ids). Two queries however many users: create the
+    missing counters, then one UPDATE.
+    """
+    user_ids = list(user_ids)
+    if not user_ids or not amount:
+        return
+    with transaction.atomic():
+        if amount > 0:
+            # Not when decrementing: the user may be in the middle of being deleted
+            NotificationCounter.objects.bulk_create(
+                [NotificationCounter(user_id=user_id) for user_id in user_ids], ignore_conflicts=True
+            )
+        NotificationCounter.objects.filter(user_id__in=user_ids).update(
+            unread=Greatest(F("unread") + amount, 0)
+        )
+
+
+def mark_read(user, ids=None):
+    """
+    Mark ``user``'s notifications with the given ``ids`` (all of them when
+    None) as read, in one UPDATE. Returns the number of notifications that
+    were unread.
+    """
+    unread = Notification.objects.filter(user=user, read=False)
+    if ids is not None:
+        unread = unread.filter(id__in=ids)
+    with transaction.atomic():
+        changed = unread.update(read=True)
+        if changed:
+            if ids is None:
+                NotificationCounter.objects.filter(user=user).update(unread=0)
+            else:
+                NotificationCounter.objects.filter(user=user).update(unread=Greatest(F("unread") - changed, 0))
+    return changed
+
+
+def unread_count(user):
+    return NotificationCounter.objects.filter(user=user).values_list("unread", flat=True).first() or 0
+
+
+def rebuild(user_ids=None):
+    """Recount unread notifications from the Notification table. Returns the number of counters written."""
+    users = Notification.objects.values("user_id").annotate(unread=Count("id", filter=Q(read=False))).order_by()
+    if user_ids is not None:
+        users = users.filter(user_id__in=user_ids)
+    counters = [NotificationCounter(user_id=row["user_id"], unread=row["unread"]) for row in users]
+    with transaction.atomic():
+        stale = NotificationCounter.objects.all()
+        if user_ids is not None:
+            stale = stale.filter(user_id__in=user_ids)
+        stale.delete()
+        NotificationCounter.objects.bulk_create(counters, batch_size=1000)
+    return len(counters)
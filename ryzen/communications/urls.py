@@ -6,4 +6,6 @@ app_name = "communications"
 urlpatterns = [
     path("coordinators/", views.coordinators_view, name="coordinators"),
     path("notifications/", views.notifications_view, name="notifications"),
+    path("notifications/stream/", views.notifications_stream, name="notifications_stream"),
+    path("notifications/mark-read/", views.mark_notifications_read, name="mark_notifications_read"),
 ]
@@ -1,9 +1,18 @@
+import json
+import time
+
 from django.shortcuts import render, redirect
 from django.contrib import messages
-from django.core.paginator import Paginator
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST
+from asgiref.sync import sync_to_async
 from member.models import Member
 from .models import CoordinatorMessage, Notification
 from .forms import CoordinatorMessageForm
+from core.jobs import enqueue
+from core.pagination import akeyset_page, keyset_page
+from . import pubsub, unread
 
 
 def coordinators_view(request):
@@ -32,34 +41,33 @@ def coordinators_view(request):
 
             category = form.cleaned_data.get("category") or "general"
 
-            targets = msg.target_members.all() if msg.target_members.exists() else stokvel.members.all()
-            for m in targets:
-                Notification.objects.create(
-                    user=m.user,
-                    title=f"Communication : {msg.sender.get_full_name() or msg.sender.username}",
-                    message=msg.message,
-                    category=category
-                )
+            enqueue(
+                "communications.fan_out",
+                {"message_id": msg.pk, "category": category},
+                idempotency_key=f"fan_out:{msg.pk}",
+            )
             messages.success(request, "Message sent successfully!")
             return redirect("communications:coordinators")
     else:
         form = CoordinatorMessageForm()
         selected_members = []
 
-    form.fields['target_members'].queryset = stokvel.members.all()
+    target_members = stokvel.members.select_related('user')
+    form.fields['target_members'].queryset = target_members
 
     # ----------------------------
-    # Paginate messages
+    # Paginate messages (keyset, see core/pagination.py)
     # ----------------------------
-    messages_qs = CoordinatorMessage.objects.filter(stokvel=stokvel).order_by('-created_at')
-    paginator = Paginator(messages_qs, 10)
-    page_number = request.GET.get('page')
-    messages_page = paginator.get_page(page_number)
+    messages_qs = CoordinatorMessage.objects.filter(stokvel=stokvel).select_related('sender')
+    messages_page = keyset_page(
+        messages_qs, request.GET.get('cursor'), per_page=10, with_count=settings.FEED_SHOW_COUNT
+    )
 
     context = {
         "member": member,
         "stokvel": stokvel,
         "form": form,
+        "target_members": target_members,
         "messages_page": messages_page,
         "selected_members": selected_members,
     }
@@ -67,16 +75,95 @@ def coordinators_view(request):
 
 
 
-def notifications_view(request):
-    if not request.user.is_authenticated:
+async def notifications_view(request):
+    user = await request.auser()
+    if not user.is_authenticated:
         return redirect("core:login")
 
-    notifications_qs = request.user.notifications.order_by('-created_at')
-    paginator = Paginator(notifications_qs, 10)
-    page_number = request.GET.get('page')
-    notifications_page = paginator.get_page(page_number)
+    notifications_page = await akeyset_page(
+        user.notifications.all(), request.GET.get('cursor'), per_page=10, with_count=settings.FEED_SHOW_COUNT
+    )
 
     context = {
         "notifications_page": notifications_page
     }
-    return render(request, "communications/notifications.html", context)
+    return await sync_to_async(render)(request, "communications/notifications.html", context)
+
+
+
+@require_POST
+def mark_notifications_read(request):
+    """
+    Mark the posted notification ``ids`` (or every notification, with
+    ``all``) as read in a single UPDATE. Answers JSON to fetch() calls and
+    redirects back to the feed otherwise.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({"status": "unauthenticated"}, status=401)
+
+    if request.POST.get("all"):
+        ids = None
+    else:
+        ids = [int(i) for i in request.POST.getlist("ids") if i.isdigit()]
+    updated = unread.mark_read(request.user, ids) if ids != [] else 0
+
+    if request.headers.get("x-requested-with") == "XMLHttpRequest" or "application/json" in request.headers.get("accept", ""):
+        return JsonResponse({"updated": updated, "unread": unread.unread_count(request.user)})
+    return redirect("communications:notifications")
+
+
+def _sse(event, data, event_id=None):
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event}", f"data: {json.dumps(data)}"]
+    return "\n".join(lines) + "\n\n"
+
+
+async def notifications_stream(request):
+    """
+    Server-Sent Events stream of the user's new notifications.
+
+    Each notification is sent as a ``notification`` event whose id is the
+    Notification id, followed by an ``unread`` event with the badge count.
+    A reconnecting EventSource sends ``Last-Event-ID`` and resumes right
+    after it; a first connection starts from the newest notification.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({"status": "unauthenticated"}, status=401)
+
+    last_id = request.headers.get("Last-Event-ID") or request.GET.get("last_id")
+    if last_id is None or not last_id.isdigit():
+        last_id = await user.notifications.order_by("-id").values_list("id", flat=True).afirst() or 0
+    last_id = int(last_id)
+
+    async def events():
+        nonlocal last_id
+        deadline = time.monotonic() + settings.NOTIFICATION_STREAM_MAX_AGE
+        yield "retry: 3000\n\n"
+        async with pubsub.get_broker().subscribe(user.pk) as subscription:
+            while time.monotonic() < deadline:
+                new = [
+                    n async for n in user.notifications.filter(id__gt=last_id).order_by("id")[:100]
+                ]
+                for n in new:
+                    last_id = n.pk
+                    yield _sse("notification", {
+                        "id": n.pk,
+                        "title": n.title,
+                        "message": n.message,
+                        "category": n.category,
+                        "category_display": n.get_category_display(),
+                        "created_at": n.created_at.isoformat(),
+                    }, event_id=n.pk)
+                if new:
+                    yield _sse("unread", {"count": await sync_to_async(unread.unread_count)(user)}, event_id=last_id)
+                    if len(new) == 100:
+                        continue
+                timeout = min(settings.NOTIFICATION_STREAM_HEARTBEAT, max(deadline - time.monotonic(), 0))
+                if not await subscription.wait(timeout):
+                    yield ": keep-alive\n\n"
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,174 @@
+"""
+View benchmarks with checked-in budgets.
+
+Each scale in ``SCALES`` seeds one synthetic stokvel (``member.mockdata``)
+and drives the main pages through the test client as its coordinator,
+recording per view:
+
+``queries``
+    SQL queries issued with cold caches. This must not grow with the size
+    of the stokvel; a per-member query loop shows up here first.
+``cold_ms`` / ``ms``
+    Wall time of the cold request, and the median of ``repeat`` requests
+    after it (caches warm).
+``peak_kb``
+    Peak memory allocated by Python during the cold request (tracemalloc).
+
+``check`` compares a report with the budgets in ``benchmark_budgets.json``
+(see ``manage.py benchmark_views``). The AI assistant runs against
+``FakeLLMClient``, so no external service is called.
+"""
+import json
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment,
+)
+from django.urls import reverse
+
+from member import mockdata
+from . import jobs
+
+BUDGETS_PATH = Path(__file__).with_name("benchmark_budgets.json")
+
+SCALES = {
+    "small": {"members": 10, "months": 3, "notifications": 20, "messages": 20},
+    "medium": {"members": 100, "months": 12, "notifications": 100, "messages": 200},
+    "large": {"members": 1000, "months": 24, "notifications": 500, "messages": 1000},
+}
+
+# name: (method, url name, POST data)
+VIEWS = {
+    "dashboard": ("get", "member:dashboard", None),
+    "profile": ("get", "member:profile", None),
+    "ai_analytics": ("get", "member:ai_analytics", None),
+    "ai_analytics_ask": ("post", "member:ai_analytics", {"query": "How much has the stokvel saved?"}),
+    "coordinators": ("get", "communications:coordinators", None),
+    "notifications": ("get", "communications:notifications", None),
+}
+
+
+def load_budgets(path=BUDGETS_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+@contextmanager
+def throwaway_database():
+    """Run the block against a throwaway test database, as ``manage.py test`` does."""
+    setup_test_environment(debug=False)
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def seed(scale, index=0):
+    """Create the stokvel for ``scale`` and return its coordinator (the first member)."""
+    mockdata.generate(stokvels=1, seed=index, **SCALES[scale])
+    return User.objects.get(username=f"mock{index}-0-000000")
+
+
+def _request(client, method, path, data):
+    response = getattr(client, method)(path, data) if data else getattr(client, method)(path)
+    if response.streaming:
+        b"".join(response.streaming_content)
+    if response.status_code >= 400:
+        raise RuntimeError(f"{method.upper()} {path} returned {response.status_code}")
+    return response
+
+
+def _before(name):
+    # Let the queued assistant job finish, so every question starts from the same state
+    if name == "ai_analytics_ask":
+        jobs.work(burst=True)
+
+
+def measure(client, name, repeat=5):
+    """Measure one view (a key of ``VIEWS``) as the client's logged in user."""
+    method, url_name, data = VIEWS[name]
+    path = reverse(url_name)
+    for cache in caches.all():
+        cache.clear()
+
+    _before(name)
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            _request(client, method, path, data)
+            cold = time.perf_counter() - started
+        # Read now: every request start resets the query log
+        queries = len(captured.captured_queries)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    timings = []
+    for _ in range(repeat):
+        _before(name)
+        started = time.perf_counter()
+        _request(client, method, path, data)
+        timings.append(time.perf_counter() - started)
+    return {
+        "queries": queries,
+        "cold_ms": round(cold * 1000, 2),
+        "ms": round(statistics.median(timings) * 1000, 2) if timings else round(cold * 1000, 2),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def run(scales=None, views=None, repeat=5):
+    """
+    Seed each scale and measure each view. Must run against a disposable
+    database (a test case, or inside :func:`throwaway_database`).
+
+    Returns ``{"vendor": ..., "repeat": ..., "scales": {scale: {view: measurements}}}``.
+    """
+    scales = scales or list(SCALES)
+    views = views or list(VIEWS)
+    unknown = (set(scales) - set(SCALES)) | (set(views) - set(VIEWS))
+    if unknown:
+        raise ValueError(f"Unknown scales or views: {', '.join(sorted(unknown))}")
+
+    report = {"vendor": connection.vendor, "repeat": repeat, "scales": {}}
+    with override_settings(LLM_CLIENT="member.llm.FakeLLMClient", LLM_FAKE_DELAY=0, JOBS_RUN_INLINE=False):
+        for index, scale in enumerate(scales):
+            client = Client()
+            client.force_login(seed(scale, index))
+            report["scales"][scale] = {name: measure(client, name, repeat) for name in views}
+    return report
+
+
+def check(report, budgets, timing=True):
+    """
+    Return a list of budget violations in ``report``. Query counts are
+    always checked; wall time and memory only with ``timing``, since they
+    depend on the machine.
+    """
+    problems = []
+    for scale, views in report["scales"].items():
+        for name, result in views.items():
+            budget = budgets.get(name)
+            if budget is None:
+                problems.append(f"{name}: no budget")
+                continue
+            if result["queries"] > budget["queries"]:
+                problems.append(f"{scale}/{name}: {result['queries']} queries, budget {budget['queries']}")
+            if not timing:
+                continue
+            for metric in ("ms", "peak_kb"):
+                limit = budget.get(metric, {}).get(scale)
+                if limit is not None and result[metric] > limit:
+                    problems.append(f"{scale}/{name}: {metric} {result[metric]}, budget {limit}")
+    return problems
@@ -0,0 +1,130 @@
+"""
+Concurrency benchmark for a running server.
+
+Fires ``concurrency`` simultaneous requests at a URL, logged in as a
+throwaway benchmark member, and reports throughput, latency and how many
+requests the server was working on at the same time. Run it against one
+WSGI worker and one uvicorn worker serving the same code to see how many
+slow requests (such as a streamed AI answer) each can hold at once.
+"""
+import asyncio
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.utils.crypto import get_random_string
+
+from member.models import Member
+from stokvel.models import Stokvel
+
+BENCH_PREFIX = "bench-concurrency"
+
+
+@contextmanager
+def benchmark_login():
+    """
+    Session and CSRF cookies for a throwaway benchmark member. The server
+    under test runs in another process, so the member has to be committed;
+    the user, member, stokvel and session are deleted again on exit.
+    """
+    name = f"{BENCH_PREFIX}-{get_random_string(8).lower()}"
+    stokvel = Stokvel.objects.create(name=name, monthly_contribution=Decimal("100.00"))
+    user = User.objects.create(username=name)
+    session = import_module(settings.SESSION_ENGINE).SessionStore()
+    try:
+        user.set_unusable_password()
+        user.save()
+        Member.objects.create(user=user, stokvel=stokvel)
+
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        yield {settings.SESSION_COOKIE_NAME: session.session_key, settings.CSRF_COOKIE_NAME: get_random_string(32)}
+    finally:
+        session.delete()
+        user.delete()
+        stokvel.delete()
+
+
+def peak_overlap(intervals):
+    """The largest number of ``(start, end)`` intervals open at the same moment."""
+    events = sorted([(start, 1) for start, _ in intervals] + [(end, -1) for _, end in intervals])
+    peak = current = 0
+    for _, change in events:
+        current += change
+        peak = max(peak, current)
+    return peak
+
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))] if ordered else 0.0
+
+
+async def _fetch(client, url, data, semaphore, started, results):
+    async with semaphore:
+        sent = time.perf_counter()
+        first_byte = None
+        try:
+            method = "POST" if data else "GET"
+            async with client.stream(method, url, data=data) as response:
+                async for _ in response.aiter_bytes():
+                    first_byte = first_byte or time.perf_counter()
+                status = response.status_code
+        except Exception as exc:
+            status = type(exc).__name__
+        done = time.perf_counter()
+        results.append({
+            "status": status,
+            "latency": done - sent,
+            # The server is busy with the request from its first byte to its last
+            "busy": (first_byte or done) - started, "done": done - started,
+        })
+
+
+async def _run(url, concurrency, total, data, cookies, timeout):
+    import httpx
+
+    headers = {"X-CSRFToken": cookies[settings.CSRF_COOKIE_NAME]}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    results = []
+    async with httpx.AsyncClient(cookies=cookies, headers=headers, limits=limits, timeout=timeout) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(_fetch(client, url, data, semaphore, started, results) for _ in range(total)))
+        elapsed = time.perf_counter() - started
+    return results, elapsed
+
+
+def run(url, concurrency=50, total=200, data=None, timeout=120.0):
+    """
+    Send ``total`` requests to ``url``, ``concurrency`` at a time, and return a report.
+
+    ``data`` makes the requests form POSTs. The report holds the wall-clock
+    time, throughput, p50/p95/max latency in milliseconds, the status code
+    counts and ``server_concurrency``: the peak number of requests that had
+    started answering but not yet finished.
+    """
+    with benchmark_login() as cookies:
+        results, elapsed = asyncio.run(_run(url, concurrency, total, data, cookies, timeout))
+    latencies = [r["latency"] for r in results]
+    statuses = {}
+    for r in results:
+        statuses[str(r["status"])] = statuses.get(str(r["status"]), 0) + 1
+    return {
+        "url": url,
+        "concurrency": concurrency,
+        "requests": total,
+        "seconds": round(elapsed, 3),
+        "throughput": round(total / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 1),
+        "max_ms": round(max(latencies, default=0.0) * 1000, 1),
+        "statuses": statuses,
+        "server_concurrency": peak_overlap([(r["busy"], r["done"]) for r in results]),
+    }
@@ -0,0 +1,218 @@
+"""
+A small database-backed job queue.
+
+Handlers are registered with the ``@job("name")`` decorator in an app's
+``tasks.py`` module (loaded automatically at startup) and queued with
+``enqueue()``. Workers started with ``manage.py run_worker`` claim due jobs,
+run them and record the outcome on the Job row.
+
+Delivery is at-least-once: a job whose worker dies is re-queued once its lock
+goes stale, and failed jobs are retried with exponential backoff. Handlers
+run outside any transaction, so slow work such as an LLM call never holds a
+database lock. A handler that wraps its final writes in :func:`finish` has
+them committed in the same transaction that marks the job as succeeded, and
+only if this worker still holds the job, so they are not applied twice;
+anything it does before that must be safe to repeat.
+"""
+import logging
+import os
+import random
+import socket
+import time
+import traceback
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+_running = ContextVar("running_job", default=None)
+
+
+def job(name):
+    """Register the decorated function as the handler for jobs called ``name``."""
+    def register(func):
+        _registry[name] = func
+        return func
+    return register
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue(name, payload=None, idempotency_key=None, run_at=None, max_attempts=None):
+    """
+    Queue a job and return its Job row.
+
+    Enqueuing twice with the same ``idempotency_key`` returns the existing job
+    instead of creating a second one. With ``JOBS_RUN_INLINE`` the job runs in
+    this process as soon as the surrounding transaction commits.
+    """
+    if name not in _registry:
+        raise ValueError(f"No job handler registered for '{name}'")
+    fields = {
+        "name": name,
+        "payload": payload or {},
+        "run_at": run_at or timezone.now(),
+        "max_attempts": max_attempts or _setting("JOB_MAX_ATTEMPTS", 5),
+    }
+    if idempotency_key:
+        try:
+            with transaction.atomic():
+                queued, created = Job.objects.get_or_create(idempotency_key=idempotency_key, defaults=fields)
+        except IntegrityError:
+            queued, created = Job.objects.get(idempotency_key=idempotency_key), False
+        if not created:
+            return queued
+    else:
+        queued = Job.objects.create(**fields)
+
+    if _setting("JOBS_RUN_INLINE", False):
+        transaction.on_commit(lambda: _run_inline(queued.pk))
+    return queued
+
+
+def _run_inline(job_id):
+    for claimed in claim("inline", ids=[job_id]):
+        run(claimed)
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim(worker_id, limit=1, ids=None):
+    """
+    Lock up to ``limit`` due jobs for ``worker_id`` and return them.
+
+    Rows are selected with ``SELECT ... FOR UPDATE SKIP LOCKED`` where the
+    database supports it; the conditional status UPDATE that follows is what
+    guarantees two workers never claim the same job (including on SQLite).
+    Running jobs whose lock is older than ``JOB_LOCK_TIMEOUT`` seconds are
+    considered abandoned and claimed again.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=_setting("JOB_LOCK_TIMEOUT", 300))
+    due = Job.objects.filter(
+        Q(status=Job.QUEUED, run_at__lte=now) | Q(status=Job.RUNNING, locked_at__lt=stale)
+    )
+    if ids is not None:
+        due = due.filter(pk__in=ids)
+
+    claimed = []
+    with transaction.atomic():
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        for candidate in due.order_by("run_at", "id")[:limit]:
+            won = Job.objects.filter(
+                pk=candidate.pk, status=candidate.status, locked_at=candidate.locked_at
+            ).update(
+                status=Job.RUNNING,
+                locked_by=worker_id,
+                locked_at=now,
+                attempts=F("attempts") + 1,
+                updated_at=now,
+            )
+            if won:
+                candidate.refresh_from_db()
+                claimed.append(candidate)
+    return claimed
+
+
+def backoff(attempts):
+    """Seconds to wait before retry number ``attempts``: exponential, capped, with jitter."""
+    base = _setting("JOB_RETRY_BACKOFF", 2)
+    delay = min(base * 2 ** (attempts - 1), _setting("JOB_RETRY_BACKOFF_MAX", 3600))
+    return delay * random.uniform(0.8, 1.2)
+
+
+class LostClaim(Exception):
+    """The job was reclaimed by another worker (its lock went stale) while it ran."""
+
+
+def _owned(claimed):
+    """The job's row, as long as it is still this worker's claim."""
+    return Job.objects.filter(pk=claimed.pk, locked_by=claimed.locked_by, attempts=claimed.attempts)
+
+
+def _succeed(claimed, result):
+    updated = _owned(claimed).update(
+        status=Job.SUCCEEDED, result=result, locked_by=None, locked_at=None,
+        last_error="", updated_at=timezone.now(),
+    )
+    if not updated:
+        raise LostClaim(f"Job {claimed.name} #{claimed.pk} was claimed again by another worker")
+    claimed.status, claimed.result = Job.SUCCEEDED, result
+
+
+def finish(write):
+    """
+    Call ``write()`` in one transaction with marking the running job as
+    succeeded, and return its result (which becomes the job's result). For
+    the last, database-only step of a handler. If the job has meanwhile been
+    claimed by another worker, :class:`LostClaim` is raised and ``write()``
+    is rolled back.
+    """
+    claimed = _running.get()
+    with transaction.atomic():
+        result = write()
+        if claimed is not None:
+            _succeed(claimed, result)
+    return result
+
+
+def run(claimed):
+    """Run a claimed job and record success, a scheduled retry, or failure."""
+    handler = _registry.get(claimed.name)
+    token = _running.set(claimed)
+    try:
+        if handler is None:
+            raise LookupError(f"No job handler registered for '{claimed.name}'")
+        result = handler(**claimed.payload)
+        if claimed.status != Job.SUCCEEDED:
+            _succeed(claimed, result)
+    except LostClaim:
+        # The outcome is now the other worker's to record
+        logger.warning("Job %s #%s was claimed again while running", claimed.name, claimed.pk)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("Job %s #%s failed (attempt %s)", claimed.name, claimed.pk, claimed.attempts)
+        fields = {"last_error": error, "locked_by": None, "locked_at": None, "updated_at": timezone.now()}
+        if claimed.attempts < claimed.max_attempts:
+            fields.update(status=Job.QUEUED, run_at=timezone.now() + timedelta(seconds=backoff(claimed.attempts)))
+        else:
+            fields.update(status=Job.FAILED)
+        _owned(claimed).update(**fields)
+        claimed.status, claimed.last_error = fields["status"], error
+    finally:
+        _running.reset(token)
+    return claimed
+
+
+def work(worker_id=None, sleep=1.0, burst=False):
+    """
+    Claim and run jobs until stopped. With ``burst`` return once the queue is
+    drained. Returns the number of jobs processed.
+
+    Jobs are claimed one at a time, just before they run: a claimed job
+    waiting behind slow ones could see its lock go stale and be run twice.
+    """
+    worker_id = worker_id or default_worker_id()
+    processed = 0
+    while True:
+        claimed = claim(worker_id)
+        for item in claimed:
+            run(item)
+        processed += len(claimed)
+        if not claimed:
+            if burst:
+                return processed
+            time.sleep(sleep)
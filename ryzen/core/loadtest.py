@@ -0,0 +1,165 @@
+"""
+Concurrent load test against the configured database.
+
+Worker threads, each on its own database connection, run a weighted mix of
+the platform's hot paths: onboarding a member, recording a contribution
+(which also updates balances and rollups), broadcasting a coordinator
+message to the whole stokvel, and building the stokvel dashboard. All data
+is created in a throwaway stokvel and removed afterwards.
+
+Run it once on SQLite and once with DATABASE_URL pointing at PostgreSQL to
+compare the two backends (see ``manage.py load_test``).
+"""
+import random
+import threading
+import time
+import uuid
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+
+from communications.models import CoordinatorMessage
+from communications.services import fan_out
+from member.dashboard import build_stokvel_dashboard
+from member.models import FinancialRecord, Member
+from stokvel.models import Stokvel
+
+DEFAULT_MIX = {"onboard": 1, "contribute": 5, "broadcast": 1, "dashboard": 3}
+
+
+class Sandbox:
+    """The throwaway stokvel, its coordinator and members used by one run."""
+
+    def __init__(self, members=20):
+        self.prefix = f"loadtest-{uuid.uuid4().hex[:8]}"
+        # Hashing is deliberately slow; every generated user shares one hash
+        self.password = make_password("loadtest")
+        self.stokvel = Stokvel.objects.create(name=self.prefix, monthly_contribution=Decimal("500.00"))
+        self.coordinator = User.objects.create(username=f"{self.prefix}-coordinator", password=self.password)
+        self.member_ids = [self.onboard().pk for _ in range(members)]
+        self._lock = threading.Lock()
+
+    def onboard(self):
+        with transaction.atomic():
+            user = User.objects.create(username=f"{self.prefix}-{uuid.uuid4().hex[:12]}", password=self.password)
+            member = Member.objects.create(user=user, stokvel=self.stokvel)
+        return member
+
+    def random_member_id(self):
+        with self._lock:
+            return random.choice(self.member_ids)
+
+    def add_member_id(self, member_id):
+        with self._lock:
+            self.member_ids.append(member_id)
+
+    def remove(self):
+        User.objects.filter(username__startswith=self.prefix).delete()
+        self.stokvel.delete()
+
+
+def _onboard(sandbox):
+    sandbox.add_member_id(sandbox.onboard().pk)
+
+
+def _contribute(sandbox):
+    FinancialRecord.objects.create(member_id=sandbox.random_member_id(), amount_saved=Decimal("100.00"))
+
+
+def _broadcast(sandbox):
+    message = CoordinatorMessage.objects.create(
+        stokvel=sandbox.stokvel, sender=sandbox.coordinator, message="Load test broadcast"
+    )
+    fan_out(message)
+
+
+def _dashboard(sandbox):
+    build_stokvel_dashboard(sandbox.stokvel, date.today())
+
+
+OPERATIONS = {
+    "onboard": _onboard,
+    "contribute": _contribute,
+    "broadcast": _broadcast,
+    "dashboard": _dashboard,
+}
+
+
+def _percentile(values, percent):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def _worker(sandbox, names, weights, iterations, timings, errors):
+    try:
+        for _ in range(iterations):
+            name = random.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                OPERATIONS[name](sandbox)
+            except Exception as exc:
+                errors[name].append(f"{type(exc).__name__}: {exc}")
+            else:
+                timings[name].append(time.perf_counter() - started)
+    finally:
+        connection.close()
+
+
+def run(threads=8, iterations=50, members=20, mix=None, seed=None):
+    """
+    Run ``iterations`` operations on each of ``threads`` threads and return a report.
+
+    The report is a dict with the database vendor, the wall-clock time, the
+    overall throughput and, per operation, the count, error count, sample
+    errors and p50/p95 latency in milliseconds.
+    """
+    mix = mix or DEFAULT_MIX
+    unknown = set(mix) - set(OPERATIONS)
+    if unknown:
+        raise ValueError(f"Unknown operations: {', '.join(sorted(unknown))}")
+    if seed is not None:
+        random.seed(seed)
+
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    timings = {name: [] for name in names}
+    errors = {name: [] for name in names}
+
+    sandbox = Sandbox(members=members)
+    try:
+        workers = [
+            threading.Thread(target=_worker, args=(sandbox, names, weights, iterations, timings, errors))
+            for _ in range(threads)
+        ]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        sandbox.remove()
+
+    completed = sum(len(values) for values in timings.values())
+    return {
+        "vendor": connection.vendor,
+        "threads": threads,
+        "iterations": iterations,
+        "seconds": round(elapsed, 3),
+        "throughput": round(completed / elapsed, 1) if elapsed else 0.0,
+        "operations": {
+            name: {
+                "count": len(timings[name]),
+                "errors": len(errors[name]),
+                "sample_errors": sorted(set(errors[name]))[:3],
+                "p50_ms": round(_percentile(timings[name], 50) * 1000, 2),
+                "p95_ms": round(_percentile(timings[name], 95) * 1000, 2),
+            }
+            for name in names
+        },
+    }
@@ -0,0 +1,48 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from core import httpbench
+
+
+class Command(BaseCommand):
+    help = "Measure how many concurrent requests a running server (WSGI or ASGI) handles at once"
+
+    def add_arguments(self, parser):
+        parser.add_argument("url", help="Full URL, e.g. http://127.0.0.1:8000/ai-analytics/stream/")
+        parser.add_argument("--concurrency", type=int, default=50, help="Requests in flight at once")
+        parser.add_argument("--requests", type=int, default=200, help="Total requests to send")
+        parser.add_argument(
+            "--data", action="append", default=[], metavar="KEY=VALUE",
+            help="Form field to POST (repeatable); without it requests are GETs",
+        )
+        parser.add_argument("--timeout", type=float, default=120.0, help="Seconds before a request is abandoned")
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+
+    def handle(self, *args, **options):
+        try:
+            import httpx  # noqa: F401
+        except ImportError:
+            raise CommandError("bench_concurrency needs httpx (pip install httpx)")
+        try:
+            data = dict(item.split("=", 1) for item in options["data"])
+        except ValueError:
+            raise CommandError("--data must look like KEY=VALUE")
+
+        report = httpbench.run(
+            options["url"],
+            concurrency=options["concurrency"],
+            total=options["requests"],
+            data=data or None,
+            timeout=options["timeout"],
+        )
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self.stdout.write(
+            f"{report['requests']} requests, {report['concurrency']} at a time, in {report['seconds']}s "
+            f"({report['throughput']} req/s)"
+        )
+        self.stdout.write(f"latency p50 {report['p50_ms']} ms, p95 {report['p95_ms']} ms, max {report['max_ms']} ms")
+        self.stdout.write(f"status codes: {report['statuses']}")
+        self.stdout.write(f"peak requests handled at once by the server: {report['server_concurrency']}")
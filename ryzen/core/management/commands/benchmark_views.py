@@ -0,0 +1,50 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from core import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed synthetic stokvels in a throwaway database, measure the main views "
+        "(queries, wall time, peak memory) and compare them with the checked-in budgets"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale", action="append", choices=list(benchmarks.SCALES), default=None,
+            help="Dataset scale to run (repeatable; default: all)",
+        )
+        parser.add_argument(
+            "--view", action="append", choices=list(benchmarks.VIEWS), default=None,
+            help="View to measure (repeatable; default: all)",
+        )
+        parser.add_argument("--repeat", type=int, default=5, help="Warm requests per view after the cold one")
+        parser.add_argument("--budgets", default=str(benchmarks.BUDGETS_PATH), help="Budgets file (JSON)")
+        parser.add_argument("--output", default=None, help="Write the report, with any violations, to this JSON file")
+        parser.add_argument(
+            "--no-timing", action="store_true",
+            help="Only enforce query budgets (wall time and memory depend on the machine)",
+        )
+
+    def handle(self, *args, **options):
+        budgets = benchmarks.load_budgets(options["budgets"])
+        with benchmarks.throwaway_database():
+            report = benchmarks.run(scales=options["scale"], views=options["view"], repeat=options["repeat"])
+        report["violations"] = benchmarks.check(report, budgets, timing=not options["no_timing"])
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+
+        self.stdout.write(f"{'scale':<8}{'view':<18}{'queries':>8}{'cold ms':>10}{'ms':>10}{'peak KiB':>10}")
+        for scale, views in report["scales"].items():
+            for name, row in views.items():
+                self.stdout.write(
+                    f"{scale:<8}{name:<18}{row['queries']:>8}{row['cold_ms']:>10}{row['ms']:>10}{row['peak_kb']:>10}"
+                )
+        if report["violations"]:
+            for problem in report["violations"]:
+                self.stdout.write(self.style.ERROR(problem))
+            raise CommandError(f"{len(report['violations'])} budget violation(s)")
+        self.stdout.write(self.style.SUCCESS("All views within budget."))
@@ -0,0 +1,52 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from core import loadtest
+
+
+class Command(BaseCommand):
+    help = "Measure throughput of concurrent onboarding, contributions, broadcasts and dashboards on the configured database"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8, help="Concurrent worker threads")
+        parser.add_argument("--iterations", type=int, default=50, help="Operations per thread")
+        parser.add_argument("--members", type=int, default=20, help="Members created in the sandbox stokvel up front")
+        parser.add_argument(
+            "--mix", default=None,
+            help="Operation weights, e.g. 'contribute=5,dashboard=3' (default: %s)"
+            % ",".join(f"{k}={v}" for k, v in loadtest.DEFAULT_MIX.items()),
+        )
+        parser.add_argument("--seed", type=int, default=None, help="Random seed for a repeatable operation mix")
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+
+    def handle(self, *args, **options):
+        mix = None
+        if options["mix"]:
+            try:
+                mix = {name: int(weight) for name, weight in (item.split("=") for item in options["mix"].split(","))}
+            except ValueError:
+                raise CommandError("--mix must look like 'contribute=5,dashboard=3'")
+        try:
+            report = loadtest.run(
+                threads=options["threads"],
+                iterations=options["iterations"],
+                members=options["members"],
+                mix=mix,
+                seed=options["seed"],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(
+            f"{report['vendor']}: {report['threads']} threads x {report['iterations']} operations "
+            f"in {report['seconds']}s ({report['throughput']} ops/s)"
+        )
+        self.stdout.write(f"{'operation':<12}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}")
+        for name, row in report["operations"].items():
+            self.stdout.write(f"{name:<12}{row['count']:>8}{row['errors']:>8}{row['p50_ms']:>10}{row['p95_ms']:>10}")
+            for error in row["sample_errors"]:
+                self.stdout.write(self.style.WARNING(f"  {error}"))
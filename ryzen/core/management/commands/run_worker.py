@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from core import jobs
+
+
+class Command(BaseCommand):
+    help = "Run a background worker that processes queued jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--worker-id", default=None, help="Name recorded on claimed jobs (default host:pid)")
+        parser.add_argument("--sleep", type=float, default=1.0, help="Seconds to wait when the queue is empty")
+        parser.add_argument("--burst", action="store_true", help="Exit once the queue is empty")
+
+    def handle(self, *args, **options):
+        worker_id = options["worker_id"] or jobs.default_worker_id()
+        self.stdout.write(f"Worker {worker_id} started.")
+        processed = jobs.work(
+            worker_id=worker_id,
+            sleep=options["sleep"],
+            burst=options["burst"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} jobs."))
@@ -0,0 +1,162 @@
+"""
+Keyset (cursor) pagination for newest-first feeds.
+
+Pages are found by position rather than by OFFSET: a page continues from
+the ``(created_at, id)`` of the last row the reader saw, which is encoded in
+an opaque, signed token. With an index on ``(<filter>, -created_at, -id)``
+each page costs the same however deep the reader scrolls, and no
+``COUNT(*)`` is issued unless asked for.
+"""
+from django.core import signing
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+_SALT = "core.pagination.cursor"
+NEXT, PREVIOUS = "n", "p"
+
+
+class KeysetPage:
+    """One page of a feed, newest first, with tokens for the pages around it."""
+
+    def __init__(self, object_list, next_token=None, previous_token=None, count=None):
+        self.object_list = object_list
+        self.next_token = next_token
+        self.previous_token = previous_token
+        self.count = count
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @property
+    def has_next(self):
+        return self.next_token is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_token is not None
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+def encode_cursor(obj, direction, key="created_at"):
+    return signing.dumps([getattr(obj, key).isoformat(), obj.pk, direction], salt=_SALT)
+
+
+def decode_cursor(token):
+    """``(timestamp, pk, direction)`` from a token, or None if it is missing or invalid."""
+    if not token:
+        return None
+    try:
+        stamp, pk, direction = signing.loads(token, salt=_SALT)
+        stamp = parse_datetime(stamp)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    if stamp is None or direction not in (NEXT, PREVIOUS):
+        return None
+    return stamp, int(pk), direction
+
+
+def _window(queryset, token, per_page, key):
+    """The query for the requested page (one row extra, to see if more follow) and its direction."""
+    cursor = decode_cursor(token)
+    if cursor is None:
+        return queryset.order_by(f"-{key}", "-pk")[:per_page + 1], None
+    stamp, pk, direction = cursor
+    if direction == NEXT:
+        # The plain range condition lets the database seek straight into the index
+        rows = queryset.filter(**{f"{key}__lte": stamp}).filter(
+            Q(**{f"{key}__lt": stamp}) | Q(pk__lt=pk)
+        ).order_by(f"-{key}", "-pk")
+    else:
+        rows = queryset.filter(**{f"{key}__gte": stamp}).filter(
+            Q(**{f"{key}__gt": stamp}) | Q(pk__gt=pk)
+        ).order_by(key, "pk")
+    return rows[:per_page + 1], direction
+
+
+def _page(rows, direction, per_page, key, count):
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == PREVIOUS:
+        rows.reverse()
+    # Beyond the first page there is always a way back; further pages exist if the extra row came back
+    older = more if direction != PREVIOUS else bool(rows)
+    newer = direction is not None and (more if direction == PREVIOUS else bool(rows))
+    return KeysetPage(
+        rows,
+        next_token=encode_cursor(rows[-1], NEXT, key) if older else None,
+        previous_token=encode_cursor(rows[0], PREVIOUS, key) if newer else None,
+        count=count,
+    )
+
+
+def keyset_page(queryset, token=None, per_page=20, key="created_at", with_count=False):
+    """
+    The page of ``queryset`` (newest ``key`` first) that ``token`` points to,
+    or the first page. ``with_count`` adds the total row count, at the price
+    of a ``COUNT(*)``.
+    """
+    window, direction = _window(queryset, token, per_page, key)
+    count = queryset.count() if with_count else None
+    return _page(list(window), direction, per_page, key, count)
+
+
+async def akeyset_page(queryset, token=None, per_page=20, key="created_at", with_count=False):
+    """Async :func:`keyset_page`."""
+    window, direction = _window(queryset, token, per_page, key)
+    count = await queryset.acount() if with_count else None
+    return _page([obj async for obj in window], direction, per_page, key, count)
+
+
+def estimated_count(model, using="default"):
+    """
+    Rows in ``model``'s table according to the database's statistics, or
+    None if it has none (SQLite only keeps them after ``ANALYZE``).
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+            elif connection.vendor == "sqlite":
+                cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+            else:
+                return None
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if row is None or row[0] is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    # PostgreSQL reports -1 for a table that was never analyzed
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for very large tables. ``COUNT(*)`` of a whole table reads
+    all of it, so an unfiltered queryset is counted from the table
+    statistics instead; filtered querysets, and tables the statistics put
+    under ``exact_below`` rows, are counted exactly.
+    """
+    exact_below = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= self.exact_below:
+                return estimate
+        return super().count
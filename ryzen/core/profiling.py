@@ -0,0 +1,330 @@
+"""
+Opt-in request profiling (``PROFILING = True``; ``PROFILING=1`` in the environment).
+
+``ProfilingMiddleware`` records for every request, under its view name:
+
+- the number of SQL queries and the time spent running them, plus the
+  fingerprints of queries issued more than once in the same request (a
+  per-row query loop shows up as one fingerprint repeated once per row);
+- template render time (queries run lazily from a template count in both);
+- time spent in external calls wrapped in :func:`external`, i.e. the LLM.
+
+The last ``PROFILING_WINDOW`` requests of each view are kept in memory for
+percentiles, which staff can read as JSON at ``/profiling/`` and in the
+Prometheus text format at ``/profiling/metrics/``. Every response also gets
+a ``Server-Timing`` header, shown by the browser's network panel.
+
+A ``PROFILING_CPROFILE_RATE`` fraction of requests run under cProfile, one
+at a time; the profile of any that take longer than ``PROFILING_SLOW_MS`` is
+written to ``PROFILING_DUMP_DIR`` (open it with ``python -m pstats`` or
+snakeviz). cProfile only sees the thread it was started in, so for async
+views it covers the event loop side and not the ORM calls made through
+``sync_to_async``.
+
+Numbers are per process, and the body of a streaming response is produced
+after the middleware has returned, so it is not included.
+"""
+import cProfile
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.base import Template
+from django.utils import timezone
+
+METRICS = ("duration_ms", "sql_queries", "sql_ms", "template_ms", "external_ms")
+QUANTILES = (50, 95, 99)
+
+_current = ContextVar("profiling_sample", default=None)
+_profiler_lock = threading.Lock()
+
+
+class Sample:
+    """What one request (or any block run under :func:`measure`) spent its time on."""
+
+    def __init__(self, name):
+        self.name = name
+        self.sql_queries = 0
+        self.sql_ms = 0.0
+        self.fingerprints = Counter()
+        self.template_ms = 0.0
+        self.template_depth = 0
+        self.external_ms = 0.0
+        self.duration_ms = 0.0
+        self.profile = None
+
+    def duplicates(self):
+        """``{fingerprint: times}`` of the queries run more than once."""
+        return {sql: times for sql, times in self.fingerprints.items() if times > 1}
+
+    def server_timing(self):
+        return (
+            f"db;desc=\"{self.sql_queries} queries\";dur={self.sql_ms:.1f}, tpl;dur={self.template_ms:.1f}, "
+            f"ext;dur={self.external_ms:.1f}, total;dur={self.duration_ms:.1f}"
+        )
+
+
+_IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    """``sql`` with its literals and IN lists collapsed, so repeats of one query compare equal."""
+    sql = _LITERALS.sub("?", sql)
+    return _SPACE.sub(" ", _IN_LIST.sub("IN (...)", sql)).strip()
+
+
+def _percentile(values, percent):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+class Stats:
+    """Rolling per-view samples, duplicate-query fingerprints and recent slow requests."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._windows = {}
+            self._totals = {}
+            self._duplicates = {}
+            self._slow = deque(maxlen=50)
+
+    def add(self, sample):
+        values = tuple(getattr(sample, metric) for metric in METRICS)
+        duplicates = sample.duplicates()
+        with self._lock:
+            window = self._windows.get(sample.name)
+            if window is None:
+                window = self._windows[sample.name] = deque(maxlen=settings.PROFILING_WINDOW)
+                self._totals[sample.name] = {"requests": 0, "with_duplicates": 0, **dict.fromkeys(METRICS, 0.0)}
+            window.append(values)
+            totals = self._totals[sample.name]
+            totals["requests"] += 1
+            for metric, value in zip(METRICS, values):
+                totals[metric] += value
+            if duplicates:
+                totals["with_duplicates"] += 1
+                seen = self._duplicates.setdefault(sample.name, {})
+                for sql, times in duplicates.items():
+                    seen[sql] = max(seen.get(sql, 0), times)
+                if len(seen) > 50:
+                    for sql in sorted(seen, key=seen.get)[:len(seen) - 50]:
+                        del seen[sql]
+            if sample.duration_ms >= settings.PROFILING_SLOW_MS:
+                self._slow.append({
+                    "view": sample.name,
+                    "duration_ms": round(sample.duration_ms, 2),
+                    "sql_queries": sample.sql_queries,
+                    "at": timezone.now().isoformat(),
+                    "profile": sample.profile,
+                })
+
+    def summary(self):
+        """Percentiles of every metric per view, worst duplicate queries and recent slow requests."""
+        with self._lock:
+            views = {}
+            for name, window in self._windows.items():
+                columns = list(zip(*window))
+                views[name] = {
+                    "requests": self._totals[name]["requests"],
+                    "requests_with_duplicate_queries": self._totals[name]["with_duplicates"],
+                    **{
+                        metric: {f"p{q}": round(_percentile(column, q), 2) for q in QUANTILES}
+                        for metric, column in zip(METRICS, columns)
+                    },
+                    "duplicate_queries": [
+                        {"sql": sql, "times": times}
+                        for sql, times in sorted(self._duplicates.get(name, {}).items(), key=lambda item: -item[1])[:10]
+                    ],
+                }
+            return {"views": views, "slow_requests": list(self._slow)}
+
+    def prometheus(self):
+        """The percentiles as Prometheus summaries (text exposition format)."""
+        lines = []
+        with self._lock:
+            for metric in METRICS:
+                family = f"ryzen_request_{metric}"
+                lines += [f"# HELP {family} Per-view request {metric.replace('_', ' ')}.", f"# TYPE {family} summary"]
+                for name, window in self._windows.items():
+                    view = _label(name)
+                    column = [values[METRICS.index(metric)] for values in window]
+                    for q in QUANTILES:
+                        lines.append(f'{family}{{view="{view}",quantile="{q / 100}"}} {_percentile(column, q):.3f}')
+                    lines.append(f'{family}_sum{{view="{view}"}} {self._totals[name][metric]:.3f}')
+                    lines.append(f'{family}_count{{view="{view}"}} {self._totals[name]["requests"]}')
+            family = "ryzen_requests_with_duplicate_queries_total"
+            lines += [f"# HELP {family} Requests that ran the same query more than once.", f"# TYPE {family} counter"]
+            for name, totals in self._totals.items():
+                lines.append(f'{family}{{view="{_label(name)}"}} {totals["with_duplicates"]}')
+        return "\n".join(lines) + "\n"
+
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+stats = Stats()
+
+
+def _record_query(execute, sql, params, many, context):
+    sample = _current.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        sample.sql_queries += 1
+        sample.sql_ms += (time.perf_counter() - started) * 1000
+        sample.fingerprints[fingerprint(sql)] += 1
+
+
+def _instrument(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def _timed_render(render):
+    @wraps(render)
+    def wrapper(self, context):
+        sample = _current.get()
+        if sample is None:
+            return render(self, context)
+        # Included and extended templates render inside their parent; count the outermost only
+        sample.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            sample.template_depth -= 1
+            if not sample.template_depth:
+                sample.template_ms += (time.perf_counter() - started) * 1000
+
+    wrapper.profiled = True
+    return wrapper
+
+
+def install():
+    """Hook into every database connection and into template rendering. Safe to call more than once."""
+    connection_created.connect(_instrument, dispatch_uid="core.profiling")
+    for connection in connections.all(initialized_only=True):
+        _instrument(connection)
+    if not getattr(Template.render, "profiled", False):
+        Template.render = _timed_render(Template.render)
+
+
+@contextmanager
+def external():
+    """Count the time spent in the block as an external call (an API request) of the current request."""
+    sample = _current.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if sample is not None:
+            sample.external_ms += (time.perf_counter() - started) * 1000
+
+
+def _start_profiler():
+    if random.random() >= settings.PROFILING_CPROFILE_RATE or not _profiler_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler (or debugger) is already attached to this thread
+        _profiler_lock.release()
+        return None
+    return profiler
+
+
+def _stop_profiler(profiler, sample):
+    profiler.disable()
+    _profiler_lock.release()
+    if sample.duration_ms < settings.PROFILING_SLOW_MS:
+        return
+    directory = Path(settings.PROFILING_DUMP_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    slug = re.sub(r"[^\w.-]+", "_", sample.name)
+    path = directory / f"{timezone.now():%Y%m%d-%H%M%S}-{slug}-{sample.duration_ms:.0f}ms.prof"
+    profiler.dump_stats(path)
+    sample.profile = str(path)
+
+
+@contextmanager
+def measure(name):
+    """
+    Record the block as one sample of ``name`` (which may be changed on the
+    yielded :class:`Sample` before the block ends) in :data:`stats`.
+    """
+    sample = Sample(name)
+    token = _current.set(sample)
+    profiler = _start_profiler()
+    started = time.perf_counter()
+    try:
+        yield sample
+    finally:
+        sample.duration_ms = (time.perf_counter() - started) * 1000
+        _current.reset(token)
+        if profiler is not None:
+            _stop_profiler(profiler, sample)
+        stats.add(sample)
+
+
+def _view_name(request):
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match else "<unresolved>"
+
+
+class ProfilingMiddleware:
+    """
+    Profiles every request (see the module docstring). Goes first in
+    ``MIDDLEWARE`` so that the other middleware is included; does nothing
+    unless ``PROFILING`` is on.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        install()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with measure("<unresolved>") as sample:
+            response = self.get_response(request)
+            sample.name = _view_name(request)
+        response["Server-Timing"] = sample.server_timing()
+        return response
+
+    async def __acall__(self, request):
+        with measure("<unresolved>") as sample:
+            response = await self.get_response(request)
+            sample.name = _view_name(request)
+        response["Server-Timing"] = sample.server_timing()
+        return response
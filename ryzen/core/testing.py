@@ -0,0 +1,46 @@
+"""
+Test helpers shared by the app test suites.
+"""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryPlanAssertions:
+    """
+    TestCase mixin that runs SQLite's ``EXPLAIN QUERY PLAN`` on every query a
+    block of code issues and fails when a hot table is read with a full scan.
+    """
+
+    def query_plans(self, func):
+        """Run ``func`` and return ``[(sql, [plan detail, ...]), ...]`` for its queries."""
+        with CaptureQueriesContext(connection) as captured:
+            func()
+        plans = []
+        with connection.cursor() as cursor:
+            for query in captured.captured_queries:
+                sql = query["sql"]
+                if not sql.lstrip().upper().startswith("SELECT"):
+                    continue
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                plans.append((sql, [row[3] for row in cursor.fetchall()]))
+        return plans
+
+    def assertNoFullScan(self, func, tables):
+        """
+        Fail if any query run by ``func`` scans one of ``tables`` instead of
+        searching an index, or sorts one of them with a temporary B-tree.
+        """
+        self.assertEqual(connection.vendor, "sqlite", "query plan assertions need SQLite")
+        for sql, details in self.query_plans(func):
+            for table in tables:
+                if f'"{table}"' not in sql:
+                    continue
+                for detail in details:
+                    self.assertFalse(
+                        detail.startswith(f"SCAN {table}"),
+                        f"Full scan of {table}: {detail}\n{sql}",
+                    )
+                    self.assertNotIn(
+                        "TEMP B-TREE FOR ORDER BY", detail,
+                        f"{table} sorted without an index: {detail}\n{sql}",
+                    )
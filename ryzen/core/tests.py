@@ -1,3 +1,267 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from datetime import timedelta
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from member.models import Member
+from stokvel.models import Stokvel
+from . import benchmarks, httpbench, jobs, loadtest, profiling
+from .models import Job
+
+calls = []
+
+
+@jobs.job("tests.record")
+def record(value):
+    calls.append(value)
+    return {"value": value}
+
+
+@jobs.job("tests.flaky")
+def flaky(fail_times):
+    calls.append("flaky")
+    if calls.count("flaky") <= fail_times:
+        raise RuntimeError("temporary failure")
+    return {"ok": True}
+
+
+@jobs.job("tests.observe")
+def observe():
+    calls.append({
+        "in_transaction": connection.in_atomic_block,
+        "queued": Job.objects.filter(status=Job.QUEUED).count(),
+    })
+    return jobs.finish(lambda: {"in_transaction": connection.in_atomic_block})
+
+
+@jobs.job("tests.reclaimed")
+def reclaimed():
+    # Another worker takes over the stale job before this one finishes
+    Job.objects.filter(name="tests.reclaimed").update(locked_by="other", attempts=F("attempts") + 1)
+    return jobs.finish(lambda: {"user": User.objects.create(username="written-twice").pk})
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_and_work(self):
+        queued = jobs.enqueue("tests.record", {"value": 3})
+        self.assertEqual(jobs.work(burst=True), 1)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Job.SUCCEEDED)
+        self.assertEqual(queued.result, {"value": 3})
+        self.assertEqual(calls, [3])
+
+    def test_idempotency_key_deduplicates(self):
+        first = jobs.enqueue("tests.record", {"value": 1}, idempotency_key="once")
+        second = jobs.enqueue("tests.record", {"value": 2}, idempotency_key="once")
+        self.assertEqual(first.pk, second.pk)
+        jobs.work(burst=True)
+        self.assertEqual(calls, [1])
+
+    def test_unknown_job_is_rejected(self):
+        with self.assertRaises(ValueError):
+            jobs.enqueue("tests.missing")
+
+    def test_failed_job_is_retried_with_backoff(self):
+        queued = jobs.enqueue("tests.flaky", {"fail_times": 1}, max_attempts=3)
+        jobs.work(burst=True)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Job.QUEUED)
+        self.assertGreater(queued.run_at, timezone.now())
+        self.assertIn("temporary failure", queued.last_error)
+
+        Job.objects.filter(pk=queued.pk).update(run_at=timezone.now())
+        jobs.work(burst=True)
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), (Job.SUCCEEDED, 2))
+
+    def test_job_fails_after_max_attempts(self):
+        queued = jobs.enqueue("tests.flaky", {"fail_times": 5}, max_attempts=1)
+        jobs.work(burst=True)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Job.FAILED)
+
+    def test_job_is_claimed_once(self):
+        queued = jobs.enqueue("tests.record", {"value": 1})
+        self.assertEqual(len(jobs.claim("worker-a")), 1)
+        self.assertEqual(jobs.claim("worker-b"), [])
+        queued.refresh_from_db()
+        self.assertEqual(queued.locked_by, "worker-a")
+
+    def test_stale_lock_is_reclaimed(self):
+        jobs.enqueue("tests.record", {"value": 1})
+        jobs.claim("dead-worker")
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        reclaimed = jobs.claim("worker-b")
+        self.assertEqual([j.locked_by for j in reclaimed], ["worker-b"])
+        self.assertEqual(reclaimed[0].attempts, 2)
+
+    @override_settings(JOBS_RUN_INLINE=True)
+    def test_inline_mode_runs_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            queued = jobs.enqueue("tests.record", {"value": 7})
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Job.SUCCEEDED)
+        self.assertEqual(calls, [7])
+
+    def test_reclaimed_job_does_not_commit_its_writes(self):
+        queued = jobs.enqueue("tests.reclaimed")
+        self.assertEqual(jobs.work(worker_id="first", burst=True), 1)
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.locked_by, queued.attempts), (Job.RUNNING, "other", 2))
+        self.assertFalse(User.objects.filter(username="written-twice").exists())
+
+
+class JobTransactionTests(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_handlers_run_outside_a_transaction(self):
+        first = jobs.enqueue("tests.observe")
+        jobs.enqueue("tests.observe")
+        self.assertEqual(jobs.work(burst=True), 2)
+        # Only finish() opens a transaction, and the second job was not claimed while the first ran
+        self.assertEqual(calls, [{"in_transaction": False, "queued": 1}, {"in_transaction": False, "queued": 0}])
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.result), (Job.SUCCEEDED, {"in_transaction": True}))
+
+
+class LoadTestTests(TransactionTestCase):
+    def test_run_reports_every_operation_and_cleans_up(self):
+        report = loadtest.run(threads=1, iterations=20, members=3, seed=1)
+
+        self.assertEqual(set(report["operations"]), set(loadtest.DEFAULT_MIX))
+        self.assertEqual(sum(row["count"] for row in report["operations"].values()), 20)
+        self.assertFalse(any(row["errors"] for row in report["operations"].values()))
+        self.assertFalse(User.objects.filter(username__startswith="loadtest-").exists())
+        self.assertFalse(Stokvel.objects.exists())
+
+    def test_unknown_operation_is_rejected(self):
+        with self.assertRaises(ValueError):
+            loadtest.run(mix={"explode": 1})
+
+
+class HttpBenchTests(TestCase):
+    def test_peak_overlap(self):
+        self.assertEqual(httpbench.peak_overlap([]), 0)
+        self.assertEqual(httpbench.peak_overlap([(0, 2), (1, 3), (2.5, 4), (5, 6)]), 2)
+        self.assertEqual(httpbench.peak_overlap([(0, 10)] * 4), 4)
+
+    def test_benchmark_member_is_removed(self):
+        with httpbench.benchmark_login() as cookies:
+            user = User.objects.get(username__startswith=httpbench.BENCH_PREFIX)
+            self.assertTrue(Member.objects.filter(user=user, stokvel__name=user.username).exists())
+            self.assertTrue(Session.objects.filter(session_key=cookies[settings.SESSION_COOKIE_NAME]).exists())
+        self.assertFalse(User.objects.filter(username__startswith=httpbench.BENCH_PREFIX).exists())
+        self.assertFalse(Stokvel.objects.exists())
+        self.assertFalse(Session.objects.exists())
+
+
+class ViewBenchmarkTests(TestCase):
+    def test_views_stay_within_query_budgets(self):
+        report = benchmarks.run(scales=["small", "medium"], repeat=0)
+        self.assertEqual(benchmarks.check(report, benchmarks.load_budgets(), timing=False), [])
+        small, medium = report["scales"]["small"], report["scales"]["medium"]
+        # Ten times the members must not mean more queries
+        self.assertEqual(
+            {name: row["queries"] for name, row in small.items()},
+            {name: row["queries"] for name, row in medium.items()},
+        )
+
+    def test_check_flags_regressions(self):
+        budgets = {"dashboard": {"queries": 10, "ms": {"small": 50}, "peak_kb": {"small": 500}}}
+        report = {"scales": {"small": {
+            "dashboard": {"queries": 110, "cold_ms": 90.0, "ms": 80.0, "peak_kb": 100.0},
+            "profile": {"queries": 1, "cold_ms": 1.0, "ms": 1.0, "peak_kb": 1.0},
+        }}}
+        self.assertEqual(benchmarks.check(report, budgets), [
+            "small/dashboard: 110 queries, budget 10",
+            "small/dashboard: ms 80.0, budget 50",
+            "profile: no budget",
+        ])
+        self.assertEqual(len(benchmarks.check(report, budgets, timing=False)), 2)
+
+    def test_unknown_view_is_rejected(self):
+        with self.assertRaises(ValueError):
+            benchmarks.run(views=["missing"])
+
+
+class ProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create(username="staff", is_staff=True)
+        stokvel = Stokvel.objects.create(name="Profiled", monthly_contribution=100)
+        cls.user = User.objects.create(username="profiled")
+        Member.objects.create(user=cls.user, stokvel=stokvel)
+
+    def setUp(self):
+        profiling.stats.reset()
+        self.dump_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dump_dir)
+
+    def test_fingerprint(self):
+        self.assertEqual(
+            profiling.fingerprint('SELECT * FROM "t" WHERE "id" IN (%s, %s, %s) AND "n" = \'x\' LIMIT 21'),
+            'SELECT * FROM "t" WHERE "id" IN (...) AND "n" = ? LIMIT ?',
+        )
+
+    def test_measure_flags_duplicate_queries(self):
+        profiling.install()
+        with override_settings(PROFILING_SLOW_MS=10_000):
+            with profiling.measure("loop") as sample:
+                for user in User.objects.all():
+                    User.objects.filter(pk=user.pk).exists()
+                with profiling.external():
+                    pass
+        self.assertEqual(sample.sql_queries, 3)
+        self.assertEqual(list(sample.duplicates().values()), [2])
+        summary = profiling.stats.summary()["views"]["loop"]
+        self.assertEqual(summary["requests_with_duplicate_queries"], 1)
+        self.assertEqual(summary["duplicate_queries"][0]["times"], 2)
+
+    def test_middleware_records_views(self):
+        with override_settings(PROFILING=True, PROFILING_CPROFILE_RATE=1, PROFILING_SLOW_MS=0,
+                               PROFILING_DUMP_DIR=self.dump_dir):
+            self.client.force_login(self.user)
+            response = self.client.get(reverse("communications:coordinators"))
+            self.assertIn("total;dur=", response["Server-Timing"])
+            self.client.get(reverse("member:dashboard"))
+
+        views = profiling.stats.summary()["views"]
+        coordinators = views["communications:coordinators"]
+        self.assertEqual(coordinators["requests"], 1)
+        self.assertGreater(coordinators["sql_queries"]["p50"], 0)
+        self.assertGreater(coordinators["template_ms"]["p50"], 0)
+        self.assertGreater(views["member:dashboard"]["sql_queries"]["p50"], 0)
+        slow = profiling.stats.summary()["slow_requests"]
+        self.assertEqual(len(slow), 2)
+        self.assertTrue(os.path.exists(slow[0]["profile"]))
+
+    def test_disabled_by_default(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("communications:coordinators"))
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(profiling.stats.summary()["views"], {})
+
+    def test_endpoints_are_staff_only(self):
+        with override_settings(PROFILING_SLOW_MS=10_000):
+            with profiling.measure("member:dashboard"):
+                pass
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse("core:profiling")).status_code, 302)
+        self.client.force_login(self.staff)
+        self.assertIn("member:dashboard", self.client.get(reverse("core:profiling")).json()["views"])
+        metrics = self.client.get(reverse("core:profiling_metrics")).content.decode()
+        self.assertIn('ryzen_request_duration_ms{view="member:dashboard",quantile="0.95"}', metrics)
+        self.assertIn('ryzen_request_duration_ms_count{view="member:dashboard"} 1', metrics)
@@ -7,4 +7,6 @@ urlpatterns = [
     path("", views.home_view, name="home"),
     path("login/", views.login_view, name="login"),
     path("logout/", views.logout_view, name="logout"),
+    path("profiling/", views.profiling_view, name="profiling"),
+    path("profiling/metrics/", views.profiling_metrics_view, name="profiling_metrics"),
 ]
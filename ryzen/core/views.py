@@ -1,7 +1,10 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse, JsonResponse
 from .forms import LoginForm
+from . import profiling
 
 def home_view(request):
     """
@@ -36,3 +39,15 @@ def logout_view(request):
     logout(request)
     messages.success(request, "You have been logged out.")
     return redirect("core:home")
+
+
+@staff_member_required
+def profiling_view(request):
+    """Rolling per-view percentiles, duplicate queries and slow requests (core/profiling.py)."""
+    return JsonResponse(profiling.stats.summary())
+
+
+@staff_member_required
+def profiling_metrics_view(request):
+    """The same percentiles in the Prometheus text format."""
+    return HttpResponse(profiling.stats.prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,8 +1,59 @@
 from django.contrib import admin
+from core.pagination import EstimatedCountPaginator
+from stokvel.models import Stokvel
 from .models import Member, FinancialRecord
 
-# Register Member
-admin.site.register(Member)
 
-# Register FinancialRecord
-admin.site.register(FinancialRecord)
+class StokvelListFilter(admin.SimpleListFilter):
+    """Filter by stokvel, listing names only (Stokvel.__str__ counts its members)."""
+    title = "stokvel"
+    parameter_name = "stokvel"
+
+    def lookups(self, request, model_admin):
+        return Stokvel.objects.order_by("name").values_list("pk", "name")
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(stokvel_id=self.value())
+        return queryset
+
+
+@admin.register(Member)
+class MemberAdmin(admin.ModelAdmin):
+    list_display = ("username", "full_name", "stokvel_name", "phone_number", "joined_date")
+    list_select_related = ("user", "stokvel")
+    list_filter = (StokvelListFilter,)
+    search_fields = ("user__username", "user__first_name", "user__last_name", "phone_number")
+    raw_id_fields = ("user",)
+    autocomplete_fields = ("stokvel",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    @admin.display(description="Username", ordering="user__username")
+    def username(self, obj):
+        return obj.user.username
+
+    @admin.display(description="Name")
+    def full_name(self, obj):
+        return obj.user.get_full_name()
+
+    @admin.display(description="Stokvel", ordering="stokvel__name")
+    def stokvel_name(self, obj):
+        return obj.stokvel.name if obj.stokvel else None
+
+
+@admin.register(FinancialRecord)
+class FinancialRecordAdmin(admin.ModelAdmin):
+    list_display = ("id", "username", "amount_saved", "amount_borrowed", "contribution_date")
+    list_select_related = ("member__user",)
+    # Exact match only: a LIKE '%…%' search would scan the whole ledger
+    search_fields = ("=member__user__username",)
+    raw_id_fields = ("member",)
+    date_hierarchy = "contribution_date"
+    ordering = ("-contribution_date",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    @admin.display(description="Member", ordering="member__user__username")
+    def username(self, obj):
+        return obj.member.user.username
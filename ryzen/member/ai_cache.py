@@ -0,0 +1,63 @@
+"""
+Cache of assistant answers.
+
+Answers are keyed on the normalized question plus a fingerprint of the
+financial context the model saw, under the stokvel's versioned key space (see
+stokvel/cache.py), so a write to the stokvel's ledger invalidates them. The
+``LLM_CACHE_ALIAS`` cache controls size (LRU eviction) and ``LLM_CACHE_TTL``
+how long an answer lives.
+"""
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import caches
+
+from stokvel import cache as stokvel_cache
+
+_HITS = "llm:stats:hits"
+_MISSES = "llm:stats:misses"
+
+
+def _cache():
+    return caches[settings.LLM_CACHE_ALIAS]
+
+
+def normalize(query):
+    """Lowercase, drop punctuation and collapse whitespace: "How much?" == "how much"."""
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+
+def cache_key(stokvel_id, query, context):
+    digest = hashlib.sha256(f"{normalize(query)}\0{context}".encode()).hexdigest()
+    return stokvel_cache.key(stokvel_id, "ai", digest)
+
+
+def _count(key):
+    cache = _cache()
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 1, timeout=None)
+
+
+def lookup(stokvel_id, query, context):
+    reply = _cache().get(cache_key(stokvel_id, query, context))
+    _count(_MISSES if reply is None else _HITS)
+    return reply
+
+
+def store(stokvel_id, query, context, reply):
+    _cache().set(cache_key(stokvel_id, query, context), reply, timeout=settings.LLM_CACHE_TTL)
+
+
+def stats():
+    cache = _cache()
+    hits, misses = cache.get(_HITS, 0), cache.get(_MISSES, 0)
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_rate": hits / total if total else 0.0}
+
+
+def reset_stats():
+    _cache().delete_many([_HITS, _MISSES])
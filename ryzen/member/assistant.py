@@ -0,0 +1,89 @@
+"""
+The stokvel financial assistant behind the AI analytics chat.
+"""
+from asgiref.sync import sync_to_async
+
+from . import ai_cache
+from .llm import get_client
+from .prompt_context import build_context
+
+
+def financial_context(stokvel):
+    """The stokvel data the model answers from (see member/prompt_context.py)."""
+    return build_context(stokvel)
+
+
+def build_prompt(query, db_context):
+    return f"""
+                    You are a stokvel financial assistant. Answer the user's query **directly and clearly**.
+                    Do NOT mention "Based on the database" or "database context" in your response.
+                    Do NOT use any markdown formatting (no ** or __).
+
+                    User query:
+                    {query}
+
+                    Relevant data (for internal reference, do not include in the response):
+                    {db_context}
+                    """
+
+
+def cached_answer(stokvel, query):
+    """A previously generated answer to ``query`` for the stokvel's current data, or None."""
+    return ai_cache.lookup(stokvel.pk, query, financial_context(stokvel))
+
+
+def answer(stokvel, query, history=()):
+    """
+    Ask the model ``query`` about ``stokvel`` and return its reply text.
+
+    ``history`` holds the previous turns of the conversation. Only standalone
+    questions (no history) are answered from and stored in the cache, since
+    a follow-up question depends on what was said before it.
+    """
+    db_context = financial_context(stokvel)
+    if history:
+        return get_client().chat(build_prompt(query, db_context), history=history, max_tokens=250, temperature=0.6)
+
+    reply = ai_cache.lookup(stokvel.pk, query, db_context)
+    if reply is None:
+        reply = get_client().chat(build_prompt(query, db_context), max_tokens=250, temperature=0.6)
+        ai_cache.store(stokvel.pk, query, db_context, reply)
+    return reply
+
+
+def stream_answer(stokvel, query, history=()):
+    """
+    Yield the answer to ``query`` as it is generated. A cached answer is
+    yielded in one piece; a fresh standalone one is cached once the stream
+    completes.
+    """
+    db_context = financial_context(stokvel)
+    reply = None if history else ai_cache.lookup(stokvel.pk, query, db_context)
+    if reply is not None:
+        yield reply
+        return
+
+    chunks = []
+    prompt = build_prompt(query, db_context)
+    for chunk in get_client().stream_chat(prompt, history=history, max_tokens=250, temperature=0.6):
+        chunks.append(chunk)
+        yield chunk
+    if not history:
+        ai_cache.store(stokvel.pk, query, db_context, "".join(chunks))
+
+
+async def astream_answer(stokvel, query, history=()):
+    """Async :func:`stream_answer`, streaming from the client's ``astream_chat``."""
+    db_context = await sync_to_async(financial_context)(stokvel)
+    reply = None if history else await sync_to_async(ai_cache.lookup)(stokvel.pk, query, db_context)
+    if reply is not None:
+        yield reply
+        return
+
+    chunks = []
+    prompt = build_prompt(query, db_context)
+    async for chunk in get_client().astream_chat(prompt, history=history, max_tokens=250, temperature=0.6):
+        chunks.append(chunk)
+        yield chunk
+    if not history:
+        await sync_to_async(ai_cache.store)(stokvel.pk, query, db_context, "".join(chunks))
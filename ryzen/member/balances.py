@@ -0,0 +1,298 @@
+"""
+Incremental maintenance of the denormalized ledger tables.
+
+``MemberBalance`` holds the running totals of one member and
+``StokvelMonthlyRollup`` the per-month totals of one stokvel. Both are updated
+with ``F()`` deltas whenever a FinancialRecord is created, edited or deleted
+(see member/signals.py), and can be rebuilt from the raw ledger with the
+``rebuild_balances`` management command.
+
+Records are rolled up under the stokvel their member belongs to at write time;
+moving a member to another stokvel needs a rebuild to move their history.
+"""
+from datetime import datetime
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DateField, F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, TruncMonth
+from django.utils import timezone
+
+from stokvel import cache as stokvel_cache
+from . import ledger
+from .models import FinancialRecord, Member, MemberBalance, StokvelMonthlyRollup
+
+ZERO = Decimal("0.00")
+
+
+def month_start(value):
+    """First day of the month ``value`` (a date or datetime) falls in."""
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        value = value.date()
+    return value.replace(day=1)
+
+
+def _latest_contribution():
+    return Subquery(
+        FinancialRecord.objects.filter(member_id=OuterRef("member_id"))
+        .values("member_id")
+        .annotate(latest=Max("contribution_date"))
+        .values("latest")
+    )
+
+
+def _apply_member_delta(member_id, saved, borrowed, contribution_date=None, create=True):
+    """
+    Add ``saved``/``borrowed`` to a member's balance.
+
+    ``contribution_date`` is only passed for new records, where the last
+    contribution date can only move forward. Edits and deletes recompute it
+    from the member's records instead. Deletes pass ``create=False``: when
+    the member itself is being deleted its balance row may already be gone
+    and must not be recreated.
+    """
+    if create:
+        MemberBalance.objects.get_or_create(member_id=member_id)
+    if contribution_date is None:
+        last_contribution = _latest_contribution()
+    else:
+        last_contribution = Greatest(
+            Coalesce(F("last_contribution_date"), Value(contribution_date)),
+            Value(contribution_date),
+        )
+    MemberBalance.objects.filter(member_id=member_id).update(
+        total_saved=F("total_saved") + saved,
+        total_borrowed=F("total_borrowed") + borrowed,
+        arrears=Greatest(
+            F("total_borrowed") + borrowed - F("total_saved") - saved,
+            Value(ZERO),
+        ),
+        last_contribution_date=last_contribution,
+        updated_at=timezone.now(),
+    )
+
+
+def _apply_rollup_delta(stokvel_id, contribution_date, saved, borrowed, count):
+    if stokvel_id is None:
+        return
+    month = month_start(contribution_date)
+    StokvelMonthlyRollup.objects.get_or_create(stokvel_id=stokvel_id, month=month)
+    StokvelMonthlyRollup.objects.filter(stokvel_id=stokvel_id, month=month).update(
+        total_saved=F("total_saved") + saved,
+        total_borrowed=F("total_borrowed") + borrowed,
+        record_count=F("record_count") + count,
+    )
+
+
+def _stokvel_of(member_id):
+    return Member.objects.filter(pk=member_id).values_list("stokvel_id", flat=True).first()
+
+
+def snapshot(record):
+    """The stored state of ``record`` before it is overwritten, or None."""
+    if record._state.adding or record.pk is None:
+        return None
+    return (
+        FinancialRecord.objects.filter(pk=record.pk)
+        .values("member_id", "amount_saved", "amount_borrowed", "contribution_date")
+        .first()
+    )
+
+
+def record_saved(record, previous=None):
+    """Fold a created (``previous`` is None) or edited record into the tables."""
+    saved = Decimal(record.amount_saved)
+    borrowed = Decimal(record.amount_borrowed)
+    with transaction.atomic():
+        if previous is None:
+            _apply_member_delta(record.member_id, saved, borrowed, record.contribution_date)
+        else:
+            _apply_rollup_delta(
+                _stokvel_of(previous["member_id"]), previous["contribution_date"],
+                -previous["amount_saved"], -previous["amount_borrowed"], -1,
+            )
+            if previous["member_id"] != record.member_id:
+                _apply_member_delta(previous["member_id"], -previous["amount_saved"], -previous["amount_borrowed"])
+                _apply_member_delta(record.member_id, saved, borrowed)
+            else:
+                _apply_member_delta(
+                    record.member_id,
+                    saved - previous["amount_saved"],
+                    borrowed - previous["amount_borrowed"],
+                )
+        _apply_rollup_delta(_stokvel_of(record.member_id), record.contribution_date, saved, borrowed, 1)
+
+
+def record_deleted(record):
+    """Remove a deleted record's amounts from the tables."""
+    saved = Decimal(record.amount_saved)
+    borrowed = Decimal(record.amount_borrowed)
+    with transaction.atomic():
+        _apply_member_delta(record.member_id, -saved, -borrowed, create=False)
+        _apply_rollup_delta(_stokvel_of(record.member_id), record.contribution_date, -saved, -borrowed, -1)
+
+
+# ----------------------------
+# Full rebuild / verification
+# ----------------------------
+def _expected_balances(members):
+    return (
+        members.annotate(
+            saved=Coalesce(Sum("financial_records__amount_saved"), Value(ZERO)),
+            borrowed=Coalesce(Sum("financial_records__amount_borrowed"), Value(ZERO)),
+            last=Max("financial_records__contribution_date"),
+        )
+        .values_list("id", "saved", "borrowed", "last")
+        .order_by("id")
+    )
+
+
+def _expected_rollups(stokvel_ids=None):
+    records = FinancialRecord.objects.filter(member__stokvel__isnull=False)
+    if stokvel_ids is not None:
+        records = records.filter(member__stokvel_id__in=stokvel_ids)
+    return (
+        records.annotate(month=TruncMonth("contribution_date", output_field=DateField()))
+        .values("member__stokvel_id", "month")
+        .annotate(
+            saved=Sum("amount_saved"),
+            borrowed=Sum("amount_borrowed"),
+            count=Count("id"),
+        )
+        .values_list("member__stokvel_id", "month", "saved", "borrowed", "count")
+        .order_by("member__stokvel_id", "month")
+    )
+
+
+def _members(stokvel_ids=None, member_ids=None):
+    members = Member.objects.all()
+    if stokvel_ids is not None:
+        members = members.filter(stokvel_id__in=stokvel_ids)
+    if member_ids is not None:
+        members = members.filter(pk__in=member_ids)
+    return members
+
+
+def _write_balances(members, batch_size):
+    MemberBalance.objects.filter(member__in=members).delete()
+    balances = [
+        MemberBalance(
+            member_id=member_id,
+            total_saved=saved,
+            total_borrowed=borrowed,
+            arrears=ledger.arrears(saved, borrowed),
+            last_contribution_date=last,
+        )
+        for member_id, saved, borrowed, last in _expected_balances(members).iterator()
+    ]
+    MemberBalance.objects.bulk_create(balances, batch_size=batch_size)
+    return len(balances)
+
+
+def _invalidate(stokvel_ids=None):
+    """Bump the cache version of the given stokvels (all stokvels when None)."""
+    if stokvel_ids is None:
+        stokvel_ids = Member.objects.filter(stokvel__isnull=False).values_list("stokvel_id", flat=True).distinct()
+    for stokvel_id in stokvel_ids:
+        if stokvel_id:
+            stokvel_cache.bump(stokvel_id)
+
+
+def rebuild(stokvel_ids=None, batch_size=1000):
+    """
+    Recompute balances and monthly rollups from the raw ledger.
+
+    Limited to the given stokvels when ``stokvel_ids`` is passed. Returns the
+    number of balance and rollup rows written.
+    """
+    with transaction.atomic():
+        balance_count = _write_balances(_members(stokvel_ids), batch_size)
+
+        rollups = StokvelMonthlyRollup.objects.all()
+        if stokvel_ids is not None:
+            rollups = rollups.filter(stokvel_id__in=stokvel_ids)
+        rollups.delete()
+        monthly = [
+            StokvelMonthlyRollup(
+                stokvel_id=stokvel_id,
+                month=month,
+                total_saved=saved,
+                total_borrowed=borrowed,
+                record_count=count,
+            )
+            for stokvel_id, month, saved, borrowed, count in _expected_rollups(stokvel_ids).iterator()
+        ]
+        StokvelMonthlyRollup.objects.bulk_create(monthly, batch_size=batch_size)
+    _invalidate(stokvel_ids)
+    return balance_count, len(monthly)
+
+
+def refresh_members(member_ids, batch_size=1000):
+    """Rebuild the balances of the given members only, e.g. after a bulk import."""
+    with transaction.atomic():
+        count = _write_balances(_members(member_ids=member_ids), batch_size)
+    _invalidate(_members(member_ids=member_ids).values_list("stokvel_id", flat=True).distinct())
+    return count
+
+
+def verify(stokvel_ids=None):
+    """Compare the stored tables against the raw ledger; returns a list of mismatches."""
+    problems = []
+
+    stored = {
+        b.member_id: b
+        for b in MemberBalance.objects.filter(member__in=_members(stokvel_ids))
+    }
+    for member_id, saved, borrowed, last in _expected_balances(_members(stokvel_ids)).iterator():
+        balance = stored.pop(member_id, None)
+        if balance is None:
+            if saved or borrowed or last:
+                problems.append(f"member {member_id}: missing balance row")
+            continue
+        expected = (ledger.money(saved), ledger.money(borrowed), ledger.arrears(saved, borrowed), last)
+        actual = (
+            ledger.money(balance.total_saved), ledger.money(balance.total_borrowed),
+            ledger.money(balance.arrears), balance.last_contribution_date,
+        )
+        if expected != actual:
+            problems.append(f"member {member_id}: stored {actual}, ledger {expected}")
+
+    rollups = StokvelMonthlyRollup.objects.all()
+    if stokvel_ids is not None:
+        rollups = rollups.filter(stokvel_id__in=stokvel_ids)
+    stored_rollups = {(r.stokvel_id, r.month): r for r in rollups if r.record_count}
+    for stokvel_id, month, saved, borrowed, count in _expected_rollups(stokvel_ids).iterator():
+        rollup = stored_rollups.pop((stokvel_id, month), None)
+        expected = (ledger.money(saved), ledger.money(borrowed), count)
+        actual = (
+            (ledger.money(rollup.total_saved), ledger.money(rollup.total_borrowed), rollup.record_count)
+            if rollup else None
+        )
+        if expected != actual:
+            problems.append(f"stokvel {stokvel_id} {month:%Y-%m}: stored {actual}, ledger {expected}")
+    for stokvel_id, month in stored_rollups:
+        problems.append(f"stokvel {stokvel_id} {month:%Y-%m}: rollup has no ledger records")
+
+    return problems
+
+
+def read_balance(member):
+    """Totals for ``member`` from the balance table (zeros if it has no records)."""
+    return _totals(MemberBalance.objects.filter(member=member).first())
+
+
+async def aread_balance(member):
+    return _totals(await MemberBalance.objects.filter(member=member).afirst())
+
+
+def _totals(balance):
+    if balance is None:
+        return {"total_saved": ZERO, "total_borrowed": ZERO, "total_arrears": ZERO, "last_contribution_date": None}
+    return {
+        "total_saved": balance.total_saved,
+        "total_borrowed": balance.total_borrowed,
+        "total_arrears": balance.arrears,
+        "last_contribution_date": balance.last_contribution_date,
+    }
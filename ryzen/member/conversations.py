@@ -0,0 +1,112 @@
+"""
+Storage for AI analytics chat history.
+
+Each message is its own ChatMessage row, so a request only ever reads a
+bounded window of a conversation: the last ``CHAT_PROMPT_TURNS`` messages for
+the prompt and ``CHAT_PAGE_SIZE`` messages per page in the UI. Nothing grows
+in the session.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import ChatMessage, Conversation
+
+
+def active_conversation(member, create=False):
+    """The member's current conversation; started on demand when ``create`` is set."""
+    conversation = (
+        Conversation.objects.filter(member=member, archived=False).order_by("-updated_at").first()
+    )
+    if conversation is None and create:
+        conversation = Conversation.objects.create(member=member)
+    return conversation
+
+
+def add_message(conversation, role, content):
+    now = timezone.now()
+    with transaction.atomic():
+        message = ChatMessage.objects.create(conversation=conversation, role=role, content=content, created_at=now)
+        Conversation.objects.filter(pk=conversation.pk).update(updated_at=now)
+    return message
+
+
+def recent_messages(conversation, limit=None, before_id=None):
+    """The last ``limit`` messages of ``conversation`` (before message ``before_id``), oldest first."""
+    limit = limit or settings.CHAT_PROMPT_TURNS
+    messages = conversation.messages.order_by("-id")
+    if before_id:
+        messages = messages.filter(id__lt=before_id)
+    messages = list(messages[:limit])
+    messages.reverse()
+    return messages
+
+
+def page_before(conversation, before_id=None, limit=None):
+    """
+    Up to ``limit`` messages older than message ``before_id`` (or the newest
+    ones), oldest first, plus whether even older messages exist.
+    """
+    limit = limit or settings.CHAT_PAGE_SIZE
+    messages = conversation.messages.order_by("-id")
+    if before_id:
+        messages = messages.filter(id__lt=before_id)
+    page = list(messages[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+    page.reverse()
+    return page, has_more
+
+
+def archive(member):
+    """Close the member's active conversation (the "clear chat" button)."""
+    Conversation.objects.filter(member=member, archived=False).update(archived=True, updated_at=timezone.now())
+
+
+def import_session_history(member, history):
+    """Move a pre-existing ``request.session["chat_history"]`` list into the store."""
+    if not history:
+        return
+    conversation = active_conversation(member, create=True)
+    ChatMessage.objects.bulk_create([
+        ChatMessage(conversation=conversation, role=item["role"], content=item["content"])
+        for item in history
+    ])
+
+
+def compact(max_messages=None, retention_days=None, batch_size=1000):
+    """
+    Delete archived conversations idle for more than ``retention_days`` and
+    trim every conversation to its newest ``max_messages`` messages.
+
+    Deletes run in batches so no single statement holds a long lock. Returns
+    ``(conversations_deleted, messages_deleted)``.
+    """
+    max_messages = max_messages or settings.CHAT_MAX_MESSAGES
+    retention_days = retention_days or settings.CHAT_ARCHIVE_RETENTION_DAYS
+    cutoff = timezone.now() - timedelta(days=retention_days)
+
+    conversations_deleted = 0
+    stale = Conversation.objects.filter(archived=True, updated_at__lt=cutoff)
+    while ids := list(stale.values_list("id", flat=True)[:batch_size]):
+        # Messages have no signal receivers, so the cascade is one fast DELETE
+        Conversation.objects.filter(id__in=ids).delete()
+        conversations_deleted += len(ids)
+
+    messages_deleted = 0
+    oversized = (
+        Conversation.objects.annotate(message_count=Count("messages"))
+        .filter(message_count__gt=max_messages)
+        .values_list("id", flat=True)
+    )
+    for conversation_id in list(oversized):
+        messages = ChatMessage.objects.filter(conversation_id=conversation_id)
+        oldest_kept = messages.order_by("-id").values_list("id", flat=True)[max_messages - 1]
+        old = messages.filter(id__lt=oldest_kept)
+        while ids := list(old.values_list("id", flat=True)[:batch_size]):
+            messages_deleted += ChatMessage.objects.filter(id__in=ids).delete()[0]
+
+    return conversations_deleted, messages_deleted
@@ -0,0 +1,96 @@
+"""
+Stokvel-wide dashboard data.
+
+Every member of a stokvel sees the same totals, member lists and charts, so
+they are computed once and cached under the stokvel's versioned keys (see
+stokvel/cache.py). Saves to FinancialRecord, Member, Stokvel and a member's
+User bump the version. Per-member figures are left to the view.
+"""
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from stokvel import cache as stokvel_cache
+from stokvel import payouts
+from . import ledger
+from .rollups import cumulative, monthly_totals, opening_totals
+from .services import stokvel_summary
+
+
+def build_stokvel_dashboard(stokvel, today):
+    summary = stokvel_summary(stokvel, today=today)
+
+    target_amount = summary['target_amount']
+    current_month_total = summary['current_month_total']
+    progress_percentage = ledger.progress(current_month_total, target_amount)
+    remaining_amount = target_amount - current_month_total
+
+    # ----------------------------
+    # Chart Data
+    # ----------------------------
+    series = monthly_totals(stokvel, months=12, today=today)
+    opening_saved, opening_borrowed = opening_totals(stokvel, series[0]["month"])
+
+    # Income & Expense (Last 6 Months)
+    months = [row["month"].strftime("%b %Y") for row in series[-6:]]
+    income_data = [float(row["saved"]) for row in series[-6:]]
+    expense_data = [float(row["borrowed"]) for row in series[-6:]]
+
+    # Savings Growth Trend (Past 12 Months)
+    savings_growth_labels = [row["month"].strftime("%b %Y") for row in series]
+    savings_growth_data = [
+        float(v) for v in cumulative((row["saved"] for row in series), start=opening_saved)
+    ]
+
+    # Loan Repayment Trend (Past 12 Months)
+    loan_repayment_data = [
+        float(v) for v in cumulative((row["borrowed"] for row in series), start=opening_borrowed)
+    ]
+
+    return {
+        "total_balance": summary['total_balance'],
+        "active_members_count": summary['active_members_count'],
+        "total_members": summary['total_members'],
+        "progress_percentage": progress_percentage,
+        "target_amount": target_amount,
+        "interest_rate": stokvel.interest_rate,
+        "monthly_interest": ledger.monthly_interest(summary['total_balance'], stokvel.interest_rate),
+        "remaining_amount": abs(remaining_amount),
+        "remaining_label": "Surplus" if remaining_amount < 0 else "Remaining",
+        "current_month_total": current_month_total,
+        "active_members": summary['active_members'],
+        "inactive_members": summary['inactive_members'],
+        "months": months,
+        "income_data": income_data,
+        "expense_data": expense_data,
+        "savings_growth_labels": savings_growth_labels,
+        "savings_growth_data": savings_growth_data,
+        "loan_repayment_labels": savings_growth_labels.copy(),
+        "loan_repayment_data": loan_repayment_data,
+        "net_arrears": summary['net_arrears'],
+        "upcoming_payouts": payouts.upcoming(stokvel, today=today),
+    }
+
+
+def stokvel_dashboard(stokvel, today=None):
+    """The stokvel-wide dashboard context, from cache when the stokvel has not changed."""
+    today = today or date.today()
+    key = stokvel_cache.key(stokvel.pk, "dashboard", today.isoformat())
+    context = cache.get(key)
+    if context is None:
+        context = build_stokvel_dashboard(stokvel, today)
+        cache.set(key, context, timeout=settings.DASHBOARD_CACHE_TTL)
+    return context
+
+
+async def astokvel_dashboard(stokvel, today=None):
+    """Async :func:`stokvel_dashboard`; a cache hit makes no database query."""
+    today = today or date.today()
+    key = await stokvel_cache.akey(stokvel.pk, "dashboard", today.isoformat())
+    context = await cache.aget(key)
+    if context is None:
+        context = await sync_to_async(build_stokvel_dashboard)(stokvel, today)
+        await cache.aset(key, context, timeout=settings.DASHBOARD_CACHE_TTL)
+    return context
@@ -1,11 +1,12 @@
 from django import forms
 from django.contrib.auth.models import User
+from stokvel.models import Stokvel
 from .models import Member
 
 
 class OnboardForm(forms.ModelForm):
     # Additional fields for registration
-    username = forms.CharField(max_length=150, required=True)
+    username = forms.CharField(max_length=150, required=True, validators=[User.username_validator])
     email = forms.EmailField(required=True)
     password = forms.CharField(widget=forms.PasswordInput, required=True)
     stokvel_id = forms.CharField(max_length=20, required=True, label="Stokvel ID")
@@ -13,3 +14,19 @@ class OnboardForm(forms.ModelForm):
     class Meta:
         model = Member
         fields = ["phone_number", "address", "date_of_birth"]
+
+    def clean_username(self):
+        # The unique constraint still decides under a race (see onboard_view)
+        username = self.cleaned_data["username"]
+        if User.objects.filter(username=username).exists():
+            raise forms.ValidationError("That username is already taken.")
+        return username
+
+    def clean_stokvel_id(self):
+        """Resolve the stokvel now, so that nothing is written for an unknown one."""
+        stokvel_id = self.cleaned_data["stokvel_id"].strip()
+        stokvel = Stokvel.objects.filter(pk=stokvel_id, active=True).first() if stokvel_id.isdigit() else None
+        if stokvel is None:
+            raise forms.ValidationError("Stokvel ID not found or inactive.")
+        self.stokvel = stokvel
+        return stokvel_id
@@ -0,0 +1,278 @@
+"""
+Bulk import of members and ledger history from CSV or JSON Lines.
+
+Used by ``manage.py import_data`` and the "Import members or ledger" action
+on the stokvel admin. Files are read one row at a time and handled in
+chunks: every row of a chunk is validated, the valid ones are inserted with
+``bulk_create`` in one transaction, and the invalid ones are reported with
+their line number without stopping the import. Memory use depends on the
+chunk size (and, for members, on the number of usernames), not on the size
+of the file.
+
+Member rows: ``username`` (required), ``email``, ``first_name``,
+``last_name``, ``phone_number``, ``address``, ``date_of_birth``,
+``stokvel_id`` (unless a stokvel is given for the whole file) and
+``password``. A per-row password costs a full password hash; rows without
+one get the shared ``password`` passed to :func:`import_members` (hashed
+once), or an unusable password.
+
+Record rows: ``username`` of an existing member, ``contribution_date``,
+``amount_saved``, ``amount_borrowed`` and ``notes``.
+
+bulk_create sends no signals, so balances, monthly rollups, payout
+schedules and the stokvel caches are brought up to date once at the end.
+"""
+import csv
+import json
+from itertools import islice
+from pathlib import Path
+
+from django import forms
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, transaction
+
+from stokvel import payouts
+from stokvel.models import Stokvel
+from . import balances
+from .models import FinancialRecord, Member
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+
+class MemberRowForm(forms.Form):
+    username = forms.CharField(max_length=150, validators=[UnicodeUsernameValidator()])
+    email = forms.EmailField(required=False)
+    first_name = forms.CharField(max_length=150, required=False)
+    last_name = forms.CharField(max_length=150, required=False)
+    phone_number = forms.CharField(max_length=15, required=False)
+    address = forms.CharField(max_length=255, required=False)
+    date_of_birth = forms.DateField(required=False)
+    stokvel_id = forms.IntegerField(required=False)
+    password = forms.CharField(required=False, strip=False)
+
+
+class RecordRowForm(forms.Form):
+    username = forms.CharField(max_length=150)
+    contribution_date = forms.DateTimeField()
+    amount_saved = forms.DecimalField(max_digits=12, decimal_places=2, required=False, min_value=0)
+    amount_borrowed = forms.DecimalField(max_digits=12, decimal_places=2, required=False, min_value=0)
+    notes = forms.CharField(required=False)
+
+
+class ImportResult:
+    """Rows read and created, and the errors found (only the first ``MAX_REPORTED_ERRORS`` are kept)."""
+
+    def __init__(self, error_writer=None):
+        self.rows = 0
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+        self._error_writer = error_writer
+
+    def error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+        if self._error_writer is not None:
+            self._error_writer(line, message)
+
+    def as_dict(self):
+        return {"rows": self.rows, "created": self.created, "errors": self.error_count}
+
+
+def detect_format(name):
+    return "jsonl" if Path(name).suffix.lower() in (".jsonl", ".ndjson", ".json") else "csv"
+
+
+def read_rows(lines, fmt):
+    """Yield ``(line number, row dict)`` from an iterable of text lines; unparsable lines yield an error string."""
+    if fmt == "jsonl":
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield number, f"invalid JSON: {exc}"
+                continue
+            yield number, row if isinstance(row, dict) else "expected a JSON object"
+    else:
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, {key: value for key, value in row.items() if key is not None}
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def _clean(fields, row):
+    """``(cleaned data, errors)`` for one row; the declared fields are used directly, without a form per row."""
+    data, errors = {}, []
+    for name, field in fields.items():
+        value = row.get(name)
+        try:
+            data[name] = field.clean("" if value is None else value)
+        except ValidationError as exc:
+            errors.append(f"{name}: {' '.join(exc.messages)}")
+    return data, "; ".join(errors)
+
+
+def _validate(chunk, form_class, result):
+    valid = []
+    for line, row in chunk:
+        result.rows += 1
+        if isinstance(row, str):
+            result.error(line, row)
+            continue
+        data, errors = _clean(form_class.base_fields, row)
+        if errors:
+            result.error(line, errors)
+        else:
+            valid.append((line, data))
+    return valid
+
+
+def _insert(chunk, insert, result):
+    """Run ``insert`` for the chunk's valid rows in one transaction; a failure rejects the whole chunk."""
+    try:
+        with transaction.atomic():
+            result.created += insert(chunk)
+    except DatabaseError as exc:
+        for row in chunk:
+            result.error(row[0], f"not imported, its chunk was rejected by the database: {exc}")
+
+
+def import_members(lines, fmt="csv", stokvel=None, password=None, chunk_size=CHUNK_SIZE, on_error=None):
+    """
+    Create a user and a member for every valid row of ``lines``. With
+    ``stokvel`` every member joins it and ``stokvel_id`` columns are
+    ignored; an inactive ``stokvel`` raises ValueError, as members cannot
+    join one. Returns an :class:`ImportResult`.
+    """
+    if stokvel is not None and not stokvel.active:
+        raise ValueError(f"Stokvel {stokvel.name} is inactive")
+    result = ImportResult(on_error)
+    # Hashing is deliberately slow: rows without their own password share one hash
+    shared_hash = make_password(password or None)
+    active_stokvels = {}
+    touched = set()
+
+    def stokvel_for(data):
+        if stokvel is not None:
+            return stokvel.pk
+        stokvel_id = data["stokvel_id"]
+        if stokvel_id is None:
+            return None
+        if stokvel_id not in active_stokvels:
+            active_stokvels[stokvel_id] = Stokvel.objects.filter(pk=stokvel_id, active=True).exists()
+        return stokvel_id if active_stokvels[stokvel_id] else False
+
+    def insert(rows):
+        users = User.objects.bulk_create([
+            User(
+                username=data["username"],
+                email=data["email"],
+                first_name=data["first_name"],
+                last_name=data["last_name"],
+                password=make_password(data["password"]) if data["password"] else shared_hash,
+            )
+            for _, data in rows
+        ])
+        if any(user.pk is None for user in users):
+            # Backends that cannot return ids from a bulk insert
+            ids = dict(User.objects.filter(username__in=[u.username for u in users]).values_list("username", "id"))
+            for user in users:
+                user.pk = ids[user.username]
+        Member.objects.bulk_create([
+            Member(
+                user=user,
+                stokvel_id=stokvel_for(data),
+                phone_number=data["phone_number"] or None,
+                address=data["address"] or None,
+                date_of_birth=data["date_of_birth"],
+            )
+            for user, (_, data) in zip(users, rows)
+        ])
+        touched.update(stokvel_for(data) for _, data in rows)
+        return len(users)
+
+    seen = set()
+    for chunk in _chunks(read_rows(lines, fmt), chunk_size):
+        valid = _validate(chunk, MemberRowForm, result)
+        taken = set(
+            User.objects.filter(username__in=[data["username"] for _, data in valid]).values_list("username", flat=True)
+        )
+        rows = []
+        for line, data in valid:
+            if data["username"] in taken or data["username"] in seen:
+                result.error(line, f"username: {data['username']} already exists")
+            elif stokvel_for(data) is False:
+                result.error(line, f"stokvel_id: {data['stokvel_id']} not found or inactive")
+            else:
+                seen.add(data["username"])
+                rows.append((line, data))
+        if rows:
+            _insert(rows, insert, result)
+
+    touched.discard(None)
+    if touched:
+        # New members have no ledger rows yet, so only the payout rotations (and caches) change
+        payouts.rebuild(stokvel_ids=sorted(touched))
+    return result
+
+
+def import_records(lines, fmt="csv", stokvel=None, chunk_size=CHUNK_SIZE, on_error=None):
+    """
+    Add a FinancialRecord for every valid row of ``lines``. With ``stokvel``
+    only its members can be named. Returns an :class:`ImportResult`.
+    """
+    result = ImportResult(on_error)
+    touched, loose_members = set(), set()
+
+    def insert(rows):
+        FinancialRecord.objects.bulk_create([
+            FinancialRecord(
+                member_id=member_id,
+                contribution_date=data["contribution_date"],
+                amount_saved=data["amount_saved"] or 0,
+                amount_borrowed=data["amount_borrowed"] or 0,
+                notes=data["notes"] or None,
+            )
+            for _, data, member_id in rows
+        ])
+        return len(rows)
+
+    for chunk in _chunks(read_rows(lines, fmt), chunk_size):
+        valid = _validate(chunk, RecordRowForm, result)
+        members = Member.objects.filter(user__username__in={data["username"] for _, data in valid})
+        if stokvel is not None:
+            members = members.filter(stokvel=stokvel)
+        members = {username: (pk, stokvel_id) for pk, stokvel_id, username in
+                   members.values_list("pk", "stokvel_id", "user__username")}
+        rows = []
+        for line, data in valid:
+            if data["username"] not in members:
+                result.error(line, f"username: no member {data['username']}"
+                                   + (f" in {stokvel.name}" if stokvel is not None else ""))
+                continue
+            member_id, stokvel_id = members[data["username"]]
+            rows.append((line, data, member_id))
+            if stokvel_id is None:
+                loose_members.add(member_id)
+            else:
+                touched.add(stokvel_id)
+        if rows:
+            _insert(rows, insert, result)
+
+    if touched:
+        balances.rebuild(stokvel_ids=sorted(touched))
+    if loose_members:
+        balances.refresh_members(sorted(loose_members))
+    return result
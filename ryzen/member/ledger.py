@@ -0,0 +1,219 @@
+"""
+Ledger arithmetic shared by the views, services and reports.
+
+Display values are exact ``Decimal`` rands, rounded half-up to the cent;
+no float ever enters a money calculation. For analytics over many
+stokvels :class:`LedgerBatch` holds the same figures as NumPy ``int64``
+arrays of cents, so the totals, arrears and interest of every member are a
+handful of vectorised operations and still exact. NumPy is only imported
+by the batch code.
+
+``Stokvel.interest_rate`` is an annual percentage; ``payout_cycle`` maps to
+a fixed number of months in ``PAYOUT_CYCLE_MONTHS`` (a ``custom`` cycle has
+none and must be given explicitly).
+"""
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal
+
+from dateutil.relativedelta import relativedelta
+from django.db.models import BigIntegerField, F, Value
+from django.db.models.functions import Cast, Coalesce, Round
+
+CENT = Decimal("0.01")
+ZERO = Decimal("0.00")
+DAYS_PER_YEAR = 365
+
+PAYOUT_CYCLE_MONTHS = {
+    "monthly": 1,
+    "quarterly": 3,
+    "annual": 12,
+}
+
+
+def money(value):
+    """``value`` as a Decimal rounded half-up to the cent. Floats go through ``str`` to avoid binary noise."""
+    if isinstance(value, float):
+        value = str(value)
+    return Decimal(value or 0).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def to_cents(value):
+    return int(money(value) * 100)
+
+
+def from_cents(cents):
+    return (Decimal(int(cents)) / 100).quantize(CENT)
+
+
+def total(values):
+    """Exact sum of money values."""
+    return money(sum((money(value) for value in values), ZERO))
+
+
+def amount_owed(monthly_contribution, saved):
+    """What a member still owes against the monthly contribution."""
+    return money(max(money(monthly_contribution) - money(saved), ZERO))
+
+
+def arrears(saved, borrowed):
+    """Borrowed money not covered by savings."""
+    return money(max(money(borrowed) - money(saved), ZERO))
+
+
+def progress(current, target):
+    """Whole percent of ``target`` reached by ``current`` (rounded down; 0 without a target)."""
+    target = to_cents(target)
+    if target <= 0:
+        return 0
+    return to_cents(current) * 100 // target
+
+
+def accrued_interest(balance, annual_rate, days):
+    """Simple interest on ``balance`` over ``days`` days at ``annual_rate`` percent (actual/365)."""
+    return money(money(balance) * money(annual_rate) * days / (100 * DAYS_PER_YEAR))
+
+
+def monthly_interest(balance, annual_rate):
+    """One month (a twelfth of a year) of interest on ``balance`` at ``annual_rate`` percent."""
+    return money(money(balance) * money(annual_rate) / 1200)
+
+
+def compound_interest(balance, annual_rate, months):
+    """Interest on ``balance`` compounded monthly for ``months`` months at ``annual_rate`` percent."""
+    start = grown = money(balance)
+    for _ in range(months):
+        grown += monthly_interest(grown, annual_rate)
+    return grown - start
+
+
+def cycle_months(cycle, custom_months=None):
+    """Months between payouts for a ``payout_cycle``; ``custom`` needs ``custom_months``."""
+    months = PAYOUT_CYCLE_MONTHS.get(cycle, custom_months if cycle == "custom" else None)
+    if not months or months < 1:
+        raise ValueError(f"No payout interval for cycle {cycle!r}")
+    return months
+
+
+def payout_dates(start, cycle, count, custom_months=None):
+    """The first ``count`` payout dates from ``start`` (inclusive), ``cycle`` apart."""
+    months = cycle_months(cycle, custom_months)
+    return [start + relativedelta(months=months * i) for i in range(count)]
+
+
+def next_payout_date(start, cycle, today=None, custom_months=None):
+    """The first payout date on or after ``today``."""
+    today = today or date.today()
+    months = cycle_months(cycle, custom_months)
+    if today <= start:
+        return start
+    elapsed = (today.year - start.year) * 12 + today.month - start.month
+    step = elapsed // months
+    candidate = start + relativedelta(months=months * step)
+    if candidate < today:
+        candidate = start + relativedelta(months=months * (step + 1))
+    return candidate
+
+
+def cents(expression):
+    """An ORM expression that reads a money column (NULL as 0) as an integer number of cents."""
+    return Cast(Round(Coalesce(F(expression), Value(ZERO)) * 100), BigIntegerField())
+
+
+class LedgerBatch:
+    """
+    Stokvel and member figures as parallel arrays of integer cents.
+
+    ``stokvel_ids``, ``contribution`` (monthly, cents), ``rate_bp`` (annual
+    interest in basis points) and ``month_saved`` (this month, cents) have
+    one entry per stokvel; ``member_stokvel`` (an index into the stokvel
+    arrays), ``saved`` and ``borrowed`` one entry per member.
+    """
+
+    def __init__(self, stokvel_ids, contribution, rate_bp, month_saved, member_stokvel, saved, borrowed):
+        import numpy as np
+
+        self.stokvel_ids = np.asarray(stokvel_ids, dtype=np.int64)
+        self.contribution = np.asarray(contribution, dtype=np.int64)
+        self.rate_bp = np.asarray(rate_bp, dtype=np.int64)
+        self.month_saved = np.asarray(month_saved, dtype=np.int64)
+        self.member_stokvel = np.asarray(member_stokvel, dtype=np.intp)
+        self.saved = np.asarray(saved, dtype=np.int64)
+        self.borrowed = np.asarray(borrowed, dtype=np.int64)
+
+    @classmethod
+    def from_database(cls, stokvel_ids=None, today=None):
+        """Load every (or the given) stokvel with its members' balances: three queries."""
+        from stokvel.models import Stokvel
+        from .balances import month_start
+        from .models import Member, StokvelMonthlyRollup
+
+        stokvels = Stokvel.objects.order_by("pk")
+        if stokvel_ids is not None:
+            stokvels = stokvels.filter(pk__in=stokvel_ids)
+        rows = list(stokvels.values_list("pk", cents("monthly_contribution"), cents("interest_rate")))
+        ids = [pk for pk, _, _ in rows]
+        index = {pk: i for i, pk in enumerate(ids)}
+
+        month = dict(
+            StokvelMonthlyRollup.objects.filter(stokvel_id__in=ids, month=month_start(today or date.today()))
+            .values_list("stokvel_id", cents("total_saved"))
+        )
+        members = Member.objects.filter(stokvel_id__in=ids).values_list(
+            "stokvel_id", cents("balance__total_saved"), cents("balance__total_borrowed")
+        )
+        member_stokvel, saved, borrowed = [], [], []
+        for stokvel_id, member_saved, member_borrowed in members.iterator(chunk_size=10000):
+            member_stokvel.append(index[stokvel_id])
+            saved.append(member_saved)
+            borrowed.append(member_borrowed)
+        return cls(
+            ids,
+            [contribution for _, contribution, _ in rows],
+            [rate for _, _, rate in rows],
+            [month.get(pk, 0) for pk in ids],
+            member_stokvel, saved, borrowed,
+        )
+
+    def _per_stokvel(self, values):
+        import numpy as np
+
+        out = np.zeros(len(self.stokvel_ids), dtype=np.int64)
+        np.add.at(out, self.member_stokvel, values)
+        return out
+
+    def compute(self):
+        """Per-stokvel arrays (cents, except counts and percentages)."""
+        import numpy as np
+
+        members = np.bincount(self.member_stokvel, minlength=len(self.stokvel_ids)).astype(np.int64)
+        total_saved = self._per_stokvel(self.saved)
+        owed = np.maximum(self.contribution[self.member_stokvel] - self.saved, 0)
+        target = members * self.contribution
+        progress = np.zeros_like(target)
+        np.floor_divide(self.month_saved * 100, target, out=progress, where=target > 0)
+        # Half-up rounding of saved * rate / (12 months * 100 percent * 100 basis points)
+        divisor = 12 * 100 * 100
+        monthly_interest = (2 * total_saved * self.rate_bp + divisor) // (2 * divisor)
+        return {
+            "members": members,
+            "total_saved": total_saved,
+            "total_borrowed": self._per_stokvel(self.borrowed),
+            "net_arrears": self._per_stokvel(owed),
+            "member_arrears": self._per_stokvel(np.maximum(self.borrowed - self.saved, 0)),
+            "target_amount": target,
+            "current_month_total": self.month_saved,
+            "progress_percentage": progress,
+            "monthly_interest": monthly_interest,
+        }
+
+    def summaries(self):
+        """``{stokvel id: {figure: Decimal or int}}``, ready for display."""
+        arrays = self.compute()
+        counts = ("members", "progress_percentage")
+        return {
+            int(pk): {
+                name: int(values[i]) if name in counts else from_cents(values[i])
+                for name, values in arrays.items()
+            }
+            for i, pk in enumerate(self.stokvel_ids)
+        }
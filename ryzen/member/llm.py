@@ -0,0 +1,111 @@
+"""
+LLM clients used by the AI analytics assistant.
+
+The client class is chosen with the ``LLM_CLIENT`` setting (a dotted path), so
+tests and local development can swap Cohere for ``FakeLLMClient``.
+"""
+import asyncio
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from core.profiling import external
+
+
+class CohereClient:
+    """Thin wrapper around ``cohere.Client`` that returns plain reply text."""
+
+    def __init__(self):
+        import cohere
+
+        self.model = settings.LLM_MODEL
+        self._client = cohere.Client(settings.COHERE_API_KEY)
+        self._async_client = cohere.AsyncClient(settings.COHERE_API_KEY)
+
+    @staticmethod
+    def _history(history):
+        roles = {"user": "USER", "assistant": "CHATBOT"}
+        return [{"role": roles[turn.role], "message": turn.content} for turn in history or ()]
+
+    def chat(self, message, history=None, max_tokens=250, temperature=0.6):
+        with external():
+            response = self._client.chat(
+                model=self.model,
+                message=message,
+                chat_history=self._history(history),
+                max_tokens=max_tokens,
+                temperature=temperature,
+            )
+        return response.text
+
+    def stream_chat(self, message, history=None, max_tokens=250, temperature=0.6):
+        """Yield the reply text chunk by chunk as the model generates it."""
+        events = self._client.chat_stream(
+            model=self.model,
+            message=message,
+            chat_history=self._history(history),
+            max_tokens=max_tokens,
+            temperature=temperature,
+        )
+        with external():
+            for event in events:
+                if event.event_type == "text-generation":
+                    yield event.text
+
+    async def astream_chat(self, message, history=None, max_tokens=250, temperature=0.6):
+        """Async :meth:`stream_chat`, for ASGI views: no thread waits on the model."""
+        events = self._async_client.chat_stream(
+            model=self.model,
+            message=message,
+            chat_history=self._history(history),
+            max_tokens=max_tokens,
+            temperature=temperature,
+        )
+        with external():
+            async for event in events:
+                if event.event_type == "text-generation":
+                    yield event.text
+
+
+class FakeLLMClient:
+    """
+    Local stand-in for tests and offline development. Replies with
+    ``reply`` (streamed word by word) and records every prompt it receives
+    in ``calls``. ``LLM_FAKE_DELAY`` seconds pass before each streamed word,
+    to mimic a slow model in benchmarks.
+
+    ``history`` in both clients is a list of objects with ``role``
+    ("user"/"assistant") and ``content``, such as ChatMessage rows.
+    """
+    reply = "This is a test answer."
+    calls = []
+
+    def chat(self, message, history=None, max_tokens=250, temperature=0.6):
+        self.calls.append(message)
+        return self.reply
+
+    def _words(self, message):
+        self.calls.append(message)
+        words = self.reply.split(" ")
+        return [word if i == len(words) - 1 else f"{word} " for i, word in enumerate(words)]
+
+    def stream_chat(self, message, history=None, max_tokens=250, temperature=0.6):
+        for word in self._words(message):
+            time.sleep(settings.LLM_FAKE_DELAY)
+            yield word
+
+    async def astream_chat(self, message, history=None, max_tokens=250, temperature=0.6):
+        for word in self._words(message):
+            await asyncio.sleep(settings.LLM_FAKE_DELAY)
+            yield word
+
+
+@lru_cache(maxsize=None)
+def _client(path):
+    return import_string(path)()
+
+
+def get_client():
+    return _client(settings.LLM_CLIENT)
@@ -0,0 +1,81 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from member import ledger
+
+
+def per_row(batch):
+    """The same figures as ``LedgerBatch.summaries`` computed the old way: a Decimal loop over every member."""
+    contribution = [ledger.from_cents(c) for c in batch.contribution]
+    rate = [ledger.from_cents(r) for r in batch.rate_bp]
+    summaries = {
+        int(pk): {"members": 0, "total_saved": ledger.ZERO, "total_borrowed": ledger.ZERO,
+                  "net_arrears": ledger.ZERO, "member_arrears": ledger.ZERO}
+        for pk in batch.stokvel_ids
+    }
+    for i, saved_cents, borrowed_cents in zip(batch.member_stokvel, batch.saved, batch.borrowed):
+        row = summaries[int(batch.stokvel_ids[i])]
+        saved, borrowed = ledger.from_cents(saved_cents), ledger.from_cents(borrowed_cents)
+        row["members"] += 1
+        row["total_saved"] += saved
+        row["total_borrowed"] += borrowed
+        row["net_arrears"] += ledger.amount_owed(contribution[i], saved)
+        row["member_arrears"] += ledger.arrears(saved, borrowed)
+    for i, pk in enumerate(batch.stokvel_ids):
+        row = summaries[int(pk)]
+        row["target_amount"] = ledger.money(row["members"] * contribution[i])
+        row["current_month_total"] = ledger.from_cents(batch.month_saved[i])
+        row["progress_percentage"] = ledger.progress(row["current_month_total"], row["target_amount"])
+        row["monthly_interest"] = ledger.monthly_interest(row["total_saved"], rate[i])
+    return summaries
+
+
+def synthetic_batch(stokvels, members, seed=0):
+    rng = random.Random(seed)
+    member_stokvel = [rng.randrange(stokvels) for _ in range(stokvels * members)]
+    return ledger.LedgerBatch(
+        stokvel_ids=range(1, stokvels + 1),
+        contribution=[rng.randrange(10000, 200000) for _ in range(stokvels)],
+        rate_bp=[rng.randrange(0, 1500) for _ in range(stokvels)],
+        month_saved=[rng.randrange(0, 200000 * members) for _ in range(stokvels)],
+        member_stokvel=member_stokvel,
+        saved=[rng.randrange(0, 5000000) for _ in member_stokvel],
+        borrowed=[rng.randrange(0, 1000000) if rng.random() < 0.3 else 0 for _ in member_stokvel],
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the vectorised ledger (NumPy integer cents) with the per-row Decimal loop "
+        "on synthetic data: both must agree to the cent"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stokvels", type=int, default=100, help="Number of synthetic stokvels")
+        parser.add_argument("--members", type=int, default=1000, help="Members per stokvel")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs of each method (the best is reported)")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        batch = synthetic_batch(options["stokvels"], options["members"], options["seed"])
+
+        def best(function):
+            timings = []
+            for _ in range(options["repeat"]):
+                started = time.perf_counter()
+                result = function()
+                timings.append(time.perf_counter() - started)
+            return result, min(timings)
+
+        expected, loop_seconds = best(lambda: per_row(batch))
+        actual, batch_seconds = best(batch.summaries)
+        if actual != expected:
+            wrong = sorted(pk for pk in expected if expected[pk] != actual.get(pk))
+            raise CommandError(f"Results differ for {len(wrong)} stokvel(s), e.g. {wrong[:5]}")
+
+        rows = len(batch.saved)
+        self.stdout.write(f"{rows} members in {len(batch.stokvel_ids)} stokvels, results identical")
+        self.stdout.write(f"per-row Decimal loop: {loop_seconds * 1000:10.1f} ms")
+        self.stdout.write(f"LedgerBatch (NumPy):  {batch_seconds * 1000:10.1f} ms")
+        self.stdout.write(self.style.SUCCESS(f"{loop_seconds / batch_seconds:.1f}x faster"))
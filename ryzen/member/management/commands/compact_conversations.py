@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from member import conversations
+
+
+class Command(BaseCommand):
+    help = "Delete old archived AI chats and trim long conversations (run daily from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-messages", type=int, default=None,
+                            help="Messages kept per conversation (default CHAT_MAX_MESSAGES)")
+        parser.add_argument("--retention-days", type=int, default=None,
+                            help="Days archived conversations are kept (default CHAT_ARCHIVE_RETENTION_DAYS)")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted_conversations, deleted_messages = conversations.compact(
+            max_messages=options["max_messages"],
+            retention_days=options["retention_days"],
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted_conversations} archived conversations and trimmed {deleted_messages} messages."
+        ))
@@ -0,0 +1,65 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from member import imports
+from stokvel.models import Stokvel
+
+
+class Command(BaseCommand):
+    help = (
+        "Import members or ledger history from a CSV or JSON Lines file, in chunks, "
+        "reporting invalid rows without stopping (see member/imports.py for the columns)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=["members", "records"])
+        parser.add_argument("path", help="CSV or JSONL file")
+        parser.add_argument("--format", choices=["csv", "jsonl"], default=None,
+                            help="File format (default: from the file extension)")
+        parser.add_argument("--stokvel", type=int, default=None,
+                            help="Stokvel id: members join it / records must belong to its members")
+        parser.add_argument("--password", default=None,
+                            help="Initial password for imported members without a password column")
+        parser.add_argument("--chunk-size", type=int, default=imports.CHUNK_SIZE, help="Rows per transaction")
+        parser.add_argument("--errors", default=None, help="Write every rejected row (line, error) to this CSV file")
+
+    def handle(self, *args, **options):
+        stokvel = None
+        if options["stokvel"] is not None:
+            try:
+                stokvel = Stokvel.objects.get(pk=options["stokvel"])
+            except Stokvel.DoesNotExist:
+                raise CommandError(f"Stokvel {options['stokvel']} does not exist")
+        fmt = options["format"] or imports.detect_format(options["path"])
+
+        error_file = open(options["errors"], "w", newline="") if options["errors"] else None
+        on_error = None
+        if error_file is not None:
+            writer = csv.writer(error_file)
+            writer.writerow(["line", "error"])
+            on_error = lambda line, message: writer.writerow([line, message])  # noqa: E731
+        try:
+            with open(options["path"], newline="", encoding="utf-8-sig") as lines:
+                if options["kind"] == "members":
+                    result = imports.import_members(
+                        lines, fmt, stokvel=stokvel, password=options["password"],
+                        chunk_size=options["chunk_size"], on_error=on_error,
+                    )
+                else:
+                    result = imports.import_records(
+                        lines, fmt, stokvel=stokvel, chunk_size=options["chunk_size"], on_error=on_error,
+                    )
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+        finally:
+            if error_file is not None:
+                error_file.close()
+
+        for line, message in result.errors[:20]:
+            self.stdout.write(self.style.WARNING(f"line {line}: {message}"))
+        if result.error_count > 20:
+            self.stdout.write(self.style.WARNING(f"... and {result.error_count - 20} more"))
+        style = self.style.SUCCESS if not result.error_count else self.style.WARNING
+        self.stdout.write(style(
+            f"Read {result.rows} rows: {result.created} {options['kind']} imported, {result.error_count} rejected."
+        ))
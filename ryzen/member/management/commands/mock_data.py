@@ -1,34 +1,52 @@
-from django.core.management.base import BaseCommand
-from django.utils import timezone
-from member.models import Member, FinancialRecord
-from datetime import timedelta
-import random
+from django.core.management.base import BaseCommand, CommandError
+from member import mockdata
 
-class Command(BaseCommand):
-    help = "Generate mock financial data for dashboard charts"
 
-    def handle(self, *args, **kwargs):
-        members = Member.objects.all()
-        if not members.exists():
-            self.stdout.write(self.style.ERROR("No members found. Please create members first."))
-            return
+class Command(BaseCommand):
+    help = (
+        "Generate mock data. Without --stokvels, adds financial records for the existing members; "
+        "with it, creates whole stokvels (users, members, ledger, notifications, messages) at load-test scale"
+    )
 
-        today = timezone.now().date()
-        for member in members:
-            for month_offset in range(6, 0, -1):  # Last 6 months
-                first_day_of_month = today.replace(day=1) - timedelta(days=month_offset*30)
-                # Create 4 records per month (weekly)
-                for week in range(4):
-                    contribution_date = first_day_of_month + timedelta(days=week*7)
-                    amount_saved = random.uniform(100, 1000)
-                    amount_borrowed = random.uniform(50, 500)
+    def add_arguments(self, parser):
+        parser.add_argument("--stokvels", type=int, default=0, help="New stokvels to create")
+        parser.add_argument("--members", type=int, default=100, help="Members per new stokvel")
+        parser.add_argument("--months", type=int, default=None,
+                            help="Months of ledger history (default 6 for existing members, 24 for new stokvels)")
+        parser.add_argument("--records-per-month", type=int, default=4, help="Contributions per member per month")
+        parser.add_argument("--notifications", type=int, default=20, help="Notifications per new member")
+        parser.add_argument("--messages", type=int, default=50, help="Coordinator messages per new stokvel")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed; the same seed gives the same data")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows per INSERT")
 
-                    FinancialRecord.objects.create(
-                        member=member,
-                        amount_saved=round(amount_saved, 2),
-                        amount_borrowed=round(amount_borrowed, 2),
-                        contribution_date=contribution_date,
-                        notes="Mock data for dashboard charts"
-                    )
+    def handle(self, *args, **options):
+        if not options["stokvels"]:
+            created = mockdata.generate_existing(
+                months=options["months"] or 6,
+                records_per_month=options["records_per_month"],
+                seed=options["seed"],
+                batch_size=options["batch_size"],
+            )
+            if not created:
+                self.stdout.write(self.style.ERROR("No members found. Please create members first, or pass --stokvels."))
+                return
+            self.stdout.write(self.style.SUCCESS(f"Mock financial data generated for all members! ({created} records)"))
+            return
 
-        self.stdout.write(self.style.SUCCESS("Mock financial data generated for all members!"))
+        try:
+            counts = mockdata.generate(
+                stokvels=options["stokvels"],
+                members=options["members"],
+                months=options["months"] or 24,
+                records_per_month=options["records_per_month"],
+                notifications=options["notifications"],
+                messages=options["messages"],
+                seed=options["seed"],
+                batch_size=options["batch_size"],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            "Created " + ", ".join(f"{rows} {name}" for name, rows in counts.items()) + "."
+        ))
+        self.stdout.write(f"Synthetic users log in with the password '{mockdata.MOCK_PASSWORD}'.")
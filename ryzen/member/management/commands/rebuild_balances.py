@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from member import balances
+
+
+class Command(BaseCommand):
+    help = "Rebuild member balances and monthly stokvel rollups from the ledger, then verify them"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stokvel", type=int, action="append", dest="stokvels",
+                            help="Only rebuild this stokvel (can be repeated)")
+        parser.add_argument("--verify-only", action="store_true",
+                            help="Check the stored tables against the ledger without rebuilding")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        stokvel_ids = options["stokvels"]
+
+        if not options["verify_only"]:
+            balance_count, rollup_count = balances.rebuild(stokvel_ids, batch_size=options["batch_size"])
+            self.stdout.write(f"Rebuilt {balance_count} member balances and {rollup_count} monthly rollups.")
+
+        problems = balances.verify(stokvel_ids)
+        for problem in problems:
+            self.stdout.write(self.style.WARNING(problem))
+        if problems:
+            raise CommandError(f"{len(problems)} balance mismatches found.")
+        self.stdout.write(self.style.SUCCESS("Balances match the ledger."))
@@ -0,0 +1,41 @@
+# Generated by Django 5.2 on 2026-10-18 16:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('member', '0002_initial'),
+        ('stokvel', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemberBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_saved', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_borrowed', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('arrears', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('last_contribution_date', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('member', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='balance', to='member.member')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StokvelMonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('total_saved', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_borrowed', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('record_count', models.PositiveIntegerField(default=0)),
+                ('stokvel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_rollups', to='stokvel.stokvel')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('stokvel', 'month'), name='unique_stokvel_month_rollup')],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, DateField, Max, Sum
+from django.db.models.functions import TruncMonth
+
+
+def populate(apps, schema_editor):
+    Member = apps.get_model("member", "Member")
+    FinancialRecord = apps.get_model("member", "FinancialRecord")
+    MemberBalance = apps.get_model("member", "MemberBalance")
+    StokvelMonthlyRollup = apps.get_model("member", "StokvelMonthlyRollup")
+
+    totals = Member.objects.annotate(
+        saved=Sum("financial_records__amount_saved"),
+        borrowed=Sum("financial_records__amount_borrowed"),
+        last=Max("financial_records__contribution_date"),
+    ).values_list("id", "saved", "borrowed", "last")
+    balances = []
+    for member_id, saved, borrowed, last in totals.iterator():
+        saved, borrowed = saved or Decimal("0"), borrowed or Decimal("0")
+        balances.append(MemberBalance(
+            member_id=member_id,
+            total_saved=saved,
+            total_borrowed=borrowed,
+            arrears=max(borrowed - saved, Decimal("0")),
+            last_contribution_date=last,
+        ))
+    MemberBalance.objects.bulk_create(balances, batch_size=1000)
+
+    monthly = (
+        FinancialRecord.objects.filter(member__stokvel__isnull=False)
+        .annotate(month=TruncMonth("contribution_date", output_field=DateField()))
+        .values("member__stokvel_id", "month")
+        .annotate(saved=Sum("amount_saved"), borrowed=Sum("amount_borrowed"), count=Count("id"))
+        .order_by()
+    )
+    StokvelMonthlyRollup.objects.bulk_create([
+        StokvelMonthlyRollup(
+            stokvel_id=row["member__stokvel_id"],
+            month=row["month"],
+            total_saved=row["saved"],
+            total_borrowed=row["borrowed"],
+            record_count=row["count"],
+        )
+        for row in monthly.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('member', '0003_member_balances'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 16:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('member', '0004_populate_balances'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='financialrecord',
+            index=models.Index(fields=['member', 'contribution_date'], name='finrec_member_date_idx'),
+        ),
+    ]
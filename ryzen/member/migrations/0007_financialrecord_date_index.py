@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 16:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('member', '0006_conversations'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='financialrecord',
+            index=models.Index(fields=['contribution_date'], name='finrec_date_idx'),
+        ),
+    ]
@@ -0,0 +1,156 @@
+"""
+Synthetic data at load-test scale.
+
+Everything is inserted with ``bulk_create`` in batches, one transaction per
+stokvel, and the derived tables (balances, monthly rollups, payout
+schedules, unread counters) are rebuilt once at the end instead of row by
+row through signals. All synthetic users share a single pre-computed
+password hash, and the same ``seed`` always produces the same data.
+"""
+import random
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from communications import unread
+from communications.models import CoordinatorMessage, Notification
+from stokvel import payouts
+from stokvel.models import Stokvel
+from . import balances
+from .models import FinancialRecord, Member
+
+MOCK_PASSWORD = "mock-password"
+CATEGORIES = [choice for choice, _ in Notification.CATEGORY_CHOICES]
+
+
+def _cents(rng, low, high):
+    return Decimal(rng.randrange(low * 100, high * 100)).scaleb(-2)
+
+
+def _moment(day, rng):
+    return timezone.make_aware(datetime.combine(day, time(rng.randrange(7, 20), rng.randrange(60))))
+
+
+def _insert(model, rows, batch_size):
+    """bulk_create ``rows`` (any iterable) ``batch_size`` at a time, without holding them all in memory."""
+    batch, total = [], 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            model.objects.bulk_create(batch, batch_size=batch_size)
+            total += len(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch, batch_size=batch_size)
+        total += len(batch)
+    return total
+
+
+def _records(rng, member_ids, months, records_per_month, today):
+    first_month = today.replace(day=1) - relativedelta(months=months)
+    for member_id in member_ids:
+        for month in range(months):
+            start = first_month + relativedelta(months=month)
+            for week in range(records_per_month):
+                yield FinancialRecord(
+                    member_id=member_id,
+                    amount_saved=_cents(rng, 100, 1000),
+                    amount_borrowed=_cents(rng, 0, 500) if rng.random() < 0.3 else Decimal("0.00"),
+                    contribution_date=_moment(start + timedelta(days=week * 7), rng),
+                    notes="Mock data",
+                )
+
+
+def _notifications(rng, user_ids, per_user, months, today):
+    span = months * 30
+    for user_id in user_ids:
+        for i in range(per_user):
+            yield Notification(
+                user_id=user_id,
+                title=f"Mock notification {i + 1}",
+                message="Generated for load testing.",
+                category=rng.choice(CATEGORIES),
+                created_at=_moment(today - timedelta(days=rng.randrange(span)), rng),
+                read=rng.random() < 0.7,
+            )
+
+
+def generate_existing(months=6, records_per_month=4, seed=0, batch_size=5000, today=None):
+    """Add ``months`` of weekly records for every existing member. Returns the number of records."""
+    rng = random.Random(seed)
+    today = today or timezone.localdate()
+    member_ids = list(Member.objects.order_by("id").values_list("id", flat=True))
+    with transaction.atomic():
+        created = _insert(FinancialRecord, _records(rng, member_ids, months, records_per_month, today), batch_size)
+    balances.rebuild()
+    return created
+
+
+def generate(stokvels=1, members=100, months=24, records_per_month=4, notifications=20, messages=50,
+             seed=0, batch_size=5000, today=None):
+    """
+    Create ``stokvels`` new stokvels of ``members`` members each, with
+    ``months`` of ledger history, ``notifications`` per member and
+    ``messages`` coordinator messages per stokvel.
+
+    Returns ``{model name: rows created}``. Raises ValueError if data for
+    ``seed`` already exists.
+    """
+    if Stokvel.objects.filter(name__startswith=f"Mock stokvel mock{seed}-").exists():
+        raise ValueError(f"Mock data for seed {seed} already exists; pick another seed")
+    rng = random.Random(seed)
+    today = today or timezone.localdate()
+    password = make_password(MOCK_PASSWORD)
+    counts = dict.fromkeys(["stokvels", "users", "members", "records", "notifications", "messages"], 0)
+    stokvel_ids, user_ids = [], []
+
+    for s in range(stokvels):
+        prefix = f"mock{seed}-{s}"
+        with transaction.atomic():
+            # bulk_create skips the per-save payout reschedule; the schedules are built once at the end
+            stokvel, = Stokvel.objects.bulk_create([Stokvel(
+                name=f"Mock stokvel {prefix}",
+                monthly_contribution=Decimal(rng.choice([200, 300, 500, 1000])),
+                description="Generated for load testing.",
+            )])
+            counts["users"] += _insert(User, (
+                User(username=f"{prefix}-{i:06d}", first_name=f"Member{i}", last_name=f"Mock{s}",
+                     email=f"{prefix}-{i}@example.com", password=password)
+                for i in range(members)
+            ), batch_size)
+            stokvel_users = list(
+                User.objects.filter(username__startswith=f"{prefix}-").order_by("username").values_list("id", flat=True)
+            )
+            counts["members"] += _insert(Member, (Member(user_id=user_id, stokvel=stokvel) for user_id in stokvel_users), batch_size)
+            member_ids = list(Member.objects.filter(stokvel=stokvel).order_by("id").values_list("id", flat=True))
+
+            counts["records"] += _insert(
+                FinancialRecord, _records(rng, member_ids, months, records_per_month, today), batch_size
+            )
+            counts["notifications"] += _insert(
+                Notification, _notifications(rng, stokvel_users, notifications, months, today), batch_size
+            )
+            if stokvel_users:
+                coordinator = stokvel_users[0]
+                counts["messages"] += _insert(CoordinatorMessage, (
+                    CoordinatorMessage(
+                        stokvel=stokvel, sender_id=coordinator, message=f"Mock message {i + 1}",
+                        created_at=_moment(today - timedelta(days=rng.randrange(months * 30)), rng),
+                    )
+                    for i in range(messages)
+                ), batch_size)
+        counts["stokvels"] += 1
+        stokvel_ids.append(stokvel.pk)
+        user_ids.extend(stokvel_users)
+
+    # bulk_create sends no signals, so derive the summary tables in one pass
+    balances.rebuild(stokvel_ids=stokvel_ids, batch_size=batch_size)
+    payouts.rebuild(stokvel_ids=stokvel_ids, batch_size=batch_size)
+    for start in range(0, len(user_ids), batch_size):
+        unread.rebuild(user_ids=user_ids[start:start + batch_size])
+    return counts
@@ -1,3 +1,5 @@
+from decimal import Decimal
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
@@ -30,12 +32,96 @@ class FinancialRecord(models.Model):
     Tied to a Member; stores individual financial information.
     """
     member = models.ForeignKey(Member, on_delete=models.CASCADE, related_name="financial_records")
-    amount_saved = models.DecimalField(max_digits=12, decimal_places=2, default=0.0)
-    amount_borrowed = models.DecimalField(max_digits=12, decimal_places=2, default=0.0)
+    amount_saved = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    amount_borrowed = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
     contribution_date = models.DateTimeField(default=timezone.now)
     notes = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Per-member ledger lookups filtered by contribution date range
+            models.Index(fields=["member", "contribution_date"], name="finrec_member_date_idx"),
+            # Ledger-wide date ranges, e.g. the admin's date hierarchy
+            models.Index(fields=["contribution_date"], name="finrec_date_idx"),
+        ]
+
     def __str__(self):
         return f"{self.member.user.username} - {self.amount_saved} saved"
 
 
+class MemberBalance(models.Model):
+    """
+    Running ledger totals for a Member, kept in sync with FinancialRecord writes
+    (see member/balances.py) so reading a balance never scans the ledger.
+    """
+    member = models.OneToOneField(Member, on_delete=models.CASCADE, related_name="balance")
+    total_saved = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_borrowed = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    arrears = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    last_contribution_date = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Balance for member #{self.member_id}"
+
+
+class StokvelMonthlyRollup(models.Model):
+    """
+    Saved/borrowed totals of one stokvel for one calendar month.
+    """
+    stokvel = models.ForeignKey("stokvel.Stokvel", on_delete=models.CASCADE, related_name="monthly_rollups")
+    month = models.DateField(help_text="First day of the month")
+    total_saved = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_borrowed = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    record_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["stokvel", "month"], name="unique_stokvel_month_rollup"),
+        ]
+
+    def __str__(self):
+        return f"Stokvel #{self.stokvel_id} - {self.month:%b %Y}"
+
+
+class Conversation(models.Model):
+    """
+    An AI analytics chat thread. Clearing the chat archives the active
+    conversation and the next message starts a new one.
+    """
+    member = models.ForeignKey(Member, on_delete=models.CASCADE, related_name="conversations")
+    archived = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["member", "archived", "-updated_at"], name="conv_member_active_idx"),
+        ]
+
+    def __str__(self):
+        return f"Conversation #{self.pk} of {self.member_id}"
+
+
+class ChatMessage(models.Model):
+    """
+    One turn of a Conversation.
+    """
+    ROLE_CHOICES = [
+        ("user", "User"),
+        ("assistant", "Assistant"),
+    ]
+
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name="messages")
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES)
+    content = models.TextField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Newest-first windows and "load earlier" pages of one conversation
+            models.Index(fields=["conversation", "-id"], name="chatmsg_conversation_id_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.role}: {self.content[:20]}"
@@ -0,0 +1,69 @@
+"""
+Financial context handed to the LLM with every chat message.
+
+The per-member summary comes from one query over the balance table and is
+cached under the stokvel's versioned keys (stokvel/cache.py), so it is only
+rebuilt after the stokvel's ledger changes. The text is kept within a token
+budget: stokvel-wide aggregates first, then members by amount saved, with
+whoever does not fit folded into a single "remaining members" line.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+
+from stokvel import cache as stokvel_cache
+from .services import members_with_balances
+
+ZERO = Decimal("0.00")
+CENTS = Decimal("0.01")
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+def member_summaries(stokvel):
+    """``[(name, saved, borrowed), ...]`` for every member, biggest savers first, in one query."""
+    rows = members_with_balances(stokvel).order_by("-total_saved", "id")
+    return [
+        (m.user.get_full_name() or m.user.username, m.total_saved.quantize(CENTS), m.total_borrowed.quantize(CENTS))
+        for m in rows
+    ]
+
+
+def render_context(stokvel, summaries, token_budget):
+    total_saved = sum((saved for _, saved, _ in summaries), ZERO)
+    total_borrowed = sum((borrowed for _, _, borrowed in summaries), ZERO)
+    lines = [
+        f"Stokvel {stokvel.name}: {len(summaries)} members, monthly contribution R{stokvel.monthly_contribution}",
+        f"Total saved R{total_saved}, total borrowed R{total_borrowed}",
+    ]
+    used = sum(estimate_tokens(line) for line in lines)
+
+    for index, (name, saved, borrowed) in enumerate(summaries):
+        line = f"{name}: Saved R{saved}, Borrowed R{borrowed}"
+        # Keep room for the line summarizing the members that do not fit
+        if used + estimate_tokens(line) + 25 > token_budget and index < len(summaries) - 1:
+            rest = summaries[index:]
+            lines.append(
+                f"{len(rest)} other members: Saved R{sum((s for _, s, _ in rest), ZERO)}, "
+                f"Borrowed R{sum((b for _, _, b in rest), ZERO)} combined"
+            )
+            break
+        lines.append(line)
+        used += estimate_tokens(line)
+
+    return "\n".join(lines)
+
+
+def build_context(stokvel, token_budget=None):
+    """The (cached) financial context for ``stokvel``, at most ``token_budget`` tokens long."""
+    token_budget = token_budget or settings.LLM_CONTEXT_TOKEN_BUDGET
+    key = stokvel_cache.key(stokvel.pk, "llm-context", token_budget)
+    context = cache.get(key)
+    if context is None:
+        context = render_context(stokvel, member_summaries(stokvel), token_budget)
+        cache.set(key, context, timeout=settings.LLM_CACHE_TTL)
+    return context
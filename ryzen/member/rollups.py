@@ -0,0 +1,100 @@
+"""
+Monthly time series of a stokvel's savings and borrowing.
+
+Closed months are read from the precomputed StokvelMonthlyRollup table (kept
+up to date by member/balances.py); only the current month is aggregated live
+from FinancialRecord, in a single ``TruncMonth``-grouped query.
+"""
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+from django.db.models import DateField, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import FinancialRecord, StokvelMonthlyRollup
+
+ZERO = Decimal("0.00")
+
+
+def month_window(months, today=None):
+    """First days of the last ``months`` months, oldest first, ending with the current month."""
+    current = (today or date.today()).replace(day=1)
+    return [current - relativedelta(months=i) for i in reversed(range(months))]
+
+
+def _start_of(month):
+    return timezone.make_aware(datetime.combine(month, time.min))
+
+
+def month_bounds(day):
+    """
+    ``(start, end)`` datetimes of the month ``day`` falls in, for half-open
+    ``contribution_date__gte=start, contribution_date__lt=end`` filters that
+    can use the (member, contribution_date) index, unlike ``__month``/``__year``.
+    """
+    month = day.replace(day=1)
+    return _start_of(month), _start_of(month + relativedelta(months=1))
+
+
+def live_monthly_totals(stokvel, start, end):
+    """
+    ``{month: (saved, borrowed)}`` for ``start <= month < end`` from the raw ledger.
+
+    ``start`` and ``end`` are first-of-month dates. One grouped query,
+    whatever the size of the window.
+    """
+    rows = (
+        FinancialRecord.objects.filter(
+            member__stokvel=stokvel,
+            contribution_date__gte=_start_of(start),
+            contribution_date__lt=_start_of(end),
+        )
+        .annotate(month=TruncMonth("contribution_date", output_field=DateField()))
+        .values("month")
+        .annotate(saved=Sum("amount_saved"), borrowed=Sum("amount_borrowed"))
+        .values_list("month", "saved", "borrowed")
+        .order_by("month")
+    )
+    return {month: (saved, borrowed) for month, saved, borrowed in rows}
+
+
+def monthly_totals(stokvel, months=12, today=None):
+    """
+    Saved/borrowed totals for each of the last ``months`` months, oldest first.
+
+    Returns a list of ``{"month", "saved", "borrowed"}`` dicts with empty
+    months filled with zeros.
+    """
+    window = month_window(months, today)
+    current = window[-1]
+
+    totals = {
+        r.month: (r.total_saved, r.total_borrowed)
+        for r in StokvelMonthlyRollup.objects.filter(stokvel=stokvel, month__gte=window[0], month__lt=current)
+    }
+    totals.update(live_monthly_totals(stokvel, current, current + relativedelta(months=1)))
+
+    return [
+        {"month": month, "saved": totals.get(month, (ZERO, ZERO))[0], "borrowed": totals.get(month, (ZERO, ZERO))[1]}
+        for month in window
+    ]
+
+
+def opening_totals(stokvel, before):
+    """Saved/borrowed totals of every closed month before ``before`` (a first-of-month date)."""
+    totals = StokvelMonthlyRollup.objects.filter(stokvel=stokvel, month__lt=before).aggregate(
+        saved=Sum("total_saved"), borrowed=Sum("total_borrowed"),
+    )
+    return totals["saved"] or ZERO, totals["borrowed"] or ZERO
+
+
+def cumulative(values, start=ZERO):
+    """Running totals of ``values``, starting from ``start``."""
+    series = []
+    running = start
+    for value in values:
+        running += value
+        series.append(running)
+    return series
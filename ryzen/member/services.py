@@ -0,0 +1,121 @@
+"""
+Aggregation helpers shared by the member-facing views.
+
+Every figure here is computed by the database with grouped ``annotate`` /
+``aggregate`` queries, so the number of queries per request stays constant no
+matter how many members or financial records a stokvel has. Lifetime totals
+come from the MemberBalance table (see member/balances.py) rather than the
+raw ledger.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from . import ledger
+from .balances import aread_balance, read_balance
+from .models import FinancialRecord, Member
+from .rollups import month_bounds
+
+ZERO = Decimal("0.00")
+
+
+def _money(expression):
+    """``expression`` with ``NULL`` (no balance row / no records) read as ``0.00``."""
+    return Coalesce(
+        expression,
+        Value(ZERO),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+def members_with_balances(stokvel):
+    """The stokvel's members with ``total_saved``/``total_borrowed`` annotated from their balances."""
+    return (
+        Member.objects.filter(stokvel=stokvel)
+        .select_related("user")
+        .annotate(
+            total_saved=_money(F("balance__total_saved")),
+            total_borrowed=_money(F("balance__total_borrowed")),
+            last_contribution_date=F("balance__last_contribution_date"),
+        )
+        .order_by("id")
+    )
+
+
+def stokvel_summary(stokvel, today=None):
+    """
+    Everything the dashboard needs about a stokvel, in a single query.
+
+    Returns a dict with the stokvel totals, the current month total, the
+    per-member rows (saved, borrowed, owed, month contribution and last
+    contribution date) and the active/inactive split.
+    """
+    month_start, month_end = month_bounds(today or date.today())
+    month_saved = (
+        FinancialRecord.objects.filter(
+            member=OuterRef("pk"),
+            contribution_date__gte=month_start,
+            contribution_date__lt=month_end,
+        )
+        .values("member")
+        .annotate(total=Sum("amount_saved"))
+        .values("total")
+    )
+
+    members = members_with_balances(stokvel).annotate(month_saved=_money(Subquery(month_saved)))
+
+    members_data = []
+    for m in members:
+        members_data.append({
+            "member": m,
+            "total_saved": m.total_saved,
+            "total_borrowed": m.total_borrowed,
+            "month_saved": m.month_saved,
+            "amount_owed": ledger.amount_owed(stokvel.monthly_contribution, m.total_saved),
+            "last_contribution_date": m.last_contribution_date,
+        })
+
+    active_members = [m for m in members_data if m["member"].user.is_active]
+    inactive_members = [m for m in members_data if not m["member"].user.is_active]
+    total_members = len(members_data)
+
+    return {
+        "members_data": members_data,
+        "active_members": active_members,
+        "inactive_members": inactive_members,
+        "total_members": total_members,
+        "active_members_count": len(active_members),
+        "total_balance": ledger.total(m["total_saved"] for m in members_data),
+        "current_month_total": ledger.total(m["month_saved"] for m in members_data),
+        "target_amount": ledger.money(total_members * ledger.money(stokvel.monthly_contribution)),
+        "net_arrears": ledger.total(m["amount_owed"] for m in members_data),
+    }
+
+
+def member_totals(member):
+    """Saved, borrowed and arrears for one member, read from its balance row."""
+    return read_balance(member)
+
+
+async def amember_totals(member):
+    return await aread_balance(member)
+
+
+def _month_records(member, today):
+    month_start, month_end = month_bounds(today or date.today())
+    return member.financial_records.filter(
+        contribution_date__gte=month_start,
+        contribution_date__lt=month_end,
+    )
+
+
+def month_contribution(member, today=None):
+    """What ``member`` has saved so far this month (one indexed aggregate)."""
+    return _month_records(member, today).aggregate(total=_money(Sum("amount_saved")))["total"]
+
+
+async def amonth_contribution(member, today=None):
+    totals = await _month_records(member, today).aaggregate(total=_money(Sum("amount_saved")))
+    return totals["total"]
@@ -0,0 +1,68 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from stokvel import cache as stokvel_cache
+from . import balances
+from .models import FinancialRecord, Member
+
+
+def _bump_stokvels_of(*member_ids):
+    """Invalidate cached data of the stokvels the given members belong to."""
+    stokvel_ids = Member.objects.filter(pk__in=member_ids, stokvel__isnull=False).values_list("stokvel_id", flat=True)
+    for stokvel_id in set(stokvel_ids):
+        stokvel_cache.bump(stokvel_id)
+
+
+@receiver(pre_save, sender=FinancialRecord)
+def remember_previous_record(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance._ledger_previous = balances.snapshot(instance)
+
+
+@receiver(post_save, sender=FinancialRecord)
+def update_balances_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_ledger_previous", None)
+    balances.record_saved(instance, previous=previous)
+    instance._ledger_previous = None
+    _bump_stokvels_of(instance.member_id, *([previous["member_id"]] if previous else []))
+
+
+@receiver(post_delete, sender=FinancialRecord)
+def update_balances_on_delete(sender, instance, **kwargs):
+    balances.record_deleted(instance)
+    _bump_stokvels_of(instance.member_id)
+
+
+@receiver(pre_save, sender=Member)
+def remember_previous_stokvel(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        instance._previous_stokvel_id = None
+    else:
+        instance._previous_stokvel_id = (
+            Member.objects.filter(pk=instance.pk).values_list("stokvel_id", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Member)
+@receiver(post_delete, sender=Member)
+def invalidate_stokvel_on_member_change(sender, instance, **kwargs):
+    for stokvel_id in {instance.stokvel_id, getattr(instance, "_previous_stokvel_id", None)}:
+        if stokvel_id:
+            stokvel_cache.bump(stokvel_id)
+
+
+# User fields shown in the cached stokvel dashboard (its active/inactive split and member names)
+_DASHBOARD_USER_FIELDS = {"is_active", "username", "first_name", "last_name"}
+
+
+@receiver(post_save, sender=User)
+def invalidate_stokvel_on_user_change(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    # Logging in saves last_login only, and a new user has no member yet
+    if raw or created or (update_fields is not None and not _DASHBOARD_USER_FIELDS & set(update_fields)):
+        return
+    stokvel_ids = Member.objects.filter(user=instance, stokvel__isnull=False).values_list("stokvel_id", flat=True)
+    for stokvel_id in set(stokvel_ids):
+        stokvel_cache.bump(stokvel_id)
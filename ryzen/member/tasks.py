@@ -0,0 +1,15 @@
+from core.jobs import finish, job
+from .assistant import answer
+from .conversations import add_message, recent_messages
+from .models import ChatMessage
+
+
+@job("member.ai_answer")
+def ai_answer(message_id):
+    """Answer the user's chat message ``message_id`` and append the reply to its conversation."""
+    question = ChatMessage.objects.select_related("conversation__member__stokvel").get(pk=message_id)
+    conversation = question.conversation
+    history = recent_messages(conversation, before_id=question.pk)
+    # The LLM call runs outside any transaction; only the reply is written with the job status
+    reply = answer(conversation.member.stokvel, question.content, history)
+    return finish(lambda: {"message_id": add_message(conversation, "assistant", reply).pk})
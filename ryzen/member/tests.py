@@ -1,3 +1,845 @@
-from django.test import TestCase
+import csv
+import io
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core import jobs
+from core.pagination import EstimatedCountPaginator, estimated_count
+from core.testing import QueryPlanAssertions
+from core.models import Job
+from stokvel import cache as stokvel_cache
+from stokvel.models import PayoutSchedule, Stokvel
+from . import ai_cache, balances, imports, ledger, mockdata, rollups
+from .assistant import answer
+from .dashboard import stokvel_dashboard
+from .llm import FakeLLMClient
+from .management.commands.bench_ledger import per_row, synthetic_batch
+from .prompt_context import build_context, estimate_tokens
+from .services import amember_totals, member_totals, stokvel_summary
+from .conversations import active_conversation, add_message, compact, page_before
+from .models import ChatMessage, Conversation, Member, FinancialRecord, MemberBalance
+
+
+class DashboardQueryPlanTests(QueryPlanAssertions, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.stokvel = Stokvel.objects.create(name="Plan Test", monthly_contribution=Decimal("500.00"))
+        now = timezone.now()
+        for i in range(10):
+            user = User.objects.create(username=f"member{i}")
+            member = Member.objects.create(user=user, stokvel=cls.stokvel)
+            for week in range(8):
+                FinancialRecord.objects.create(
+                    member=member,
+                    amount_saved=Decimal("100.00"),
+                    amount_borrowed=Decimal("25.00"),
+                    contribution_date=now - timedelta(weeks=week),
+                )
+        cls.user = User.objects.get(username="member0")
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.client.force_login(self.user)
+
+    def test_dashboard_uses_indexes(self):
+        self.assertNoFullScan(
+            lambda: self.client.get(reverse("member:dashboard")),
+            ["member_financialrecord", "member_member"],
+        )
+
+    def test_profile_uses_indexes(self):
+        self.assertNoFullScan(
+            lambda: self.client.get(reverse("member:profile")),
+            ["member_financialrecord", "member_memberbalance"],
+        )
+
+
+class BalanceTests(TestCase):
+    def setUp(self):
+        self.stokvel = Stokvel.objects.create(name="Balance Test", monthly_contribution=Decimal("100.00"))
+        self.other = Stokvel.objects.create(name="Other", monthly_contribution=Decimal("100.00"))
+        self.member = self.join("saver", self.stokvel)
+        self.march = timezone.make_aware(datetime(2025, 3, 5, 12))
+        self.april = timezone.make_aware(datetime(2025, 4, 5, 12))
+
+    def join(self, username, stokvel):
+        return Member.objects.create(user=User.objects.create(username=username), stokvel=stokvel)
+
+    def balance(self, member):
+        b = MemberBalance.objects.get(member=member)
+        return b.total_saved, b.total_borrowed, b.arrears, b.last_contribution_date
+
+    def rollups(self, stokvel):
+        return list(stokvel.monthly_rollups.order_by("month").values_list(
+            "month", "total_saved", "total_borrowed", "record_count"
+        ))
+
+    def test_create_adds_to_balance_and_rollup(self):
+        FinancialRecord.objects.create(member=self.member, amount_saved=Decimal("40.00"), contribution_date=self.march)
+        FinancialRecord.objects.create(
+            member=self.member, amount_borrowed=Decimal("90.00"), contribution_date=self.april
+        )
+        self.assertEqual(self.balance(self.member), (Decimal("40.00"), Decimal("90.00"), Decimal("50.00"), self.april))
+        self.assertEqual(self.rollups(self.stokvel), [
+            (date(2025, 3, 1), Decimal("40.00"), Decimal("0.00"), 1),
+            (date(2025, 4, 1), Decimal("0.00"), Decimal("90.00"), 1),
+        ])
+        self.assertEqual(balances.verify(), [])
+
+    def test_edit_applies_the_difference(self):
+        record = FinancialRecord.objects.create(
+            member=self.member, amount_saved=Decimal("40.00"), contribution_date=self.april
+        )
+        record.amount_saved = Decimal("25.50")
+        record.contribution_date = self.march
+        record.save()
+        self.assertEqual(self.balance(self.member), (Decimal("25.50"), Decimal("0.00"), Decimal("0.00"), self.march))
+        self.assertEqual(self.rollups(self.stokvel), [
+            (date(2025, 3, 1), Decimal("25.50"), Decimal("0.00"), 1),
+            (date(2025, 4, 1), Decimal("0.00"), Decimal("0.00"), 0),
+        ])
+        self.assertEqual(balances.verify(), [])
+
+    def test_moving_a_record_between_stokvels(self):
+        elsewhere = self.join("elsewhere", self.other)
+        record = FinancialRecord.objects.create(
+            member=self.member, amount_saved=Decimal("40.00"), contribution_date=self.march
+        )
+        record.member = elsewhere
+        record.save()
+        self.assertEqual(self.balance(self.member)[:3], (Decimal("0.00"), Decimal("0.00"), Decimal("0.00")))
+        self.assertEqual(self.balance(elsewhere), (Decimal("40.00"), Decimal("0.00"), Decimal("0.00"), self.march))
+        self.assertEqual(self.rollups(self.stokvel), [(date(2025, 3, 1), Decimal("0.00"), Decimal("0.00"), 0)])
+        self.assertEqual(self.rollups(self.other), [(date(2025, 3, 1), Decimal("40.00"), Decimal("0.00"), 1)])
+        self.assertEqual(balances.verify(), [])
+
+    def test_delete_removes_from_balance_and_rollup(self):
+        kept = FinancialRecord.objects.create(
+            member=self.member, amount_saved=Decimal("10.00"), contribution_date=self.march
+        )
+        FinancialRecord.objects.create(
+            member=self.member, amount_saved=Decimal("40.00"), contribution_date=self.april
+        ).delete()
+        self.assertEqual(
+            self.balance(self.member), (Decimal("10.00"), Decimal("0.00"), Decimal("0.00"), kept.contribution_date)
+        )
+        self.assertEqual(self.rollups(self.stokvel)[1], (date(2025, 4, 1), Decimal("0.00"), Decimal("0.00"), 0))
+        self.assertEqual(balances.verify(), [])
+
+    def test_deleting_a_member_with_records(self):
+        FinancialRecord.objects.create(member=self.member, amount_saved=Decimal("40.00"))
+
+        self.member.user.delete()
+
+        self.assertFalse(Member.objects.filter(pk=self.member.pk).exists())
+        self.assertEqual(self.stokvel.monthly_rollups.get().total_saved, Decimal("0.00"))
+
+    def test_rebuild_and_verify(self):
+        FinancialRecord.objects.create(member=self.member, amount_saved=Decimal("40.00"), contribution_date=self.march)
+        FinancialRecord.objects.create(
+            member=self.join("borrower", self.other), amount_borrowed=Decimal("70.00"), contribution_date=self.april
+        )
+        MemberBalance.objects.filter(member=self.member).update(total_saved=Decimal("1.00"))
+        self.stokvel.monthly_rollups.update(record_count=5)
+        self.assertEqual(len(balances.verify()), 2)
+        self.assertEqual(len(balances.verify([self.other.pk])), 0)
+
+        self.assertEqual(balances.rebuild([self.stokvel.pk]), (1, 1))
+        self.assertEqual(balances.verify(), [])
+        self.assertEqual(self.balance(self.member), (Decimal("40.00"), Decimal("0.00"), Decimal("0.00"), self.march))
+        self.assertEqual(self.rollups(self.stokvel), [(date(2025, 3, 1), Decimal("40.00"), Decimal("0.00"), 1)])
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.stokvel = Stokvel.objects.create(name="Rollups", monthly_contribution=Decimal("100.00"))
+        self.member = Member.objects.create(user=User.objects.create(username="roller"), stokvel=self.stokvel)
+        self.today = date(2025, 5, 20)
+
+    def record(self, day, saved="0", borrowed="0"):
+        return FinancialRecord.objects.create(
+            member=self.member, amount_saved=Decimal(saved), amount_borrowed=Decimal(borrowed),
+            contribution_date=timezone.make_aware(datetime(2025, day.month, day.day, 12)),
+        )
+
+    def totals(self, months=4):
+        return [
+            (row["month"], row["saved"], row["borrowed"])
+            for row in rollups.monthly_totals(self.stokvel, months=months, today=self.today)
+        ]
+
+    def test_closed_months_from_rollups_and_live_month_from_records(self):
+        self.record(date(2025, 3, 3), saved="40.00", borrowed="10.00")
+        self.record(date(2025, 4, 30), saved="25.00")
+        self.record(date(2025, 5, 1), saved="30.00")
+        self.assertEqual(self.totals(), [
+            (date(2025, 2, 1), Decimal("0.00"), Decimal("0.00")),
+            (date(2025, 3, 1), Decimal("40.00"), Decimal("10.00")),
+            (date(2025, 4, 1), Decimal("25.00"), Decimal("0.00")),
+            (date(2025, 5, 1), Decimal("30.00"), Decimal("0.00")),
+        ])
+
+        # Closed months only ever look at the rollup; the current month only at the ledger
+        self.stokvel.monthly_rollups.filter(month=date(2025, 3, 1)).update(total_saved=Decimal("1.00"))
+        self.stokvel.monthly_rollups.filter(month=date(2025, 5, 1)).update(total_saved=Decimal("999.00"))
+        FinancialRecord.objects.bulk_create([FinancialRecord(
+            member=self.member, amount_saved=Decimal("5.00"),
+            contribution_date=timezone.make_aware(datetime(2025, 5, 19, 12)),
+        )])
+        self.assertEqual(self.totals()[1:], [
+            (date(2025, 3, 1), Decimal("1.00"), Decimal("10.00")),
+            (date(2025, 4, 1), Decimal("25.00"), Decimal("0.00")),
+            (date(2025, 5, 1), Decimal("35.00"), Decimal("0.00")),
+        ])
+        self.assertEqual(rollups.opening_totals(self.stokvel, date(2025, 4, 1)), (Decimal("1.00"), Decimal("10.00")))
+
+    def test_months_without_records(self):
+        self.assertEqual(self.totals(3), [
+            (date(2025, 3, 1), Decimal("0.00"), Decimal("0.00")),
+            (date(2025, 4, 1), Decimal("0.00"), Decimal("0.00")),
+            (date(2025, 5, 1), Decimal("0.00"), Decimal("0.00")),
+        ])
+        self.assertEqual(rollups.opening_totals(self.stokvel, date(2025, 5, 1)), (Decimal("0.00"), Decimal("0.00")))
+        self.assertEqual(rollups.cumulative([Decimal("5.00"), rollups.ZERO, Decimal("2.50")], start=Decimal("10.00")),
+                         [Decimal("15.00"), Decimal("15.00"), Decimal("17.50")])
+
+    def test_signal_path_matches_rebuild(self):
+        other = Stokvel.objects.create(name="Elsewhere", monthly_contribution=Decimal("100.00"))
+        self.record(date(2025, 2, 10), saved="40.00")
+        moved = self.record(date(2025, 3, 10), saved="20.00", borrowed="5.00")
+        edited = self.record(date(2025, 3, 12), saved="15.00")
+        self.record(date(2025, 4, 2), borrowed="50.00").delete()
+        edited.amount_saved = Decimal("12.75")
+        edited.contribution_date = timezone.make_aware(datetime(2025, 4, 2, 12))
+        edited.save()
+        moved.member = Member.objects.create(user=User.objects.create(username="mover"), stokvel=other)
+        moved.save()
+
+        self.today = date(2025, 6, 1)
+        incremental = self.totals(5)
+        opening = rollups.opening_totals(self.stokvel, date(2025, 6, 1))
+        balances.rebuild()
+        self.assertEqual(self.totals(5), incremental)
+        self.assertEqual(rollups.opening_totals(self.stokvel, date(2025, 6, 1)), opening)
+        self.assertEqual(opening, (Decimal("52.75"), Decimal("0.00")))
+        self.assertEqual(balances.verify(), [])
+
+
+class ServicesTests(TestCase):
+    def setUp(self):
+        self.stokvel = Stokvel.objects.create(name="Services", monthly_contribution=Decimal("100.00"))
+        self.today = date(2025, 4, 15)
+        march = timezone.make_aware(datetime(2025, 3, 10, 12))
+        april = timezone.make_aware(datetime(2025, 4, 2, 12))
+        self.alice = self.join("alice")
+        self.bob = self.join("bob")
+        self.carol = self.join("carol", is_active=False)
+        for member, saved, borrowed, when in [
+            (self.alice, "60.00", "0", march),
+            (self.alice, "30.00", "0", april),
+            (self.bob, "150.00", "0", april),
+            (self.bob, "0", "200.00", march),
+        ]:
+            FinancialRecord.objects.create(
+                member=member, amount_saved=Decimal(saved), amount_borrowed=Decimal(borrowed), contribution_date=when
+            )
+
+    def join(self, username, **fields):
+        return Member.objects.create(user=User.objects.create(username=username, **fields), stokvel=self.stokvel)
+
+    def test_stokvel_summary_totals(self):
+        summary = stokvel_summary(self.stokvel, today=self.today)
+        self.assertEqual(summary["total_members"], 3)
+        self.assertEqual(summary["active_members_count"], 2)
+        self.assertEqual(summary["total_balance"], Decimal("240.00"))
+        self.assertEqual(summary["current_month_total"], Decimal("180.00"))
+        self.assertEqual(summary["target_amount"], Decimal("300.00"))
+        self.assertEqual(summary["net_arrears"], Decimal("110.00"))
+        rows = {row["member"].user.username: row for row in summary["members_data"]}
+        self.assertEqual(
+            [(rows[name]["total_saved"], rows[name]["month_saved"], rows[name]["amount_owed"])
+             for name in ("alice", "bob", "carol")],
+            [(Decimal("90.00"), Decimal("30.00"), Decimal("10.00")),
+             (Decimal("150.00"), Decimal("150.00"), Decimal("0.00")),
+             (Decimal("0.00"), Decimal("0.00"), Decimal("100.00"))],
+        )
+
+    def test_member_totals_include_arrears(self):
+        self.assertEqual(member_totals(self.bob)["total_arrears"], Decimal("50.00"))
+        self.assertEqual(
+            async_to_sync(amember_totals)(self.alice),
+            {"total_saved": Decimal("90.00"), "total_borrowed": Decimal("0.00"),
+             "total_arrears": Decimal("0.00"), "last_contribution_date": self.alice.financial_records.latest(
+                 "contribution_date").contribution_date},
+        )
+        with self.assertNumQueries(1):
+            self.assertEqual(member_totals(self.carol)["total_saved"], Decimal("0.00"))
+
+    def test_query_count_does_not_grow_with_members(self):
+        with CaptureQueriesContext(connection) as few:
+            stokvel_summary(self.stokvel, today=self.today)
+        for i in range(10):
+            FinancialRecord.objects.create(member=self.join(f"extra{i}"), amount_saved=Decimal("5.00"))
+        with self.assertNumQueries(len(few)):
+            summary = stokvel_summary(self.stokvel, today=self.today)
+        self.assertEqual(summary["total_members"], 13)
+
+
+class LedgerTests(TestCase):
+    def test_money_is_exact(self):
+        self.assertEqual(ledger.money(0.1 + 0.2), Decimal("0.30"))
+        self.assertEqual(ledger.money("2.675"), Decimal("2.68"))
+        self.assertEqual(ledger.total(["0.10"] * 10), Decimal("1.00"))
+        self.assertEqual(ledger.amount_owed(Decimal("100.00"), Decimal("150.00")), Decimal("0.00"))
+        self.assertEqual(ledger.arrears(Decimal("20.00"), Decimal("50.50")), Decimal("30.50"))
+        self.assertEqual(ledger.progress(Decimal("299.99"), Decimal("300.00")), 99)
+        self.assertEqual(ledger.progress(Decimal("10.00"), ledger.ZERO), 0)
+
+    def test_interest(self):
+        self.assertEqual(ledger.accrued_interest(Decimal("1000.00"), Decimal("7.30"), 30), Decimal("6.00"))
+        self.assertEqual(ledger.monthly_interest(Decimal("1000.00"), Decimal("6.00")), Decimal("5.00"))
+        self.assertEqual(ledger.compound_interest(Decimal("1000.00"), Decimal("12.00"), 2), Decimal("20.10"))
+
+    def test_payout_dates(self):
+        start = date(2025, 1, 31)
+        self.assertEqual(
+            ledger.payout_dates(start, "quarterly", 3), [date(2025, 1, 31), date(2025, 4, 30), date(2025, 7, 31)]
+        )
+        self.assertEqual(ledger.next_payout_date(start, "monthly", today=date(2025, 3, 1)), date(2025, 3, 31))
+        self.assertEqual(ledger.next_payout_date(start, "annual", today=date(2025, 2, 1)), date(2026, 1, 31))
+        self.assertEqual(ledger.next_payout_date(start, "custom", today=start, custom_months=2), start)
+        with self.assertRaises(ValueError):
+            ledger.payout_dates(start, "custom", 3)
+
+    def test_batch_matches_per_row_loop(self):
+        batch = synthetic_batch(stokvels=5, members=40, seed=2)
+        self.assertEqual(batch.summaries(), per_row(batch))
+
+    def test_batch_from_database_matches_summary(self):
+        stokvel = Stokvel.objects.create(
+            name="Ledger", monthly_contribution=Decimal("150.00"), interest_rate=Decimal("5.50")
+        )
+        for i, (saved, borrowed) in enumerate([("100.10", "0"), ("200.25", "250.00"), ("0", "0")]):
+            member = Member.objects.create(user=User.objects.create(username=f"ledger{i}"), stokvel=stokvel)
+            FinancialRecord.objects.create(
+                member=member, amount_saved=Decimal(saved), amount_borrowed=Decimal(borrowed)
+            )
+
+        with self.assertNumQueries(3):
+            figures = ledger.LedgerBatch.from_database([stokvel.pk]).summaries()[stokvel.pk]
+        summary = stokvel_summary(stokvel)
+        self.assertEqual(figures["members"], 3)
+        self.assertEqual(figures["total_saved"], summary["total_balance"])
+        self.assertEqual(figures["net_arrears"], summary["net_arrears"])
+        self.assertEqual(figures["target_amount"], summary["target_amount"])
+        self.assertEqual(figures["current_month_total"], summary["current_month_total"])
+        self.assertEqual(figures["member_arrears"], Decimal("49.75"))
+        self.assertEqual(figures["monthly_interest"], Decimal("1.38"))
+
+
+class DashboardCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.stokvel = Stokvel.objects.create(name="Dash Cache", monthly_contribution=Decimal("200.00"))
+        cls.other = Stokvel.objects.create(name="Other", monthly_contribution=Decimal("200.00"))
+        cls.user = User.objects.create(username="viewer")
+        cls.member = Member.objects.create(user=cls.user, stokvel=cls.stokvel)
+        FinancialRecord.objects.create(member=cls.member, amount_saved=Decimal("50.00"))
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.client.force_login(self.user)
+
+    def test_second_load_reuses_cached_stokvel_data(self):
+        with CaptureQueriesContext(connection) as first:
+            self.client.get(reverse("member:dashboard"))
+        with CaptureQueriesContext(connection) as second:
+            response = self.client.get(reverse("member:dashboard"))
+        self.assertLess(len(second), len(first))
+        self.assertEqual(response.context["total_balance"], Decimal("50.00"))
+
+    def test_writes_invalidate_the_cached_dashboard(self):
+        self.assertEqual(stokvel_dashboard(self.stokvel)["total_balance"], Decimal("50.00"))
+
+        FinancialRecord.objects.create(member=self.member, amount_saved=Decimal("25.00"))
+        self.assertEqual(stokvel_dashboard(self.stokvel)["total_balance"], Decimal("75.00"))
+
+        self.stokvel.monthly_contribution = Decimal("400.00")
+        self.stokvel.save()
+        self.assertEqual(stokvel_dashboard(self.stokvel)["target_amount"], Decimal("400.00"))
+
+        newcomer = Member.objects.create(user=User.objects.create(username="newcomer"), stokvel=self.stokvel)
+        self.assertEqual(stokvel_dashboard(self.stokvel)["total_members"], 2)
+
+        newcomer.stokvel = self.other
+        newcomer.save()
+        self.assertEqual(stokvel_dashboard(self.stokvel)["total_members"], 1)
+
+    def test_deactivating_a_user_invalidates_the_cached_dashboard(self):
+        self.assertEqual(stokvel_dashboard(self.stokvel)["active_members_count"], 1)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(stokvel_dashboard(self.stokvel)["active_members_count"], 0)
+
+        version = stokvel_cache.version(self.stokvel.pk)
+        User.objects.get(pk=self.user.pk).save(update_fields=["last_login"])
+        self.assertEqual(stokvel_cache.version(self.stokvel.pk), version)
+
+
+@override_settings(LLM_CLIENT="member.llm.FakeLLMClient")
+class AssistantCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.stokvel = Stokvel.objects.create(name="Cache Test", monthly_contribution=Decimal("300.00"))
+        cls.user = User.objects.create(username="asker", first_name="Thandi")
+        cls.member = Member.objects.create(user=cls.user, stokvel=cls.stokvel)
+        FinancialRecord.objects.create(member=cls.member, amount_saved=Decimal("300.00"))
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        FakeLLMClient.calls.clear()
+
+    def test_repeated_question_hits_cache(self):
+        self.assertEqual(answer(self.stokvel, "How much have we saved?"), FakeLLMClient.reply)
+        self.assertEqual(answer(self.stokvel, "how much have we saved"), FakeLLMClient.reply)
+        self.assertEqual(len(FakeLLMClient.calls), 1)
+        self.assertEqual(ai_cache.stats()["hits"], 1)
+        self.assertEqual(ai_cache.stats()["misses"], 1)
+
+    def test_ledger_write_invalidates_answers(self):
+        answer(self.stokvel, "How much have we saved?")
+        FinancialRecord.objects.create(member=self.member, amount_saved=Decimal("50.00"))
+        answer(self.stokvel, "How much have we saved?")
+        self.assertEqual(len(FakeLLMClient.calls), 2)
+
+    def test_cached_answer_skips_the_queue(self):
+        self.client.force_login(self.user)
+        url = reverse("member:ai_analytics")
+        self.client.post(url, {"query": "Who saved the most?"})
+        jobs.work(burst=True)
+        self.client.get(url)
+        self.client.post(reverse("member:ai_analytics_clear"))
+
+        response = self.client.post(url, {"query": "Who saved the most?"})
+        self.assertFalse(response.context["pending"])
+        self.assertEqual(len(FakeLLMClient.calls), 1)
+        self.assertEqual(
+            [(m.role, m.content) for m in response.context["chat_history"]],
+            [("user", "Who saved the most?"), ("assistant", FakeLLMClient.reply)],
+        )
+
+
+@override_settings(LLM_CLIENT="member.llm.FakeLLMClient")
+class AssistantStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        stokvel = Stokvel.objects.create(name="Stream Test", monthly_contribution=Decimal("300.00"))
+        cls.user = User.objects.create(username="streamer")
+        Member.objects.create(user=cls.user, stokvel=stokvel)
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        FakeLLMClient.calls.clear()
+        self.client.force_login(self.user)
+
+    async def test_tokens_are_streamed_and_history_saved(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.post(reverse("member:ai_analytics_stream"), {"query": "Who owes money?"})
+        self.assertTrue(response.streaming)
+        chunks = [chunk.decode() async for chunk in response.streaming_content]
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunks), FakeLLMClient.reply)
+        self.assertEqual(
+            [m async for m in ChatMessage.objects.order_by("id").values_list("role", "content")],
+            [("user", "Who owes money?"), ("assistant", FakeLLMClient.reply)],
+        )
+
+    def test_stream_requires_post(self):
+        self.assertEqual(self.client.get(reverse("member:ai_analytics_stream")).status_code, 405)
+
+
+class PromptContextTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.stokvel = Stokvel.objects.create(name="Context Test", monthly_contribution=Decimal("100.00"))
+        for i in range(60):
+            member = Member.objects.create(user=User.objects.create(username=f"saver{i:02d}"), stokvel=cls.stokvel)
+            FinancialRecord.objects.create(member=member, amount_saved=Decimal(10 * i), amount_borrowed=Decimal("5.00"))
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def test_context_is_built_in_constant_queries(self):
+        # One query for the members and their balances
+        with self.assertNumQueries(1):
+            build_context(self.stokvel, token_budget=10_000)
+
+    def test_context_is_cached_until_ledger_changes(self):
+        context = build_context(self.stokvel, token_budget=5000)
+        with self.assertNumQueries(0):
+            self.assertEqual(build_context(self.stokvel, token_budget=5000), context)
+
+        FinancialRecord.objects.create(member=Member.objects.first(), amount_saved=Decimal("1.00"))
+        self.assertNotEqual(build_context(self.stokvel, token_budget=5000), context)
+
+    def test_large_stokvel_is_truncated_to_budget(self):
+        context = build_context(self.stokvel, token_budget=150)
+        self.assertLessEqual(estimate_tokens(context), 150)
+        self.assertIn("saver59: Saved R590.00", context)
+        self.assertIn("other members", context)
+        self.assertIn("Total saved R17700.00", context)
+
+
+class ConversationStoreTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        stokvel = Stokvel.objects.create(name="Chat Test", monthly_contribution=Decimal("100.00"))
+        cls.user = User.objects.create(username="chatter")
+        cls.member = Member.objects.create(user=cls.user, stokvel=stokvel)
+
+    def fill(self, count):
+        conversation = active_conversation(self.member, create=True)
+        for i in range(count):
+            add_message(conversation, "user" if i % 2 == 0 else "assistant", f"message {i}")
+        return conversation
+
+    def test_pages_walk_back_through_history(self):
+        conversation = self.fill(45)
+        page, has_more = page_before(conversation, limit=20)
+        self.assertEqual((page[0].content, page[-1].content, has_more), ("message 25", "message 44", True))
+        page, has_more = page_before(conversation, before_id=page[0].pk, limit=20)
+        self.assertEqual((page[0].content, has_more), ("message 5", True))
+        page, has_more = page_before(conversation, before_id=page[0].pk, limit=20)
+        self.assertEqual((len(page), has_more), (5, False))
+
+    def test_session_holds_no_history(self):
+        self.fill(30)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("member:ai_analytics"))
+        self.assertEqual(len(response.context["chat_history"]), 20)
+        self.assertTrue(response.context["has_earlier"])
+        self.assertNotIn("chat_history", self.client.session.keys())
+
+    def test_legacy_session_history_is_imported(self):
+        self.client.force_login(self.user)
+        session = self.client.session
+        session["chat_history"] = [{"role": "user", "content": "old question"}]
+        session.save()
+        response = self.client.get(reverse("member:ai_analytics"))
+        self.assertEqual([m.content for m in response.context["chat_history"]], ["old question"])
+
+    def test_failed_job_without_error_text(self):
+        conversation = self.fill(0)
+        failed = Job.objects.create(name="member.ai_answer", status=Job.FAILED, last_error=" \n ")
+        self.client.force_login(self.user)
+        session = self.client.session
+        session["chat_pending"] = failed.pk
+        session.save()
+        response = self.client.get(reverse("member:ai_analytics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(conversation.messages.get().content, "Error: The assistant request failed.")
+        self.assertNotIn("chat_pending", self.client.session.keys())
+
+    def test_compact_trims_and_drops_archived(self):
+        conversation = self.fill(30)
+        Conversation.objects.create(member=self.member, archived=True, updated_at=timezone.now() - timedelta(days=90))
+        self.assertEqual(compact(max_messages=10, retention_days=30, batch_size=7), (1, 20))
+        self.assertEqual(
+            list(conversation.messages.order_by("id").values_list("content", flat=True))[0], "message 20"
+        )
+
+
+class MockDataTests(TestCase):
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def test_generate(self):
+        # Nothing is rescheduled after commit: the payout schedules are built once, at the end
+        with self.captureOnCommitCallbacks() as callbacks:
+            counts = mockdata.generate(stokvels=2, members=5, months=2, notifications=3, messages=2, seed=1, batch_size=7)
+        self.assertEqual(callbacks, [])
+        self.assertEqual(
+            set(PayoutSchedule.objects.values_list("stokvel__name", flat=True)),
+            {"Mock stokvel mock1-0", "Mock stokvel mock1-1"},
+        )
+        self.assertEqual(counts, {
+            "stokvels": 2, "users": 10, "members": 10, "records": 80, "notifications": 30, "messages": 4,
+        })
+        self.assertEqual(balances.verify(), [])
+        user = User.objects.get(username="mock1-0-000000")
+        self.assertTrue(user.check_password(mockdata.MOCK_PASSWORD))
+        self.assertEqual(
+            user.notification_counter.unread, user.notifications.filter(read=False).count()
+        )
+        with self.assertRaises(ValueError):
+            mockdata.generate(stokvels=1, members=1, seed=1)
+
+    def test_same_seed_same_data(self):
+        today = timezone.localdate()
+        mockdata.generate(members=3, months=1, notifications=0, messages=0, seed=3, today=today)
+        first = list(FinancialRecord.objects.order_by("id").values_list("amount_saved", "contribution_date"))
+        Stokvel.objects.all().delete()
+        User.objects.all().delete()
+        mockdata.generate(members=3, months=1, notifications=0, messages=0, seed=3, today=today)
+        second = list(FinancialRecord.objects.order_by("id").values_list("amount_saved", "contribution_date"))
+        self.assertEqual(first, second)
+
+    def test_generate_existing(self):
+        stokvel = Stokvel.objects.create(name="Existing", monthly_contribution=Decimal("100.00"))
+        Member.objects.create(user=User.objects.create(username="existing"), stokvel=stokvel)
+        self.assertEqual(mockdata.generate_existing(months=3, records_per_month=2), 6)
+        self.assertEqual(balances.verify(), [])
+
+
+class AdminChangelistTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = User.objects.create_superuser("root", "root@example.com", "pw")
+
+    def add_stokvel(self, members, records=2):
+        stokvel = Stokvel.objects.create(name=f"Admin Test {Stokvel.objects.count()}", monthly_contribution=Decimal("100.00"))
+        for i in range(members):
+            user = User.objects.create(username=f"{stokvel.pk}-{i}")
+            member = Member.objects.create(user=user, stokvel=stokvel)
+            for _ in range(records):
+                FinancialRecord.objects.create(member=member, amount_saved=Decimal("10.00"))
+
+    def changelist_queries(self, model):
+        url = reverse(f"admin:{model._meta.app_label}_{model._meta.model_name}_changelist")
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(captured.captured_queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        self.client.force_login(self.admin_user)
+        self.add_stokvel(members=2)
+        before = {model: self.changelist_queries(model) for model in (Stokvel, Member, FinancialRecord)}
+        for _ in range(3):
+            self.add_stokvel(members=8)
+        after = {model: self.changelist_queries(model) for model in (Stokvel, Member, FinancialRecord)}
+        self.assertEqual(before, after)
+
+    def test_estimated_count_for_unfiltered_tables(self):
+        self.add_stokvel(members=3, records=5)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        records = FinancialRecord.objects.order_by("-pk")
+        self.assertEqual(estimated_count(FinancialRecord), 15)
+        paginator = EstimatedCountPaginator(records, 10)
+        paginator.exact_below = 10
+        FinancialRecord.objects.filter(pk=records[0].pk).delete()
+        # Statistics are stale until the next ANALYZE; the estimate is what is shown
+        self.assertEqual(paginator.count, 15)
+        # Filtered lists are counted exactly
+        paginator = EstimatedCountPaginator(records.filter(amount_saved__gt=0), 10)
+        paginator.exact_below = 10
+        self.assertEqual(paginator.count, 14)
+
+
+class ImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.stokvel = Stokvel.objects.create(name="Imported", monthly_contribution=Decimal("100.00"))
+        User.objects.create(username="taken")
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def test_import_members(self):
+        lines = io.StringIO(
+            "username,email,first_name,stokvel_id,date_of_birth\n"
+            f"thandi,thandi@example.com,Thandi,{self.stokvel.pk},1990-04-01\n"
+            f"sipho,not-an-email,Sipho,{self.stokvel.pk},\n"
+            f"taken,,,{self.stokvel.pk},\n"
+            f"lerato,,Lerato,{self.stokvel.pk},\n"
+            f"thandi,,,{self.stokvel.pk},\n"
+            "nomsa,,,999,\n"
+        )
+        result = imports.import_members(lines, "csv", password="welcome", chunk_size=2)
+        self.assertEqual((result.rows, result.created, result.error_count), (6, 2, 4))
+        self.assertEqual([line for line, _ in result.errors], [3, 4, 6, 7])
+        self.assertIn("email", result.errors[0][1])
+        self.assertEqual(set(self.stokvel.members.values_list("user__username", flat=True)), {"thandi", "lerato"})
+        thandi = User.objects.get(username="thandi")
+        self.assertTrue(thandi.check_password("welcome"))
+        self.assertEqual(thandi.member.date_of_birth.isoformat(), "1990-04-01")
+        self.assertEqual(balances.verify(), [])
+
+    def test_members_cannot_be_imported_into_an_inactive_stokvel(self):
+        closed = Stokvel.objects.create(name="Closed", monthly_contribution=Decimal("100.00"), active=False)
+        with self.assertRaisesMessage(ValueError, "Stokvel Closed is inactive"):
+            imports.import_members(io.StringIO("username\nlate\n"), "csv", stokvel=closed)
+        self.assertFalse(User.objects.filter(username="late").exists())
+
+    def test_import_records(self):
+        member = Member.objects.create(user=User.objects.create(username="ledger"), stokvel=self.stokvel)
+        lines = io.StringIO("\n".join([
+            '{"username": "ledger", "contribution_date": "2024-01-05", "amount_saved": "150.00"}',
+            '{"username": "ledger", "contribution_date": "2024-02-05T10:00:00", "amount_saved": 200, "amount_borrowed": "50"}',
+            "{not json",
+            '{"username": "nobody", "contribution_date": "2024-02-05"}',
+            '{"username": "ledger", "contribution_date": "2024-03-05", "amount_saved": "-5"}',
+        ]))
+        result = imports.import_records(lines, "jsonl", stokvel=self.stokvel, chunk_size=2)
+        self.assertEqual((result.rows, result.created, result.error_count), (5, 2, 3))
+        self.assertEqual([line for line, _ in result.errors], [3, 4, 5])
+        self.assertEqual(member.financial_records.count(), 2)
+        self.assertEqual(member.balance.total_saved, Decimal("350.00"))
+        self.assertEqual(balances.verify(), [])
+
+    def test_command_writes_rejected_rows(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        source, errors = os.path.join(directory, "members.csv"), os.path.join(directory, "errors.csv")
+        with open(source, "w") as f:
+            f.write("username,email\nzanele,zanele@example.com\ntaken,\n")
+        call_command("import_data", "members", source, stokvel=self.stokvel.pk, errors=errors, stdout=io.StringIO())
+        self.assertTrue(Member.objects.filter(user__username="zanele", stokvel=self.stokvel).exists())
+        with open(errors) as f:
+            self.assertEqual(list(csv.reader(f))[1][0], "3")
+
+    def test_admin_action(self):
+        self.client.force_login(User.objects.create_superuser("root", "root@example.com", "pw"))
+        upload = SimpleUploadedFile("members.jsonl", b'{"username": "palesa"}\n{"username": "taken"}\n')
+        response = self.client.post(reverse("admin:stokvel_stokvel_changelist"), {
+            "action": "import_data", "_selected_action": [self.stokvel.pk], "apply": "1",
+            "kind": "members", "file": upload,
+        }, follow=True)
+        self.assertContains(response, "imported 1, rejected 1")
+        self.assertTrue(self.stokvel.members.filter(user__username="palesa").exists())
+
+
+class OnboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.stokvel = Stokvel.objects.create(name="Onboarding", monthly_contribution=Decimal("100.00"))
+
+    def post(self, username, stokvel_id):
+        return self.client.post(reverse("member:onboard"), {
+            "username": username, "email": f"{username}@example.com", "password": "s3cret-pass",
+            "stokvel_id": stokvel_id,
+        })
+
+    def test_onboard_creates_member_with_initial_record(self):
+        response = self.post("newbie", self.stokvel.pk)
+        self.assertRedirects(response, reverse("core:login"), fetch_redirect_response=False)
+        member = Member.objects.select_related("user").get(user__username="newbie")
+        self.assertEqual(member.stokvel, self.stokvel)
+        self.assertTrue(member.user.check_password("s3cret-pass"))
+        self.assertEqual(member.financial_records.count(), 1)
+        self.assertEqual(member.balance.total_saved, Decimal("0.00"))
+
+    def test_unknown_stokvel_writes_nothing(self):
+        Stokvel.objects.create(name="Closed", monthly_contribution=Decimal("100.00"), active=False)
+        for stokvel_id in ("999", "abc", Stokvel.objects.get(name="Closed").pk):
+            with CaptureQueriesContext(connection) as captured:
+                response = self.post("stray", stokvel_id)
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(any(q["sql"].startswith(("INSERT", "UPDATE", "DELETE")) for q in captured))
+        self.assertFalse(User.objects.filter(username="stray").exists())
+
+    def test_taken_username_is_a_form_error(self):
+        User.objects.create(username="taken")
+        response = self.post("taken", self.stokvel.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("username", response.context["form"].errors)
+
+
+class OnboardConcurrencyTests(TransactionTestCase):
+    def test_concurrent_signups(self):
+        stokvel = Stokvel.objects.create(name="Rush", monthly_contribution=Decimal("100.00"))
+        # Twelve distinct sign-ups plus four racing for one username
+        usernames = [f"rush{i}" for i in range(12)] + ["same"] * 4
+        statuses = []
+
+        def sign_up(username):
+            try:
+                response = Client().post(reverse("member:onboard"), {
+                    "username": username, "email": f"{username}@example.com", "password": "s3cret-pass",
+                    "stokvel_id": stokvel.pk,
+                })
+                statuses.append((username, response.status_code))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=sign_up, args=(username,)) for username in usernames]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(status for username, status in statuses if username != "same"), [302] * 12)
+        self.assertEqual(sorted(status for username, status in statuses if username == "same"), [200, 200, 200, 302])
+        self.assertEqual(stokvel.members.count(), 13)
+        # No user without a member, no member without its opening record
+        self.assertFalse(User.objects.filter(member__isnull=True).exists())
+        self.assertFalse(Member.objects.filter(financial_records__isnull=True).exists())
+        self.assertEqual(balances.verify(), [])
+
+
+@override_settings(LLM_CLIENT="member.llm.FakeLLMClient")
+class SharedCacheTests(TransactionTestCase):
+    """The web and worker processes see each other's cache writes with the shared (file) backend."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        shared = {
+            alias: {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": f"{directory}/{alias}"}
+            for alias in ("default", "llm")
+        }
+        settings_override = override_settings(CACHES=shared)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # One long-lived forked process standing in for run_worker, with its own in-process state
+        connection.close()
+        worker = multiprocessing.get_context("fork").Pool(1)
+        self.addCleanup(worker.terminate)
+        self.in_worker = lambda func, *args, **kwargs: worker.apply(func, args, kwargs)
+        self.stokvel = Stokvel.objects.create(name="Shared", monthly_contribution=Decimal("100.00"))
+        self.user = User.objects.create(username="sharer")
+        self.member = Member.objects.create(user=self.user, stokvel=self.stokvel)
+
+    def test_ledger_write_reaches_the_worker_context(self):
+        self.assertNotIn("R250.00", self.in_worker(build_context, self.stokvel))
+        FinancialRecord.objects.create(member=self.member, amount_saved=Decimal("250.00"))
+        self.assertIn("R250.00", self.in_worker(build_context, self.stokvel))
+
+    def test_answer_stored_by_the_worker_is_served_by_the_view(self):
+        self.client.force_login(self.user)
+        url = reverse("member:ai_analytics")
+        self.client.post(url, {"query": "Who saved the most?"})
+        self.assertEqual(self.in_worker(jobs.work, burst=True), 1)
+        self.client.get(url)
+        self.client.post(reverse("member:ai_analytics_clear"))
+
+        response = self.client.post(url, {"query": "Who saved the most?"})
+        self.assertFalse(response.context["pending"])
+        self.assertEqual(Job.objects.count(), 1)
+        self.assertEqual(
+            [(m.role, m.content) for m in response.context["chat_history"]],
+            [("user", "Who saved the most?"), ("assistant", FakeLLMClient.reply)],
+        )
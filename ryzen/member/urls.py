@@ -9,6 +9,10 @@ urlpatterns = [
     path("ai-analytics/", views.ai_analytics_view, name="ai_analytics"),
     path("profile/", views.profile_view, name="profile"),
     path("ai-analytics/clear/", views.ai_analytics_clear, name="ai_analytics_clear"),
+    path("ai-analytics/history/", views.ai_analytics_history, name="ai_analytics_history"),
+    path("ai-analytics/stream/", views.ai_analytics_stream, name="ai_analytics_stream"),
+    path("ai-analytics/pending/", views.ai_analytics_pending, name="ai_analytics_pending"),
+    path("ai-analytics/cache-stats/", views.ai_analytics_cache_stats, name="ai_analytics_cache_stats"),
 
     path("meetings/", views.meetings_view, name="meetings"),
 
@@ -1,6 +1,7 @@
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
 from stokvel.models import Stokvel
 from .models import Member, FinancialRecord
 from .forms import OnboardForm
@@ -14,44 +15,35 @@ from django.core.paginator import Paginator
 def onboard_view(request):
     """
     Registration / Onboarding view:
-    - Creates a User
-    - Creates a Member profile
-    - Links to a Stokvel by ID
-    - Creates an initial FinancialRecord
+    - Validates the form, including the Stokvel ID, before writing anything
+    - Creates the User, its Member profile (linked to the stokvel) and an
+      initial FinancialRecord in one transaction
     """
     if request.method == "POST":
         form = OnboardForm(request.POST)
         if form.is_valid():
-            # Create user
-            username = form.cleaned_data["username"]
-            email = form.cleaned_data["email"]
-            password = form.cleaned_data["password"]
-            user = User.objects.create_user(username=username, email=email, password=password)
+            # Hash outside the transaction: it is slow, and the write lock is held until commit
+            user = User(username=form.cleaned_data["username"], email=form.cleaned_data["email"])
+            user.set_password(form.cleaned_data["password"])
 
-            # Create member profile
             member = form.save(commit=False)
-            member.user = user
-
-            # Link stokvel by alphanumeric ID
-            stokvel_id = form.cleaned_data["stokvel_id"]
+            member.stokvel = form.stokvel
             try:
-                stokvel = Stokvel.objects.get(id=stokvel_id, active=True)
-            except Stokvel.DoesNotExist:
-                messages.error(request, "Stokvel ID not found or inactive.")
-                user.delete()  # clean up created user
-                return redirect("member:onboard")
-
-            member.stokvel = stokvel
-            member.save()
-
-            # Add member to stokvel's member list
-            stokvel.members.add(member)
-
-            # Create initial financial record
-            FinancialRecord.objects.create(member=member, amount_saved=0.0, amount_borrowed=0.0)
-
-            messages.success(request, f"Account created! You have joined {stokvel.name}. Please login.")
-            return redirect("core:login")
+                with transaction.atomic():
+                    user.save()
+                    member.user = user
+                    member.save()
+                    FinancialRecord.objects.create(member=member, amount_saved=0, amount_borrowed=0)
+            except IntegrityError:
+                # Someone took the username between validation and the insert
+                form.add_error("username", "That username is already taken.")
+            else:
+                messages.success(request, f"Account created! You have joined {form.stokvel.name}. Please login.")
+                return redirect("core:login")
+
+        for errors in form.errors.values():
+            for error in errors:
+                messages.error(request, error)
     else:
         form = OnboardForm()
 
@@ -63,141 +55,87 @@ from django.contrib import messages
 from django.db.models import Sum
 from django.utils import timezone
 from datetime import date
-from dateutil.relativedelta import relativedelta
 from django.core.paginator import Paginator
 from member.models import Member, FinancialRecord
 from stokvel.models import Stokvel
+from asgiref.sync import sync_to_async
+from .services import amember_totals, amonth_contribution
+from .dashboard import astokvel_dashboard
 
-def dashboard_view(request):
-    if not request.user.is_authenticated:
+async def dashboard_view(request):
+    user = await request.auser()
+    if not user.is_authenticated:
         return redirect("core:login")
 
-    member = Member.objects.filter(user=request.user).first()
+    try:
+        member = await Member.objects.select_related("stokvel", "user").aget(user=user)
+    except Member.DoesNotExist:
+        member = None
     if not member or not member.stokvel:
         messages.info(request, "You are not part of any stokvel. Please join one.")
-        return redirect("onboard")
+        return redirect("member:onboard")
 
     stokvel = member.stokvel
-    contributions = FinancialRecord.objects.filter(member__stokvel=stokvel)
+    today = date.today()
 
-    # Total balance
-    total_balance = sum(c.amount_saved for c in contributions)
+    # Stokvel-wide figures are shared by all members and cached (member/dashboard.py)
+    context = dict(await astokvel_dashboard(stokvel, today=today))
 
     # Member contribution for current month
-    today = date.today()
-    member_contribution_record = contributions.filter(
-        member=member,
-        contribution_date__month=today.month,
-        contribution_date__year=today.year
-    ).first()
-    member_contribution = member_contribution_record.amount_saved if member_contribution_record else 0
-
-    total_members = stokvel.members.count()
-    active_members_count = stokvel.members.filter(user__is_active=True).count()
-    next_meeting_date = date(today.year, today.month, 15)  # Example: 15th of the month
-
-    target_amount = total_members * stokvel.monthly_contribution
-    current_month_total = sum(
-        c.amount_saved for c in contributions
-        if c.contribution_date.month == today.month and c.contribution_date.year == today.year
-    )
-    progress_percentage = int((current_month_total / target_amount) * 100) if target_amount else 0
-    remaining_amount = target_amount - current_month_total
-    remaining_label = "Surplus" if remaining_amount < 0 else "Remaining"
-
-    # ----------------------------
-    # Members with totals
-    # ----------------------------
-    members_data = []
-    for m in stokvel.members.all():
-        total_saved = m.financial_records.aggregate(total_saved=Sum('amount_saved'))['total_saved'] or 0
-        amount_owed = max(stokvel.monthly_contribution - total_saved, 0)
-        members_data.append({
-            'member': m,
-            'total_saved': total_saved,
-            'amount_owed': amount_owed,
-        })
-
-    # Split active/inactive members
-    active_members = [m for m in members_data if m['member'].user.is_active]
-    inactive_members = [m for m in members_data if not m['member'].user.is_active]
+    member_contribution = await amonth_contribution(member, today=today)
 
     # ----------------------------
     # Pagination for active members
     # ----------------------------
-    paginator = Paginator(active_members, 5)  # 5 members per page
+    paginator = Paginator(context.pop("active_members"), 5)  # 5 members per page
     page_number = request.GET.get('page', 1)
     active_members_page = paginator.get_page(page_number)
 
-    # ----------------------------
-    # Chart Data (mock for testing)
-    # ----------------------------
-    # Income & Expense (Last 6 Months)
-    months = []
-    income_data = []
-    expense_data = []
-    for i in reversed(range(6)):
-        dt = today - relativedelta(months=i)
-        months.append(dt.strftime("%b %Y"))
-        income_data.append(1000 + i*200)   # mock income
-        expense_data.append(500 + i*150)   # mock expense
-
-    # Savings Growth Trend (Past 12 Months)
-    savings_growth_labels = []
-    savings_growth_data = []
-    cumulative_savings = 0
-    for i in reversed(range(12)):
-        dt = today - relativedelta(months=i)
-        savings_growth_labels.append(dt.strftime("%b %Y"))
-        cumulative_savings += 500 + i*50  # mock cumulative savings
-        savings_growth_data.append(cumulative_savings)
-
-    # Loan Repayment Trend (Past 12 Months)
-    loan_repayment_labels = savings_growth_labels.copy()
-    cumulative_loans = 0
-    loan_repayment_data = []
-    for i in reversed(range(12)):
-        cumulative_loans += 200 + i*30  # mock loans
-        loan_repayment_data.append(cumulative_loans)
-
-    context = {
+    context.update({
         "member": member,
         "stokvel": stokvel,
-        "total_balance": total_balance,
         "member_contribution": member_contribution,
-        "active_members_count": active_members_count,
-        "total_members": total_members,
-        "next_meeting_date": next_meeting_date,
-        "progress_percentage": progress_percentage,
-        "target_amount": target_amount,
-        "remaining_amount": abs(remaining_amount),
-        "remaining_label": remaining_label,
-        "current_month_total": current_month_total,
         "active_members_page": active_members_page,
-        "inactive_members": inactive_members,
-        "months": months,
-        "income_data": income_data,
-        "expense_data": expense_data,
-        "savings_growth_labels": savings_growth_labels,
-        "savings_growth_data": savings_growth_data,
-        "loan_repayment_labels": loan_repayment_labels,
-        "loan_repayment_data": loan_repayment_data,
-        "net_arrears": sum(m['amount_owed'] for m in members_data),
-    }
+    })
 
-    return render(request, "member/dashboard.html", context)
+    # Rendering stays sync: templates read the session, messages and request.user
+    return await sync_to_async(render)(request, "member/dashboard.html", context)
 
 
 from django.shortcuts import render, redirect
 from django.contrib import messages
-from django.db.models import Sum
 from datetime import date
-import cohere
 
+from core.jobs import enqueue
+from core.models import Job
+from .assistant import cached_answer
+from .conversations import (
+    active_conversation, add_message, archive, import_session_history, page_before, recent_messages,
+)
 from .models import Member
 
-COHERE_API_KEY = "I8HCAXrT6Yd71scv5EUWad2YbeTTFEsLvQj3IhlQ"
-co = cohere.Client(COHERE_API_KEY)
+
+def _check_pending_reply(request, conversation):
+    """
+    True while the queued AI job for this chat is still running. A failed job
+    leaves an error message in the conversation instead of an answer.
+    """
+    job_id = request.session.get("chat_pending")
+    if not job_id:
+        return False
+
+    job = Job.objects.filter(pk=job_id).values("status", "last_error").first()
+    if job and job["status"] in (Job.QUEUED, Job.RUNNING):
+        return True
+
+    if (not job or job["status"] != Job.SUCCEEDED) and conversation:
+        if job:
+            error = (job["last_error"].strip().splitlines() or ["The assistant request failed."])[-1]
+        else:
+            error = "request was lost"
+        add_message(conversation, "assistant", f"Error: {error}")
+    del request.session["chat_pending"]
+    return False
 
 
 def ai_analytics_view(request):
@@ -207,81 +145,145 @@ def ai_analytics_view(request):
     member = Member.objects.filter(user=request.user).first()
     if not member or not member.stokvel:
         messages.info(request, "You are not part of any stokvel. Please join one.")
-        return redirect("onboard")
+        return redirect("member:onboard")
 
     stokvel = member.stokvel
 
-    # Retrieve chat history from session, or start new
-    chat_history = request.session.get("chat_history", [])
+    # Chat history used to live in the session; move it into the conversation store
+    if "chat_history" in request.session:
+        import_session_history(member, request.session.pop("chat_history"))
 
-    if request.method == "POST":
+    conversation = active_conversation(member)
+
+    if request.method == "POST" and not request.session.get("chat_pending"):
         query = request.POST.get("query")
+        conversation = conversation or active_conversation(member, create=True)
+        history = recent_messages(conversation)
 
         # Add the user's query to chat history
-        chat_history.append({"role": "user", "content": query})
-
-        # Build database context
-        financial_data = []
-        for m in stokvel.members.all():
-            total_saved = m.financial_records.aggregate(total_saved=Sum('amount_saved'))['total_saved'] or 0
-            total_borrowed = m.financial_records.aggregate(total_borrowed=Sum('amount_borrowed'))['total_borrowed'] or 0
-            financial_data.append(
-                f"{m.user.get_full_name()}: Saved R{total_saved}, Borrowed R{total_borrowed}"
-            )
+        question = add_message(conversation, "user", query)
 
-        db_context = "\n".join(financial_data)
+        ai_reply = None if history else cached_answer(stokvel, query)
+        if ai_reply is not None:
+            add_message(conversation, "assistant", ai_reply)
+        else:
+            # The answer is produced by a background worker (member/tasks.py)
+            job = enqueue("member.ai_answer", {"message_id": question.pk}, max_attempts=2)
+            request.session["chat_pending"] = job.pk
 
-        try:
-            chat_response = co.chat(
-                model="c4ai-aya-expanse-32b",
-                message=f"""
-                    You are a stokvel financial assistant. Answer the user's query **directly and clearly**.
-                    Do NOT mention "Based on the database" or "database context" in your response.
-                    Do NOT use any markdown formatting (no ** or __).
-
-                    User query:
-                    {query}
-
-                    Relevant data (for internal reference, do not include in the response):
-                    {db_context}
-                    """,
-                max_tokens=250,
-                temperature=0.6
-            )
-
-            ai_reply = chat_response.text
-        except Exception as e:
-            ai_reply = f"Error: {str(e)}"
-
-        # Add AI response to chat history
-        chat_history.append({"role": "assistant", "content": ai_reply})
-
-        # Save updated chat history in session
-        request.session["chat_history"] = chat_history
-        request.session.modified = True
+    pending = _check_pending_reply(request, conversation)
+    chat_history, has_earlier = page_before(conversation) if conversation else ([], False)
 
     context = {
         "member": member,
         "stokvel": stokvel,
         "chat_history": chat_history,
+        "has_earlier": has_earlier,
+        "pending": pending,
     }
 
     return render(request, "member/ai_analytics.html", context)
 
 
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse, StreamingHttpResponse
+from . import ai_cache
+from .assistant import astream_answer
 
 @csrf_exempt  # only for testing; better to pass CSRF token in fetch headers
 def ai_analytics_clear(request):
     if request.method == "POST":
-        if "chat_history" in request.session:
-            del request.session["chat_history"]
-            request.session.modified = True
+        member = Member.objects.filter(user_id=request.user.pk).first() if request.user.is_authenticated else None
+        if member:
+            archive(member)
+        for key in ("chat_history", "chat_pending"):
+            if key in request.session:
+                del request.session[key]
         return JsonResponse({"status": "cleared"})
     return JsonResponse({"status": "failed"}, status=400)
 
 
+async def ai_analytics_history(request):
+    """Older messages of the active conversation, for the "load earlier" button."""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({"status": "unauthenticated"}, status=401)
+    member = await Member.objects.filter(user=user).afirst()
+    conversation = await sync_to_async(active_conversation)(member) if member else None
+    if not conversation:
+        return JsonResponse({"messages": [], "has_more": False})
+
+    before = request.GET.get("before")
+    page, has_more = await sync_to_async(page_before)(
+        conversation, before_id=int(before) if before and before.isdigit() else None
+    )
+    return JsonResponse({
+        "messages": [{"id": m.pk, "role": m.role, "content": m.content} for m in page],
+        "has_more": has_more,
+    })
+
+
+async def ai_analytics_stream(request):
+    """
+    Answer a chat message by streaming the model's tokens as plain text.
+
+    The question is saved to the conversation before streaming starts and the
+    answer once the stream has finished. Under ASGI no thread is held while
+    the model is generating.
+    """
+    if request.method != "POST":
+        return JsonResponse({"status": "failed"}, status=405)
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({"status": "unauthenticated"}, status=401)
+
+    member = await Member.objects.filter(user=user).select_related("stokvel").afirst()
+    query = (request.POST.get("query") or "").strip()
+    if not member or not member.stokvel or not query:
+        return JsonResponse({"status": "failed"}, status=400)
+    if await request.session.aget("chat_pending"):
+        return JsonResponse({"status": "pending"}, status=409)
+
+    stokvel = member.stokvel
+    conversation = await sync_to_async(active_conversation)(member, create=True)
+    history = await sync_to_async(recent_messages)(conversation)
+    await sync_to_async(add_message)(conversation, "user", query)
+
+    async def tokens():
+        chunks = []
+        try:
+            async for chunk in astream_answer(stokvel, query, history):
+                chunks.append(chunk)
+                yield chunk
+        except Exception as e:
+            chunks = [f"Error: {str(e)}"]
+            yield chunks[0]
+        finally:
+            await sync_to_async(add_message)(conversation, "assistant", "".join(chunks))
+
+    response = StreamingHttpResponse(tokens(), content_type="text/plain; charset=utf-8")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # let nginx pass tokens through unbuffered
+    return response
+
+
+@staff_member_required
+def ai_analytics_cache_stats(request):
+    """Hit/miss counters of the assistant answer cache."""
+    return JsonResponse(ai_cache.stats())
+
+
+async def ai_analytics_pending(request):
+    """Polled by the chat page while an answer is being generated."""
+    job_id = await request.session.aget("chat_pending")
+    if not job_id:
+        return JsonResponse({"status": "idle"})
+    status = await Job.objects.filter(pk=job_id).values_list("status", flat=True).afirst()
+    done = status not in (Job.QUEUED, Job.RUNNING)
+    return JsonResponse({"status": "done" if done else "pending"})
+
+
 
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
@@ -289,9 +291,9 @@ from django.db.models import Sum
 from member.models import Member, FinancialRecord
 
 @login_required
-def profile_view(request):
-    user = request.user
-    member = Member.objects.filter(user=user).first()
+async def profile_view(request):
+    user = await request.auser()
+    member = await Member.objects.filter(user=user).select_related("stokvel").afirst()
 
     if not member:
         return redirect("onboard")  # Or show a message if no member profile
@@ -299,20 +301,18 @@ def profile_view(request):
     stokvel = member.stokvel
 
     # Aggregated data
-    total_saved = member.financial_records.aggregate(total=Sum('amount_saved'))['total'] or 0
-    total_borrowed = member.financial_records.aggregate(total=Sum('amount_borrowed'))['total'] or 0
-    total_arrears = max(total_borrowed - total_saved, 0)
+    totals = await amember_totals(member)
 
     context = {
         "user": user,
         "member": member,
         "stokvel": stokvel,
-        "total_saved": total_saved,
-        "total_borrowed": total_borrowed,
-        "total_arrears": total_arrears,
+        "total_saved": totals["total_saved"],
+        "total_borrowed": totals["total_borrowed"],
+        "total_arrears": totals["total_arrears"],
     }
 
-    return render(request, "member/profile.html", context)
+    return await sync_to_async(render)(request, "member/profile.html", context)
 
 def meetings_view(request):
     return render(request, "member/meetings.html")
\ No newline at end of file
@@ -0,0 +1,57 @@
+// Live notifications over Server-Sent Events (communications.views.notifications_stream).
+// EventSource reconnects by itself and sends the id of the last event it saw,
+// so notifications created while disconnected are delivered on reconnect.
+document.addEventListener('DOMContentLoaded', function () {
+    const streamUrl = document.body.dataset.notificationStream;
+    if (!streamUrl || !window.EventSource) return;
+
+    const badge = document.getElementById('notificationBadge');
+    const list = document.getElementById('notificationList');
+    const badgeColours = {
+        payment_reminder: 'bg-primary',
+        meeting: 'bg-info text-dark',
+        payout: 'bg-success',
+        general: 'bg-secondary',
+    };
+
+    function renderNotification(notif) {
+        const item = document.createElement('div');
+        item.className = 'list-group-item d-flex justify-content-between align-items-start fw-bold';
+
+        const body = document.createElement('div');
+        const title = document.createElement('strong');
+        title.textContent = notif.title;
+        const message = document.createElement('p');
+        message.className = 'mb-0 mt-1';
+        message.textContent = notif.message;
+        body.append(title, message);
+
+        const meta = document.createElement('div');
+        meta.className = 'text-end';
+        const pill = document.createElement('span');
+        pill.className = `badge ${badgeColours[notif.category] || 'bg-secondary'} mb-1`;
+        pill.textContent = notif.category_display;
+        const time = document.createElement('small');
+        time.className = 'text-muted d-block';
+        time.textContent = new Date(notif.created_at).toLocaleString();
+        meta.append(pill, time);
+
+        item.append(body, meta);
+        return item;
+    }
+
+    const source = new EventSource(streamUrl);
+
+    source.addEventListener('notification', function (event) {
+        if (!list || !list.dataset.live) return;
+        list.querySelector('[data-empty]')?.remove();
+        list.prepend(renderNotification(JSON.parse(event.data)));
+    });
+
+    source.addEventListener('unread', function (event) {
+        if (!badge) return;
+        const count = JSON.parse(event.data).count;
+        badge.textContent = count;
+        badge.classList.toggle('d-none', count === 0);
+    });
+});
@@ -1,5 +1,86 @@
-from django.contrib import admin
-from .models import Stokvel
+import io
 
-# Register Stokvel
-admin.site.register(Stokvel)
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.db.models import Count
+from django.template.response import TemplateResponse
+from member import imports
+from .models import PayoutSchedule, Stokvel
+
+
+class ImportForm(forms.Form):
+    kind = forms.ChoiceField(choices=[("members", "Members"), ("records", "Ledger records")])
+    file = forms.FileField(help_text="CSV or JSON Lines (.jsonl). Use `manage.py import_data` for very large files.")
+    password = forms.CharField(
+        required=False, widget=forms.PasswordInput,
+        help_text="Initial password for imported members without a password column",
+    )
+
+
+@admin.register(Stokvel)
+class StokvelAdmin(admin.ModelAdmin):
+    list_display = ("name", "member_count", "monthly_contribution", "payout_cycle", "active", "created_at")
+    list_filter = ("active", "payout_cycle")
+    search_fields = ("name",)
+    autocomplete_fields = ("admin",)
+    actions = ["import_data"]
+
+    def get_queryset(self, request):
+        # One grouped COUNT for the whole page; __str__ and autocomplete reuse it
+        return super().get_queryset(request).annotate(member_count=Count("members"))
+
+    @admin.display(description="Members", ordering="member_count")
+    def member_count(self, obj):
+        return obj.member_count
+
+    @admin.action(description="Import members or ledger records", permissions=["change"])
+    def import_data(self, request, queryset):
+        if len(queryset) != 1:
+            self.message_user(request, "Select exactly one stokvel to import into.", messages.WARNING)
+            return None
+        stokvel = queryset[0]
+
+        form = ImportForm(request.POST, request.FILES) if "apply" in request.POST else ImportForm()
+        if form.is_bound and form.is_valid():
+            upload = form.cleaned_data["file"]
+            lines = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+            fmt = imports.detect_format(upload.name)
+            if form.cleaned_data["kind"] == "members":
+                try:
+                    result = imports.import_members(lines, fmt, stokvel=stokvel, password=form.cleaned_data["password"])
+                except ValueError as exc:
+                    self.message_user(request, str(exc), messages.ERROR)
+                    return None
+            else:
+                result = imports.import_records(lines, fmt, stokvel=stokvel)
+
+            level = messages.SUCCESS if not result.error_count else messages.WARNING
+            self.message_user(
+                request,
+                f"{stokvel.name}: read {result.rows} rows, imported {result.created}, rejected {result.error_count}.",
+                level,
+            )
+            for line, message in result.errors[:10]:
+                self.message_user(request, f"Line {line}: {message}", messages.WARNING)
+            return None
+
+        return TemplateResponse(request, "admin/stokvel/stokvel/import_data.html", {
+            **self.admin_site.each_context(request),
+            "title": f"Import into {stokvel.name}",
+            "opts": self.model._meta,
+            "stokvel": stokvel,
+            "form": form,
+            "action_checkbox_name": helpers.ACTION_CHECKBOX_NAME,
+        })
+
+
+@admin.register(PayoutSchedule)
+class PayoutScheduleAdmin(admin.ModelAdmin):
+    list_display = ("stokvel", "sequence", "payout_date", "member", "expected_amount", "notified_at")
+    list_filter = ("payout_date",)
+    list_select_related = ("stokvel", "member__user")
+    search_fields = ("stokvel__name", "=member__user__username")
+    raw_id_fields = ("member",)
+    autocomplete_fields = ("stokvel",)
+    date_hierarchy = "payout_date"
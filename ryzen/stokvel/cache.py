@@ -0,0 +1,48 @@
+"""
+Versioned per-stokvel cache keys.
+
+Anything cached about a stokvel is stored under a key that embeds the
+stokvel's current version number. Bumping the version (on writes to its
+ledger) makes every older entry unreachable at once; they then age out of the
+cache on their own.
+"""
+import time
+
+from django.core.cache import cache
+
+
+def _version_key(stokvel_id):
+    return f"stokvel:{stokvel_id}:version"
+
+
+def version(stokvel_id):
+    key = _version_key(stokvel_id)
+    # Seed with the clock so a version lost to eviction never goes backwards
+    cache.add(key, time.time_ns(), timeout=None)
+    return cache.get(key)
+
+
+async def aversion(stokvel_id):
+    key = _version_key(stokvel_id)
+    await cache.aadd(key, time.time_ns(), timeout=None)
+    return await cache.aget(key)
+
+
+def bump(stokvel_id):
+    """Invalidate everything cached for ``stokvel_id``."""
+    try:
+        cache.incr(_version_key(stokvel_id))
+    except ValueError:
+        cache.add(_version_key(stokvel_id), time.time_ns(), timeout=None)
+
+
+def _key(stokvel_id, current, parts):
+    return ":".join(["stokvel", str(stokvel_id), f"v{current}", *map(str, parts)])
+
+
+def key(stokvel_id, *parts):
+    return _key(stokvel_id, version(stokvel_id), parts)
+
+
+async def akey(stokvel_id, *parts):
+    return _key(stokvel_id, await aversion(stokvel_id), parts)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from stokvel import payouts
+
+
+class Command(BaseCommand):
+    help = "Recompute the upcoming payouts of every stokvel and notify members of the payouts due soon (run daily)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stokvel", type=int, action="append", dest="stokvels",
+                            help="Only reschedule this stokvel (can be repeated)")
+        parser.add_argument("--no-notify", action="store_true", help="Only rebuild the schedule")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = payouts.rebuild(options["stokvels"], batch_size=options["batch_size"])
+        self.stdout.write(f"Scheduled {count} upcoming payouts.")
+        if not options["no_notify"]:
+            created = payouts.notify_due()
+            self.stdout.write(f"Sent {created} payout notifications.")
@@ -0,0 +1,37 @@
+# Generated by Django 5.2 on 2026-10-18 16:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('member', '0007_financialrecord_date_index'),
+        ('stokvel', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stokvel',
+            name='payout_interval_months',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='PayoutSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveIntegerField()),
+                ('payout_date', models.DateField()),
+                ('expected_amount', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('notified_at', models.DateTimeField(blank=True, null=True)),
+                ('member', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payouts', to='member.member')),
+                ('stokvel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payouts', to='stokvel.stokvel')),
+            ],
+            options={
+                'ordering': ['stokvel', 'sequence'],
+                'indexes': [models.Index(fields=['stokvel', 'payout_date'], name='payout_stokvel_date_idx'), models.Index(condition=models.Q(('notified_at__isnull', True)), fields=['payout_date'], name='payout_unnotified_idx')],
+                'constraints': [models.UniqueConstraint(fields=('stokvel', 'sequence'), name='payout_stokvel_sequence_uniq')],
+            },
+        ),
+    ]
@@ -1,3 +1,5 @@
+from decimal import Decimal
+
 from django.db import models
 from django.utils import timezone
 from member.models import Member
@@ -10,7 +12,7 @@ class Stokvel(models.Model):
     description = models.TextField(blank=True, null=True)
     monthly_contribution = models.DecimalField(max_digits=12, decimal_places=2)
     target_amount = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
-    interest_rate = models.DecimalField(max_digits=5, decimal_places=2, default=0.0)
+    interest_rate = models.DecimalField(max_digits=5, decimal_places=2, default=Decimal("0.00"))
     payout_cycle = models.CharField(
         max_length=50,
         choices=[
@@ -21,6 +23,8 @@ class Stokvel(models.Model):
         ],
         default="monthly",
     )
+    # Months between payouts when payout_cycle is "custom"
+    payout_interval_months = models.PositiveSmallIntegerField(blank=True, null=True)
     active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -34,7 +38,40 @@ class Stokvel(models.Model):
     )
 
     def total_members(self):
-        return self.members.count()
+        # Querysets annotated with member_count (such as the admin's) spare a COUNT per stokvel
+        count = getattr(self, "member_count", None)
+        return self.members.count() if count is None else count
 
     def __str__(self):
         return f"{self.name} ({self.total_members()} members)"
+
+
+class PayoutSchedule(models.Model):
+    """
+    One payout of a stokvel's rotation: who receives the pot, when, and how
+    much is expected in it. Kept up to date by stokvel/payouts.py.
+    """
+    stokvel = models.ForeignKey(Stokvel, on_delete=models.CASCADE, related_name="payouts")
+    # Number of the payout counted from the stokvel's creation; fixes its date
+    sequence = models.PositiveIntegerField()
+    payout_date = models.DateField()
+    member = models.ForeignKey(Member, on_delete=models.SET_NULL, null=True, blank=True, related_name="payouts")
+    expected_amount = models.DecimalField(max_digits=14, decimal_places=2)
+    notified_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ["stokvel", "sequence"]
+        constraints = [
+            models.UniqueConstraint(fields=["stokvel", "sequence"], name="payout_stokvel_sequence_uniq"),
+        ]
+        indexes = [
+            # Upcoming payouts of a stokvel (dashboard, rebuilds)
+            models.Index(fields=["stokvel", "payout_date"], name="payout_stokvel_date_idx"),
+            # Payouts due for a notification
+            models.Index(
+                fields=["payout_date"], name="payout_unnotified_idx", condition=models.Q(notified_at__isnull=True)
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.stokvel.name} #{self.sequence} on {self.payout_date}"
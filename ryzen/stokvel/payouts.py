@@ -0,0 +1,199 @@
+"""
+Payout schedule: who receives each stokvel's pot, when, and how much.
+
+Payout ``n`` of a stokvel falls ``n`` payout cycles after the day it was
+created (``payout_cycle``, or ``payout_interval_months`` for a custom
+cycle; without one there is no schedule). Members take turns in order of
+member id, i.e. the order they signed up: each payout goes to the member
+after the previous recipient, wrapping round to the first. A new member
+therefore joins the end of the queue and a member who leaves drops out of
+it, without reshuffling anyone else's turn. The expected pot is the stokvel's
+``target_amount`` when it has one, otherwise what its members contribute
+over one cycle.
+
+:func:`rebuild` writes the next ``PAYOUT_SCHEDULE_HORIZON`` payouts of many
+stokvels in a constant number of queries. Payouts in the past, and those
+whose notification has gone out, are history and are never rewritten; only
+the rest of the schedule is recomputed. Member and stokvel changes
+reschedule the affected stokvel after their transaction commits (see
+signals.py); bulk inserts must call :func:`rebuild` themselves.
+
+:func:`notify_due` sends the ``payout`` notifications for the payouts of the
+next ``PAYOUT_NOTICE_DAYS`` days (``manage.py schedule_payouts``, daily).
+"""
+from bisect import bisect_right
+from datetime import timedelta
+from itertools import islice
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery
+from django.utils import timezone
+
+from communications import pubsub, unread
+from communications.models import Notification
+from member import ledger
+from member.models import Member
+from . import cache as stokvel_cache
+from .models import PayoutSchedule, Stokvel
+
+
+def _fixed(today):
+    """Payouts that are no longer rescheduled: past or already announced."""
+    return PayoutSchedule.objects.filter(Q(payout_date__lt=today) | Q(notified_at__isnull=False))
+
+
+def _last_fixed(stokvel_ids, today):
+    """
+    ``{stokvel id: (sequence, payout date, member id)}`` of each stokvel's
+    latest fixed payout. The member is the latest fixed recipient still on
+    record: a recipient who has since been deleted leaves a NULL behind.
+    """
+    fixed = _fixed(today)
+    if stokvel_ids is not None:
+        fixed = fixed.filter(stokvel_id__in=stokvel_ids)
+    latest = _fixed(today).filter(stokvel=OuterRef("stokvel")).order_by("-sequence")
+    rows = fixed.filter(pk=Subquery(latest.values("pk")[:1])).annotate(
+        last_member=Subquery(latest.filter(member__isnull=False).values("member_id")[:1])
+    ).values_list("stokvel_id", "sequence", "payout_date", "last_member")
+    return {stokvel_id: rest for stokvel_id, *rest in rows}
+
+
+def _rotation(stokvel_ids):
+    """``{stokvel id: [member ids in turn order]}``."""
+    members = Member.objects.filter(stokvel__isnull=False).order_by("stokvel_id", "pk")
+    if stokvel_ids is not None:
+        members = members.filter(stokvel_id__in=stokvel_ids)
+    rotation = {}
+    for stokvel_id, member_id in members.values_list("stokvel_id", "pk").iterator(chunk_size=10000):
+        rotation.setdefault(stokvel_id, []).append(member_id)
+    return rotation
+
+
+def _schedule(stokvel, members, last, today, horizon):
+    """The next ``horizon`` payouts of ``stokvel`` after its last fixed one (``None`` if it has none)."""
+    try:
+        months = ledger.cycle_months(stokvel.payout_cycle, stokvel.payout_interval_months)
+    except ValueError:
+        return []
+    if not stokvel.active or not members:
+        return []
+
+    start = timezone.localtime(stokvel.created_at).date()
+    sequence, last_date, last_member = last or (0, None, None)
+    elapsed = (today.year - start.year) * 12 + today.month - start.month
+    sequence = max(sequence + 1, elapsed // months)
+    while True:
+        payout_date = start + relativedelta(months=months * sequence)
+        if payout_date >= today and (last_date is None or payout_date > last_date):
+            break
+        sequence += 1
+
+    amount = ledger.money(stokvel.target_amount or len(members) * ledger.money(stokvel.monthly_contribution) * months)
+    turn = bisect_right(members, last_member) if last_member else 0
+    return [
+        PayoutSchedule(
+            stokvel_id=stokvel.pk,
+            sequence=sequence + i,
+            payout_date=start + relativedelta(months=months * (sequence + i)),
+            member_id=members[(turn + i) % len(members)],
+            expected_amount=amount,
+        )
+        for i in range(horizon)
+    ]
+
+
+def rebuild(stokvel_ids=None, today=None, horizon=None, batch_size=1000):
+    """
+    Recompute the upcoming payouts of the given stokvels (all when None).
+    Returns the number of payout rows written.
+    """
+    today = today or timezone.localdate()
+    horizon = horizon or settings.PAYOUT_SCHEDULE_HORIZON
+    with transaction.atomic():
+        stokvels = Stokvel.objects.select_for_update().order_by("pk")
+        if stokvel_ids is not None:
+            stokvels = stokvels.filter(pk__in=stokvel_ids)
+        stokvels = list(stokvels.only(
+            "pk", "created_at", "active", "payout_cycle", "payout_interval_months",
+            "monthly_contribution", "target_amount",
+        ))
+        ids = [stokvel.pk for stokvel in stokvels]
+        scope = ids if stokvel_ids is not None else None
+        rotation = _rotation(scope)
+        last_fixed = _last_fixed(scope, today)
+
+        pending = PayoutSchedule.objects.filter(payout_date__gte=today, notified_at__isnull=True)
+        if scope is not None:
+            pending = pending.filter(stokvel_id__in=scope)
+        pending.delete()
+
+        rows = [
+            row
+            for stokvel in stokvels
+            for row in _schedule(stokvel, rotation.get(stokvel.pk, []), last_fixed.get(stokvel.pk), today, horizon)
+        ]
+        PayoutSchedule.objects.bulk_create(rows, batch_size=batch_size)
+    for stokvel_id in ids:
+        stokvel_cache.bump(stokvel_id)
+    return len(rows)
+
+
+def upcoming(stokvel, today=None, limit=3):
+    """The stokvel's next ``limit`` payouts, with their recipients."""
+    today = today or timezone.localdate()
+    return list(
+        stokvel.payouts.filter(payout_date__gte=today).select_related("member__user").order_by("payout_date")[:limit]
+    )
+
+
+def _notifications(payout, user_ids):
+    recipient = payout.member.user if payout.member else None
+    amount = f"R{payout.expected_amount:,.2f}"
+    when = f"{payout.payout_date:%d %B %Y}"
+    for user_id in user_ids:
+        if recipient is not None and user_id == recipient.pk:
+            title, message = "Your payout is coming up", f"You receive the {payout.stokvel.name} payout of {amount} on {when}."
+        else:
+            name = (recipient.get_full_name() or recipient.username) if recipient else "The next member"
+            title, message = "Upcoming payout", f"{name} receives the {payout.stokvel.name} payout of {amount} on {when}."
+        yield Notification(user_id=user_id, title=title, message=message, category="payout")
+
+
+def notify_due(today=None, days=None, batch_size=None):
+    """
+    Notify every member of the stokvels with a payout in the next ``days``
+    days (``PAYOUT_NOTICE_DAYS``) that has not been announced yet. Each
+    payout is announced once. Returns the number of notifications created.
+    """
+    today = today or timezone.localdate()
+    days = settings.PAYOUT_NOTICE_DAYS if days is None else days
+    batch_size = batch_size or settings.NOTIFICATION_BATCH_SIZE
+    created = 0
+    with transaction.atomic():
+        due = list(
+            # Lock the payouts only: the joined member may be NULL
+            PayoutSchedule.objects.select_for_update(of=("self",))
+            .filter(notified_at__isnull=True, payout_date__gte=today, payout_date__lte=today + timedelta(days=days))
+            .select_related("stokvel", "member__user")
+            .order_by("payout_date", "pk")
+        )
+        if not due:
+            return 0
+        users = {}
+        for stokvel_id, user_id in Member.objects.filter(
+            stokvel_id__in={payout.stokvel_id for payout in due}
+        ).values_list("stokvel_id", "user_id"):
+            users.setdefault(stokvel_id, []).append(user_id)
+
+        for payout in due:
+            notifications = _notifications(payout, users.get(payout.stokvel_id, []))
+            while batch := list(islice(notifications, batch_size)):
+                Notification.objects.bulk_create(batch)
+                user_ids = [n.user_id for n in batch]
+                unread.add(user_ids)
+                pubsub.publish_on_commit(user_ids)
+                created += len(batch)
+        PayoutSchedule.objects.filter(pk__in=[payout.pk for payout in due]).update(notified_at=timezone.now())
+    return created
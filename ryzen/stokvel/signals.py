@@ -0,0 +1,39 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from member.models import Member
+from . import cache as stokvel_cache
+from . import payouts
+from .models import Stokvel
+
+
+def _reschedule(stokvel_ids):
+    stokvel_ids = sorted(pk for pk in stokvel_ids if pk)
+    if stokvel_ids:
+        transaction.on_commit(lambda: payouts.rebuild(stokvel_ids))
+
+
+@receiver(post_save, sender=Stokvel)
+@receiver(post_delete, sender=Stokvel)
+def invalidate_stokvel(sender, instance, **kwargs):
+    stokvel_cache.bump(instance.pk)
+
+
+@receiver(post_save, sender=Stokvel)
+def reschedule_stokvel(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _reschedule([instance.pk])
+
+
+@receiver(post_save, sender=Member)
+def reschedule_on_member_save(sender, instance, created, raw=False, **kwargs):
+    # member/signals.py records the stokvel the member was in before the save
+    previous = getattr(instance, "_previous_stokvel_id", None)
+    if not raw and (created or previous != instance.stokvel_id):
+        _reschedule({instance.stokvel_id, previous})
+
+
+@receiver(post_delete, sender=Member)
+def reschedule_on_member_delete(sender, instance, **kwargs):
+    _reschedule([instance.stokvel_id])
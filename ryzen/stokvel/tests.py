@@ -1,3 +1,127 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from communications.models import Notification
+from member.models import Member
+from . import payouts
+from .models import PayoutSchedule, Stokvel
+
+TODAY = date(2025, 3, 10)
+
+
+class PayoutTests(TestCase):
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.stokvel = self.make_stokvel("Payouts")
+        self.members = [self.join(self.stokvel, f"payee{i}") for i in range(3)]
+
+    def make_stokvel(self, name, **fields):
+        stokvel = Stokvel.objects.create(name=name, monthly_contribution=Decimal("100.00"), **fields)
+        created = timezone.make_aware(datetime(2025, 1, 20, 12))
+        Stokvel.objects.filter(pk=stokvel.pk).update(created_at=created)
+        stokvel.created_at = created
+        return stokvel
+
+    def join(self, stokvel, username):
+        return Member.objects.create(user=User.objects.create(username=username), stokvel=stokvel)
+
+    def schedule(self):
+        return list(self.stokvel.payouts.values_list("payout_date", "member_id", "expected_amount"))
+
+    def test_rotation_dates_and_pot(self):
+        self.assertEqual(payouts.rebuild([self.stokvel.pk], today=TODAY, horizon=4), 4)
+        a, b, c = (m.pk for m in self.members)
+        self.assertEqual(self.schedule(), [
+            (date(2025, 3, 20), a, Decimal("300.00")),
+            (date(2025, 4, 20), b, Decimal("300.00")),
+            (date(2025, 5, 20), c, Decimal("300.00")),
+            (date(2025, 6, 20), a, Decimal("300.00")),
+        ])
+
+        Stokvel.objects.filter(pk=self.stokvel.pk).update(payout_cycle="quarterly", target_amount=Decimal("5000"))
+        payouts.rebuild([self.stokvel.pk], today=TODAY, horizon=2)
+        self.assertEqual(self.schedule(), [(date(2025, 4, 20), a, Decimal("5000.00")), (date(2025, 7, 20), b, Decimal("5000.00"))])
+
+        Stokvel.objects.filter(pk=self.stokvel.pk).update(payout_cycle="custom")
+        self.assertEqual(payouts.rebuild([self.stokvel.pk], today=TODAY), 0)
+
+    def test_members_joining_and_leaving(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            newcomer = self.join(self.stokvel, "newcomer")
+        a, b, c = (m.pk for m in self.members)
+        recipients = list(self.stokvel.payouts.values_list("member_id", flat=True)[:5])
+        self.assertEqual(recipients, [a, b, c, newcomer.pk, a])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.members[1].user.delete()
+        recipients = list(self.stokvel.payouts.values_list("member_id", flat=True)[:4])
+        self.assertEqual(recipients, [a, c, newcomer.pk, a])
+
+    def test_announced_payouts_are_kept(self):
+        payouts.rebuild([self.stokvel.pk], today=TODAY, horizon=3)
+        self.assertEqual(payouts.notify_due(today=date(2025, 3, 18)), 3)
+        self.assertEqual(payouts.notify_due(today=date(2025, 3, 18)), 0)
+
+        first = self.members[0]
+        notification = first.user.notifications.get()
+        self.assertEqual(notification.category, "payout")
+        self.assertIn("You receive the Payouts payout of R300.00 on 20 March 2025", notification.message)
+        self.assertIn("payee0 receives", self.members[1].user.notifications.get().message)
+        self.assertEqual(first.user.notification_counter.unread, 1)
+
+        # The announced payout stays with payee0 and the rotation carries on after it
+        self.join(self.stokvel, "latecomer")
+        Member.objects.filter(pk=first.pk).update(stokvel=None)
+        payouts.rebuild([self.stokvel.pk], today=TODAY, horizon=3)
+        self.assertEqual(
+            list(self.stokvel.payouts.values_list("sequence", "member__user__username")),
+            [(2, "payee0"), (3, "payee1"), (4, "payee2"), (5, "latecomer")],
+        )
+
+    def test_deleted_recipient_keeps_the_rotation_going(self):
+        fourth = self.join(self.stokvel, "payee3")
+        payouts.rebuild([self.stokvel.pk], today=TODAY, horizon=3)
+        # payee0 was paid on 20 March, payee1 on 20 April; then payee1 deletes their account
+        self.members[1].user.delete()
+        payouts.rebuild([self.stokvel.pk], today=date(2025, 5, 1), horizon=2)
+        self.assertEqual(
+            list(self.stokvel.payouts.values_list("payout_date", "member_id")),
+            [
+                (date(2025, 3, 20), self.members[0].pk),
+                (date(2025, 4, 20), None),
+                (date(2025, 5, 20), self.members[2].pk),
+                (date(2025, 6, 20), fourth.pk),
+            ],
+        )
+
+    def test_batched_rebuild(self):
+        def rebuild_queries():
+            with CaptureQueriesContext(connection) as captured:
+                payouts.rebuild(today=TODAY)
+            return len(captured.captured_queries)
+
+        few = rebuild_queries()
+        for s in range(5):
+            stokvel = self.make_stokvel(f"Batch {s}", payout_cycle="custom", payout_interval_months=2)
+            for i in range(4):
+                self.join(stokvel, f"batch{s}-{i}")
+        self.assertEqual(rebuild_queries(), few)
+        self.assertEqual(PayoutSchedule.objects.count(), 6 * 12)
+        self.assertEqual(Notification.objects.count(), 0)
 
-# Create your tests here.
+    def test_dashboard_shows_next_payout(self):
+        payouts.rebuild([self.stokvel.pk], horizon=2)
+        self.client.force_login(self.members[0].user)
+        response = self.client.get(reverse("member:dashboard"))
+        next_payout = self.stokvel.payouts.order_by("payout_date").first()
+        self.assertEqual(response.context["upcoming_payouts"][0], next_payout)
+        self.assertContains(response, "Next Payout")